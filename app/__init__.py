@@ -1,18 +1,32 @@
 import os
-import pkgutil
-import importlib
+import sys
+import shlex
+import atexit
 import logging
 from dotenv import load_dotenv
-from app.commands import CommandHandler
+from app.commands import CommandHandler, LazyCommand, ExecutionContext, DEFAULT_CONTEXT, BackgroundExecutor, Job
+from app.logger import start_file_pipeline, configure_sampling
+from app.discovery import PluginIndex, DEFAULT_INDEX_PATH
+from app.metrics import METRICS
+from app.profiling import CommandProfiler
+
+SCRIPT_OUTPUT_BUFFER = 1 << 16
 
 class App:
     def __init__(self):
         load_dotenv()  # Load environment variables from .env at the very start
+        # Configure logging before anything logs: the first bare logging call would otherwise
+        # install a default stderr handler and leave the log file unconfigured.
+        self.log_pipeline = None
+        self.configure_logging()
         self.settings = self.load_environment_variables()
         self.settings.setdefault('ENVIRONMENT', 'PRODUCTION')
-        self.configure_logging()
         os.makedirs('logs', exist_ok=True)  # Ensure logs directory exists
-        self.command_handler = CommandHandler()
+        # Background commands (network sends) run on a bounded pool and report back when done
+        self.command_handler = CommandHandler(BackgroundExecutor.from_settings(self.settings, on_complete=self.report_job),
+                                              profiler=CommandProfiler.from_settings(self.settings))
+        if self.settings.get('METRICS_PORT'):
+            METRICS.serve(self.settings.get('METRICS_HOST') or '127.0.0.1', int(self.settings['METRICS_PORT']))
 
     def load_environment_variables(self):
         settings = {key: value for key, value in os.environ.items()}
@@ -25,75 +39,158 @@ class App:
         os.makedirs(log_dir, exist_ok=True)
         log_file_path = os.path.join(log_dir, 'app.log')
     
-        logging.basicConfig(
-            filename=log_file_path,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            filemode='a'
-        )
+        root_logger = logging.getLogger()
+        # Like basicConfig, leave an already configured root logger alone.
+        if not root_logger.handlers:
+            # Records go through a queue; a background thread batches the actual file writes.
+            root_logger.setLevel(logging.INFO)
+            self.log_pipeline = start_file_pipeline(log_file_path, os.environ)
+            atexit.register(self.log_pipeline.stop)
+        configure_sampling(os.environ)
         logging.info("Logging configured correctly.")
         
 
     def load_plugins(self):
+        # Discovery results (module path, command class, mtime/hash) are cached in an on-disk
+        # index, so only plugins whose files changed are rescanned. Each plugin is then imported
+        # by its LazyCommand proxy the first time it runs.
         plugins_package = 'app.plugins'
-        plugins_path = plugins_package.replace('.', '/') 
-        for _, plugin_name, is_pkg in pkgutil.iter_modules([plugins_path]): 
-            if is_pkg: # pragma: no branch
-                try:
-                    module = importlib.import_module(f'{plugins_package}.{plugin_name}')
-                    # For calculator, the command class is in its __init__.py
-                    if plugin_name == "calculator":
-                        command_class = getattr(module, 'CalculatorCommand', None)
-                        if command_class: # pragma: no branch
-                            self.command_handler.register_command(plugin_name, command_class())
-                    else:
-                        # For other plugins, the command class is expected to be named like EmailCommand, etc.
-                        command_class_name = f"{plugin_name.capitalize()}Command"
-                        command_class = getattr(module, command_class_name, None)
-                        if command_class: # pragma: no branch
-                            self.command_handler.register_command(plugin_name, command_class())
-                except Exception as e:
-                    logging.error(f"Error loading plugin {plugin_name}: {e}")
+        index_path = self.settings.get('PLUGIN_INDEX_PATH') or DEFAULT_INDEX_PATH
+        for entry in PluginIndex(plugins_package, index_path).discover():
+            proxy = LazyCommand(entry['module'], entry['class_name'])
+            self.command_handler.register_command(entry['name'], proxy)
 
     def print_main_menu(self):
         print("\nAvailable commands:")
         self.command_handler.list_commands()
-        print("Type the number of the command to execute, or type 'exit' to exit.")
+        print("Type the number or name of the command to execute, or type 'exit' to exit.")
+
+    def report_job(self, job):
+        # Called from the worker thread; one write keeps the job's output and status together.
+        sys.stdout.write(job.output() + job.describe() + "\n")
+        sys.stdout.flush()
+
+    def report_metrics(self):
+        # Latency summary into the log, plus a Prometheus text file when METRICS_FILE is set
+        METRICS.log_summary()
+        if self.settings.get('METRICS_FILE'):
+            METRICS.write_prometheus(self.settings['METRICS_FILE'])
 
     def flush_logs(self):
         # Flush all log handlers
         for handler in logging.getLogger().handlers:
             handler.flush()
 
+    def shutdown(self):
+        # The one exit path for the menu, scripts, the daemon and the server: background jobs
+        # finish, plugins close their pools and files and log their final stats, then metrics are
+        # reported and the log is drained.
+        self.command_handler.shutdown()
+        self.report_metrics()
+        self.shutdown_logging()
+
+    def shutdown_logging(self):
+        # Drain queued records to disk before the logging module closes its handlers
+        if self.log_pipeline:
+            self.log_pipeline.stop()
+        logging.shutdown()
+
     def start(self):
         self.load_plugins()
         logging.info("Application starting...")
         logging.info("Main loop started.")
+        context = ExecutionContext(settings=self.settings)  # the terminal's stdin/stdout
         while True:
             self.print_main_menu()
             user_input = input(">>> ").strip()
-            if user_input.lower() == 'exit':
-                logging.info("Exiting application via 'exit' command.")
-                print("Exiting application.")
-                self.flush_logs()
-                logging.shutdown()
-                break
             try:
                 index = int(user_input) - 1
                 if index < 0:
                     continue # pragma: no cover
                 command_name = self.command_handler.get_command_by_index(index)
-                if command_name:
-                    logging.info(f"Executing command '{command_name}'.")
-                    self.command_handler.execute_command(command_name)
-                    self.flush_logs()
-                else:
-                    logging.warning("Invalid selection. Please enter a valid number.")
-                    print("Invalid selection. Please enter a valid number.")
             except ValueError:
-                logging.error("Only numbers are allowed, wrong input.") # pragma: no cover
-                print("Only numbers are allowed, wrong input.") # pragma: no cover
+                # Not a number: accept a command name or an unambiguous prefix of one
+                command_name = self.command_handler.get_command_by_prefix(user_input)
+            if user_input.lower() == 'exit' or command_name == 'exit':
+                # However it is picked, leaving goes through shutdown() rather than ExitCommand's sys.exit()
+                logging.info("Exiting application via 'exit' command.")
+                print("Exiting application.")
+                self.shutdown()
+                break
+            if command_name:
+                logging.info(f"Executing command '{command_name}'.")
+                job = self.command_handler.dispatch_command(command_name, context=context)
+                if isinstance(job, Job):
+                    print(f"{job.describe()} in the background.")
+                self.flush_logs()
+            else:
+                logging.warning("Invalid selection. Please enter a valid number.")
+                print("Invalid selection. Please enter a valid number.")
                 
+    def run_script(self, stream):
+        # Non-interactive mode: one "command arg ..." per line, no menu, output written in blocks
+        # and a single log flush at the end. Call shutdown() once the script is done.
+        self.load_plugins()
+        logging.info("Running scripted commands.")
+        out = sys.stdout
+        context = self.create_context()
+        buffer = context.output
+        failures = 0
+        try:
+            for line_number, line in enumerate(stream, start=1):
+                if line.split('#', 1)[0].strip() == 'exit':
+                    break
+                if not self.run_line(line, context, line_number):
+                    failures += 1
+                if buffer.tell() >= SCRIPT_OUTPUT_BUFFER:
+                    out.write(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+        finally:
+            out.write(buffer.getvalue())
+            out.flush()
+            self.flush_logs()
+        return failures
+
+    def create_context(self):
+        # Output is collected in memory; there is no input, so prompts raise EOFError instead of
+        # blocking on the process stdin.
+        return ExecutionContext.buffered(settings=self.settings)
+
+    def run_line(self, line: str, context, line_number: int = None):
+        # Runs one "command arg ..." line with the given context; returns False if the line failed.
+        where = f" on line {line_number}" if line_number else ""
+        try:
+            parts = shlex.split(line, comments=True)
+            if parts and self.command_handler.get_command_by_prefix(parts[0]) == 'exit':
+                # "ex" or "exit now" would reach ExitCommand's sys.exit() just like "exit"
+                context.print("The exit command is not available in this session.")
+                return True
+            return not parts or self.run_script_line(parts, context)
+        except EOFError:
+            context.print("This command needs interactive input; pass its arguments instead.")
+        except ValueError as e:
+            logging.error(f"Command line failed{where}: {e}")
+            context.print(f"Error{where}: {e}")
+        return False
+
+    def run_script_line(self, parts, context=None):
+        # A line fails if it raises or if its command reports a handled failure ("calc divide 1 0")
+        context = context or DEFAULT_CONTEXT
+        command_name = self.command_handler.get_command_by_prefix(parts[0])
+        if command_name is None:
+            context.print(f"No such command: {parts[0]}")
+            return False
+        failures = context.failures
+        self.command_handler.execute_command(command_name, parts[1:], context)
+        return context.failures == failures
+
+    def run_captured(self, line: str):
+        # Runs one command line and returns what it printed, for callers that serve remote clients.
+        context = self.create_context()
+        self.run_line(line, context)
+        return context.getvalue()
+
     def get_environment_variable(self, env_var: str = 'ENVIRONMENT'):
         return self.settings.get(env_var, None) # pragma: no cover
 
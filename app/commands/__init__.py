@@ -1,37 +1,286 @@
+import time
 import logging
+import importlib
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from app.commands.context import ExecutionContext, DEFAULT_CONTEXT, call_with_context
+from app.commands.background import BackgroundExecutor, Job
+from app.metrics import METRICS
+from app.logger import get_logger
+
+LOG = get_logger('app.commands')  # per-execution records; the rest log through the root logger
 
 class Command(ABC):
+    # Commands doing slow I/O set background = True; the REPL then runs them on the handler's
+    # executor, at most max_concurrency at a time and for at most timeout seconds each.
+    background = False
+    max_concurrency = None
+    timeout = None
+
     @abstractmethod
-    def execute(self):
+    def execute(self, context=None):
         pass
 
-class CommandHandler:
+    def run(self, args, context=None):
+        # Non-interactive entry point used by scripted mode; commands that take arguments override it.
+        if args:
+            raise ValueError(f"{self.__class__.__name__} does not take arguments.")
+        return call_with_context(self.execute, context)
+
+    def close(self):
+        # Called once when the app shuts down: release pools and files, log final stats.
+        pass
+
+class LazyCommand(Command):
+    # Stands in for a plugin command until it is first executed; only then is its module imported.
+    def __init__(self, module_name: str, class_name: str):
+        self.module_name = module_name
+        self.class_name = class_name
+        self.command = None
+
+    def load(self):
+        if self.command is None:
+            module = importlib.import_module(self.module_name)
+            command_class = getattr(module, self.class_name, None)
+            if command_class is None:
+                raise ImportError(f"{self.module_name} has no command class {self.class_name}")
+            self.command = command_class()
+            logging.info(f"Plugin '{self.module_name}' loaded on first use.")
+        return self.command
+
+    def execute(self, context=None):
+        command = self._load_or_report(context)
+        return call_with_context(command.execute, context) if command else None
+
+    def run(self, args, context=None):
+        command = self._load_or_report(context)
+        return call_with_context(command.run, context, args) if command else None
+
+    @property
+    def background(self):
+        return getattr(self._peek(), 'background', False)
+
+    @property
+    def max_concurrency(self):
+        return getattr(self._peek(), 'max_concurrency', None)
+
+    @property
+    def timeout(self):
+        return getattr(self._peek(), 'timeout', None)
+
+    def close(self):
+        # A plugin that never ran has nothing to clean up, and is not imported just to close it
+        if self.command is not None:
+            self.command.close()
+
+    def _peek(self):
+        # A plugin that fails to load runs inline, where execute() reports the error.
+        try:
+            return self.load()
+        except Exception:
+            return None
+
+    def _load_or_report(self, context):
+        try:
+            return self.load()
+        except Exception as e:
+            logging.error(f"Error loading plugin {self.module_name}: {e}")
+            (context or DEFAULT_CONTEXT).print(f"Command is unavailable: {e}")
+            return None
+
+class _TrieNode:
+    __slots__ = ('children', 'names')
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()  # every registered name passing through this node
+
+
+class CommandRegistry(Mapping):
+    # Ordered name -> command mapping with O(1) lookup by name and by menu position, plus a prefix
+    # trie for abbreviated names. Registering and unregistering update the indexes in place.
     def __init__(self):
-        self.commands = {}
+        self._commands = {}
+        self._order = []
+        self._positions = {}
+        self._trie = _TrieNode()
+        self._menu = None
+
+    def __getitem__(self, name):
+        return self._commands[name]
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def register(self, name: str, command):
+        if name not in self._commands:
+            self._positions[name] = len(self._order)
+            self._order.append(name)
+            node = self._trie
+            node.names.add(name)
+            for char in name:
+                node = node.children.setdefault(char, _TrieNode())
+                node.names.add(name)
+            self._menu = None
+        self._commands[name] = command
+
+    def unregister(self, name: str):
+        command = self._commands.pop(name)
+        position = self._positions.pop(name)
+        del self._order[position]
+        for later in self._order[position:]:
+            self._positions[later] -= 1
+        node = self._trie
+        node.names.discard(name)
+        for char in name:
+            child = node.children[char]
+            child.names.discard(name)
+            if not child.names:
+                del node.children[char]
+                break
+            node = child
+        self._menu = None
+        return command
+
+    def name_at(self, position: int):
+        if not 0 <= position < len(self._order):
+            raise IndexError(position)
+        return self._order[position]
+
+    def position_of(self, name: str):
+        return self._positions[name]
+
+    def complete(self, prefix: str):
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return sorted(node.names, key=self._positions.__getitem__)
+
+    def resolve(self, prefix: str):
+        # Exact names win; otherwise a prefix must match exactly one command.
+        if prefix in self._commands:
+            return prefix
+        matches = self.complete(prefix)
+        return matches[0] if len(matches) == 1 else None
+
+    def menu(self):
+        if self._menu is None:
+            self._menu = "\n".join(f"{index}. {name}" for index, name in enumerate(self._order, start=1))
+        return self._menu
+
+
+class CommandHandler:
+    def __init__(self, executor=None, metrics=None, profiler=None):
+        self.commands = CommandRegistry()
+        self.executor = executor  # created on first background submission if not given
+        self.metrics = metrics or METRICS
+        self.profiler = profiler  # app.profiling.CommandProfiler when PROFILE is set
         logging.info("CommandHandler initialized.")
 
     def register_command(self, command_name: str, command_instance: Command):
-        self.commands[command_name] = command_instance
+        self.commands.register(command_name, command_instance)
         logging.info(f"Command '{command_name}' registered.")
 
-    def execute_command(self, command_name: str):
+    def unregister_command(self, command_name: str):
         try:
-            logging.info(f"Executing command: {command_name}")
-            self.commands[command_name].execute()
+            command = self.commands.unregister(command_name)
         except KeyError:
             logging.warning(f"No such command: {command_name}")
-            print(f"No such command: {command_name}")
+            return None
+        logging.info(f"Command '{command_name}' unregistered.")
+        return command
+
+    def execute_command(self, command_name: str, args=None, context=None):
+        # args=None runs the interactive execute(); a list of arguments runs the scripted run(args).
+        # context carries the caller's I/O; without one, commands use the process stdin/stdout.
+        try:
+            LOG.info("Executing command: %s", command_name)
+            command = self.commands[command_name]
+        except KeyError:
+            logging.warning(f"No such command: {command_name}")
+            (context or DEFAULT_CONTEXT).print(f"No such command: {command_name}")
+            return None
+        started = time.perf_counter()
+        failed = True
+        try:
+            if self.profiler is None:
+                result = self.invoke(command, args, context)
+            else:
+                result = self.profiler.run(command_name, self.invoke, command, args, context)
+            failed = False
+            return result
+        finally:
+            duration = time.perf_counter() - started
+            self.metrics.observe('command', command_name, duration, failed)
+            if LOG.isEnabledFor(logging.INFO):
+                # command/duration/outcome become fields when LOG_FORMAT=json
+                outcome = 'error' if failed else 'ok'
+                LOG.info("Command %s finished (%s) in %.3fs.", command_name, outcome, duration,
+                         extra={'command': command_name, 'duration': round(duration, 6), 'outcome': outcome})
+
+    @staticmethod
+    def invoke(command, args, context):
+        if args is None:
+            return call_with_context(command.execute, context)
+        return call_with_context(command.run, context, args)
+
+    def submit_command(self, command_name: str, args=None, context=None):
+        # Runs the command on the background executor and returns its Job without waiting. Output
+        # is collected in the job's context unless the caller's context has its own output sink.
+        command = self.commands.get(command_name)
+        if command is None:
+            logging.warning(f"No such command: {command_name}")
+            (context or DEFAULT_CONTEXT).print(f"No such command: {command_name}")
+            return None
+        if self.executor is None:
+            self.executor = BackgroundExecutor()
+        if context is None or context.output is None:
+            base = context or DEFAULT_CONTEXT
+            context = ExecutionContext.buffered(settings=base.settings, logger=base.logger)
+        return self.executor.submit(command_name, lambda job_context: self.execute_command(command_name, args, job_context),
+                                    context, limit=command.max_concurrency, timeout=command.timeout)
+
+    def dispatch_command(self, command_name: str, args=None, context=None):
+        # Background commands are submitted (returns their Job); everything else runs inline.
+        command = self.commands.get(command_name)
+        if command is not None and command.background:
+            return self.submit_command(command_name, args, context)
+        return self.execute_command(command_name, args, context)
+
+    def shutdown(self, wait: bool = True):
+        if self.executor is not None:
+            self.executor.shutdown(wait)
+        closed = set()
+        for name, command in self.commands.items():
+            if id(command) in closed:
+                continue  # registered under several names
+            closed.add(id(command))
+            try:
+                command.close()
+            except Exception as e:
+                logging.error(f"Error closing command {name}: {e}")
 
     def list_commands(self):
         logging.info("Listing available commands.")
-        for index, command_name in enumerate(self.commands, start=1):
-            print(f"{index}. {command_name}")
+        # The rendered menu is cached by the registry until a command is added or removed
+        if self.commands:
+            print(self.commands.menu())
 
     def get_command_by_index(self, index: int):
         try:
-            command_name = list(self.commands.keys())[index]
+            command_name = self.commands.name_at(index)
             return command_name
         except IndexError:
             logging.error("Attempted to access a command by an invalid index.")
             return None
+
+    def get_command_by_prefix(self, prefix: str):
+        command_name = self.commands.resolve(prefix)
+        if command_name is None:
+            logging.error(f"No unique command matches '{prefix}'.")
+        return command_name
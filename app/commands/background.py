@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+import itertools
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+RECENT_JOBS = 100  # finished jobs kept for get(), with their context and output
+
+
+class Job:
+    # One background invocation. future resolves to the command's return value, or fails with
+    # TimeoutError once the command's timeout passes.
+    def __init__(self, job_id: int, command_name: str, function, context, timeout=None):
+        self.job_id = job_id
+        self.command_name = command_name
+        self.function = function
+        self.context = context
+        self.timeout = timeout
+        self.future = Future()
+        self.status = 'queued'
+        self.started = None
+        self.finished = None
+        self.timer = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
+
+    def output(self):
+        getvalue = getattr(self.context.output, 'getvalue', None)
+        return getvalue() if getvalue else ''
+
+    def describe(self):
+        duration = f" in {self.duration:.2f}s" if self.finished is not None else ''
+        error = f": {self.error}" if self.error else ''
+        return f"[job {self.job_id}] {self.command_name} {self.status}{duration}{error}"
+
+
+class BackgroundExecutor:
+    # Bounded thread pool for I/O-bound commands. Each command name may run at most `limit` jobs
+    # at once; further submissions wait in that command's queue, so one slow command cannot take
+    # every worker. on_complete(job) is called from the worker thread when a job ends; the job then
+    # moves from `jobs` to the `recent` ones, of which only the last `keep_recent` are kept.
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, default_timeout: float = None, on_complete=None,
+                 keep_recent: int = RECENT_JOBS):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='command')
+        self.default_timeout = default_timeout
+        self.on_complete = on_complete
+        self.keep_recent = keep_recent
+        self.jobs = {}  # job id -> jobs queued or running
+        self.recent = OrderedDict()  # job id -> finished jobs, oldest first
+        self._ids = itertools.count(1)
+        self._running = {}  # command name -> jobs currently holding a slot
+        self._waiting = {}  # command name -> deque of jobs over the limit
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, on_complete=None):
+        timeout = settings.get('BACKGROUND_TIMEOUT')
+        return cls(max_workers=int(settings.get('BACKGROUND_WORKERS') or DEFAULT_WORKERS),
+                   default_timeout=float(timeout) if timeout else None, on_complete=on_complete)
+
+    def submit(self, command_name: str, function, context, limit: int = None, timeout: float = None):
+        # function(context) runs on a worker; returns the Job right away.
+        job = Job(next(self._ids), command_name, function, context,
+                  timeout if timeout is not None else self.default_timeout)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            if limit is not None:
+                self._limits[command_name] = limit
+            running = self._running.get(command_name, 0)
+            if running >= self._limits.get(command_name, float('inf')):
+                self._waiting.setdefault(command_name, deque()).append(job)
+                logging.info(f"Job {job.job_id} ({command_name}) queued behind {running} running.")
+                return job
+            self._running[command_name] = running + 1
+        self._start(job)
+        return job
+
+    def get(self, job_id: int):
+        with self._lock:
+            return self.jobs.get(job_id) or self.recent.get(job_id)
+
+    def active(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def shutdown(self, wait: bool = True):
+        # With wait, returns once every active job has finished or timed out (and been reported);
+        # otherwise jobs still waiting for a slot are cancelled.
+        if wait:
+            for job in self.active():
+                job.future.exception()
+        else:
+            with self._lock:
+                waiting = [job for queue in self._waiting.values() for job in queue]
+                self._waiting.clear()
+            for job in waiting:
+                job.status = 'cancelled'
+                job.future.cancel()
+        self.pool.shutdown(wait=False)
+
+    def _start(self, job):
+        job.status = 'running'
+        job.started = time.monotonic()
+        if job.timeout is not None:
+            job.timer = threading.Timer(job.timeout, self._expire, (job,))
+            job.timer.daemon = True
+            job.timer.start()
+        self.pool.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.function(job.context)
+        except Exception as e:
+            logging.error(f"Job {job.job_id} ({job.command_name}) failed: {e}")
+            self._finish(job, 'failed', exception=e)
+        else:
+            self._finish(job, 'finished', result=result)
+        finally:
+            if job.timer:
+                job.timer.cancel()
+            self._release(job.command_name)
+
+    def _expire(self, job):
+        # A thread cannot be interrupted, so the job keeps its slot until it really returns; its
+        # future and the completion report are resolved now.
+        logging.warning(f"Job {job.job_id} ({job.command_name}) timed out after {job.timeout}s.")
+        self._finish(job, 'timed out', exception=TimeoutError(f"{job.command_name} timed out after {job.timeout}s"))
+
+    def _finish(self, job, status, result=None, exception=None):
+        with self._lock:
+            if job.finished is not None:
+                return
+            job.status = status
+            job.finished = time.monotonic()
+            job.error = exception
+        logging.info(f"Job {job.job_id} ({job.command_name}) {status} in {job.duration:.3f}s.",
+                     extra={'command': job.command_name, 'duration': round(job.duration, 6), 'outcome': status})
+        try:
+            if self.on_complete:
+                self.on_complete(job)
+        finally:
+            self._retire(job)
+            # Resolved after the report, so anyone waiting on the future also sees it reported
+            if exception is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(exception)
+
+    def _retire(self, job):
+        with self._lock:
+            self.jobs.pop(job.job_id, None)
+            self.recent[job.job_id] = job
+            while len(self.recent) > self.keep_recent:
+                self.recent.popitem(last=False)
+
+    def _release(self, command_name):
+        with self._lock:
+            waiting = self._waiting.get(command_name)
+            if not waiting:
+                self._running[command_name] -= 1
+                return
+            job = waiting.popleft()
+        self._start(job)
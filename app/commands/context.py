@@ -0,0 +1,146 @@
+import io
+import sys
+import inspect
+import threading
+import contextlib
+from app.logger import get_logger
+
+
+class ExecutionContext:
+    # Everything a command needs from its surroundings. Commands that take a context never touch
+    # the process-wide input()/print(), so several invocations can run at once in one interpreter.
+    def __init__(self, input_source=None, output=None, logger=None, settings=None):
+        self.input_source = input_source  # callable(prompt) -> str; None means builtins.input
+        self.output = output  # object with write(str); None means sys.stdout
+        self.logger = logger or get_logger('app.commands')  # sampled with LOG_SAMPLING=app.commands=N
+        self.settings = settings if settings is not None else {}
+        self.failures = 0  # failures a command reported to the user itself, see fail()
+
+    def fail(self, *values):
+        # For a failure the command handles (prints instead of raising) but callers should still count
+        self.failures += 1
+        self.print(*values)
+
+    @classmethod
+    def buffered(cls, lines=(), settings=None, logger=None):
+        # Scripted input from a list of lines, output collected in memory (see getvalue()).
+        pending = iter(lines)
+
+        def next_line(prompt):
+            try:
+                return next(pending)
+            except StopIteration:
+                raise EOFError("no more input") from None
+        return cls(input_source=next_line, output=io.StringIO(), logger=logger, settings=settings)
+
+    def input(self, prompt: str = ''):
+        if self.input_source is None:
+            return input(prompt)  # looked up at call time, so patched builtins keep working
+        return self.input_source(prompt)
+
+    def print(self, *values, sep=' ', end='\n'):
+        if self.output is None:
+            print(*values, sep=sep, end=end)
+        else:
+            self.output.write(sep.join(str(value) for value in values) + end)
+
+    def getvalue(self):
+        return self.output.getvalue()
+
+    @contextlib.contextmanager
+    def redirected(self):
+        # Points this thread's sys.stdin/sys.stdout at the context for commands that still use the
+        # builtins. Other threads keep the real streams: a print() elsewhere never lands in here.
+        _install_routers()
+        previous = getattr(_routes, 'streams', None)
+        _routes.streams = (_ContextReader(self), _ContextWriter(self))
+        try:
+            yield self
+        finally:
+            _routes.streams = previous
+            _remove_routers()
+
+
+class _ContextReader:
+    def __init__(self, context):
+        self.context = context
+
+    def readline(self):
+        return self.context.input('') + '\n'
+
+
+class _ContextWriter:
+    def __init__(self, context):
+        self.context = context
+
+    def write(self, text):
+        self.context.print(text, end='')
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class _StreamRouter:
+    # Stands in for sys.stdin or sys.stdout while legacy commands run: threads inside redirected()
+    # get their context's stream, every other thread the original one.
+    def __init__(self, original, position: int):
+        self.original = original
+        self.position = position
+
+    def __getattr__(self, name):
+        streams = getattr(_routes, 'streams', None)
+        return getattr(self.original if streams is None else streams[self.position], name)
+
+
+DEFAULT_CONTEXT = ExecutionContext()
+_accepts_context = {}
+_routes = threading.local()
+# Routers are installed while at least one legacy command runs and removed after the last one
+_router_lock = threading.Lock()
+_router_users = 0
+_routers = ()
+
+
+def _install_routers():
+    global _router_users, _routers
+    with _router_lock:
+        if _router_users == 0:
+            _routers = (_StreamRouter(sys.stdin, 0), _StreamRouter(sys.stdout, 1))
+            sys.stdin, sys.stdout = _routers
+        _router_users += 1
+
+
+def _remove_routers():
+    global _router_users
+    with _router_lock:
+        _router_users -= 1
+        if _router_users == 0:
+            # Unless something replaced the streams meanwhile (pytest's capture does)
+            if sys.stdin is _routers[0]:
+                sys.stdin = _routers[0].original
+            if sys.stdout is _routers[1]:
+                sys.stdout = _routers[1].original
+
+
+def accepts_context(method):
+    function = getattr(method, '__func__', method)
+    accepted = _accepts_context.get(function)
+    if accepted is None:
+        try:
+            accepted = 'context' in inspect.signature(function).parameters
+        except (TypeError, ValueError):
+            accepted = False
+        _accepts_context[function] = accepted
+    return accepted
+
+
+def call_with_context(method, context, *args):
+    # Compatibility shim: context-aware commands get the context passed in; older plugins whose
+    # execute() takes no arguments run with their thread's stdin/stdout redirected to it.
+    if accepts_context(method):
+        return method(*args, context=context)
+    if context is None or context is DEFAULT_CONTEXT:
+        return method(*args)
+    with context.redirected():
+        return method(*args)
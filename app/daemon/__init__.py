@@ -0,0 +1,70 @@
+import os
+import stat
+import socket
+import logging
+import socketserver
+from app_client import DEFAULT_SOCKET_PATH, send_command  # the client lives outside the app package
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class CommandRequestHandler(socketserver.StreamRequestHandler):
+    # One request per connection: a single command line in, the command's output back.
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES).decode('utf-8', errors='replace')
+        reply = self.server.run_line(line)
+        self.wfile.write(reply.encode('utf-8'))
+
+
+class AppDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # Keeps one App (settings, logging, plugin proxies) alive between invocations. Each request runs
+    # in its own thread with its own execution context, so concurrent clients never share output.
+    daemon_threads = True
+
+    def __init__(self, app, socket_path: str = DEFAULT_SOCKET_PATH, preload: bool = True):
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, CommandRequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.app = app
+        self.socket_path = socket_path
+        app.load_plugins()
+        if preload:
+            self.preload()
+        logging.info(f"Daemon listening on {socket_path}.")
+
+    def preload(self):
+        # Pay every plugin import once at daemon start instead of on some client's first request
+        for command_name, command in self.app.command_handler.commands.items():
+            load = getattr(command, 'load', None)
+            if load:
+                try:
+                    load()
+                except Exception as e:
+                    logging.error(f"Error preloading plugin {command_name}: {e}")
+
+    def run_line(self, line: str):
+        reply = self.app.run_captured(line)
+        self.app.flush_logs()
+        return reply
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def remove_stale_socket(socket_path: str):
+    # A socket left behind by a daemon that died is removed; a live daemon's socket, or any other
+    # file at that path, is an error rather than something to delete.
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise OSError(f"A daemon is already listening on {socket_path}.")
@@ -0,0 +1,130 @@
+import os
+import ast
+import time
+import json
+import hashlib
+import tempfile
+import logging
+import pkgutil
+import importlib
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = '.plugin_index.json'
+# A directory modified this recently may still change within the same timestamp tick,
+# so its mtime is not trusted for skipping the next scan.
+RACY_WINDOW_NS = 2 * 10**9
+
+
+def probe_command_class(init_path: str, plugin_name: str):
+    # Finds the command class without importing the plugin: the conventional <Name>Command if the
+    # package defines it, otherwise the first class deriving from Command.
+    with open(init_path, 'rb') as handle:
+        tree = ast.parse(handle.read(), filename=init_path)
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    conventional = f"{plugin_name.capitalize()}Command"
+    for node in classes:
+        if node.name == conventional:
+            return node.name
+    for node in classes:
+        if any(getattr(base, 'id', getattr(base, 'attr', None)) == 'Command' for base in node.bases):
+            return node.name
+    return None
+
+
+def import_command_class(module_name: str, plugin_name: str):
+    # Fallback for packages whose command class is not defined in __init__.py itself (re-exported
+    # with "from .impl import WidgetCommand"): import once and look up the conventional name.
+    try:
+        module = importlib.import_module(module_name)
+    except Exception as e:
+        logging.warning(f"Error importing plugin {plugin_name} to find its command class: {e}")
+        return None
+    conventional = f"{plugin_name.capitalize()}Command"
+    return conventional if isinstance(getattr(module, conventional, None), type) else None
+
+
+def file_hash(path: str):
+    with open(path, 'rb') as handle:
+        return hashlib.sha1(handle.read()).hexdigest()
+
+
+class PluginIndex:
+    def __init__(self, plugins_package: str = 'app.plugins', index_path: str = DEFAULT_INDEX_PATH):
+        self.plugins_package = plugins_package
+        self.plugins_path = plugins_package.replace('.', '/')
+        self.index_path = index_path
+        self.rescanned = []
+        self.changed = False
+
+    def discover(self):
+        # Returns index entries ({name, module, class_name, mtime, hash}) in menu order.
+        index = self.load()
+        dir_mtime = os.stat(self.plugins_path).st_mtime_ns
+        known = {entry['name']: entry for entry in index.get('plugins', [])}
+        if index and index.get('dir_mtime') == dir_mtime:
+            names = list(known)  # no plugin added or removed: skip the directory scan
+        else:
+            names = [name for _, name, is_pkg in pkgutil.iter_modules([os.path.abspath(self.plugins_path)]) if is_pkg]
+        self.rescanned = []
+        self.changed = index.get('dir_mtime') != dir_mtime
+        entries = [entry for entry in (self._refresh(name, known.get(name)) for name in names) if entry]
+        if self.changed:
+            trusted_mtime = dir_mtime if time.time_ns() - dir_mtime > RACY_WINDOW_NS else None
+            self.save({'version': INDEX_VERSION, 'plugins_path': os.path.abspath(self.plugins_path),
+                       'dir_mtime': trusted_mtime, 'plugins': entries})
+        for entry in entries:
+            if not entry['class_name']:
+                logging.warning(f"Plugin {entry['name']} has no command class; it is left out of the menu.")
+        return [entry for entry in entries if entry['class_name']]
+
+    def load(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as handle:
+                index = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION or index.get('plugins_path') != os.path.abspath(self.plugins_path):
+            return {}
+        return index
+
+    def save(self, index):
+        # A unique temporary file, so concurrent starts never write into each other's. The index is
+        # only a cache: if it cannot be written, the next start simply rescans.
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        try:
+            descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.plugin_index.', suffix='.tmp')
+        except OSError as e:
+            logging.warning(f"Could not write plugin index {self.index_path}: {e}")
+            return
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as handle:
+                json.dump(index, handle, indent=2)
+            os.replace(temporary_path, self.index_path)
+        except OSError as e:
+            os.unlink(temporary_path)
+            logging.warning(f"Could not write plugin index {self.index_path}: {e}")
+            return
+        logging.info(f"Plugin index written to {self.index_path} ({len(self.rescanned)} plugins rescanned).")
+
+    def _refresh(self, name: str, entry):
+        init_path = os.path.join(self.plugins_path, name, '__init__.py')
+        try:
+            mtime = os.stat(init_path).st_mtime_ns
+        except FileNotFoundError:
+            self.changed = True
+            return None
+        if entry and entry['mtime'] == mtime:
+            return entry
+        self.changed = True
+        digest = file_hash(init_path)
+        if entry and entry['hash'] == digest:
+            return dict(entry, mtime=mtime)
+        self.rescanned.append(name)
+        module_name = f"{self.plugins_package}.{name}"
+        return {
+            'name': name,
+            'module': module_name,
+            'class_name': probe_command_class(init_path, name) or import_command_class(module_name, name),
+            'mtime': mtime,
+            'hash': digest,
+        }
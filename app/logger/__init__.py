@@ -0,0 +1,369 @@
+import os
+import copy
+import gzip
+import json
+import time
+import queue
+import shutil
+import logging
+import threading
+from logging.handlers import QueueHandler
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional, gzip is the fallback
+    zstandard = None
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+COMPRESSIONS = ('gzip', 'zstd', 'none')
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_SAMPLED_MESSAGES = 1024  # distinct messages tracked per logger before the counters start over
+_STOP = object()
+
+
+class BatchingFileHandler(logging.FileHandler):
+    # Collects formatted records and writes them in one go once batch_size records are pending
+    # or flush_interval seconds have passed since the last write.
+    def __init__(self, filename, mode='a', batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, encoding=None):
+        super().__init__(filename, mode=mode, encoding=encoding)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record) + self.terminator)
+            if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.pending and self.stream:
+                self.stream.write(''.join(self.pending))
+                self.pending.clear()
+            if self.stream:
+                self.stream.flush()
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    # One compact JSON object per record. Commands attach command/duration/outcome through
+    # `extra=`, and they become fields instead of text to be parsed back out of the message.
+    FIELDS = ('command', 'duration', 'outcome')
+
+    def format(self, record):
+        entry = {'time': round(record.created, 6), 'level': record.levelname, 'message': record.getMessage()}
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'))
+
+
+def rotated_segments(base_path: str):
+    # Rotated segments of base_path, oldest first. Names are base.YYYYmmdd-HHMMSS[-n][.gz|.zst];
+    # the -n sequence is compared as a number so base.X-1 sorts after base.X.
+    directory, name = os.path.split(os.path.abspath(base_path))
+
+    def age(entry):
+        suffix = entry[len(name) + 1:].split('.')[0]
+        sequence = suffix[16:]
+        return suffix[:15], int(sequence) if sequence.isdigit() else 0
+    entries = [entry for entry in os.listdir(directory) if entry.startswith(f"{name}.")]
+    return [os.path.join(directory, entry) for entry in sorted(entries, key=age)]
+
+
+class SegmentCompressor:
+    # Compresses rotated segments on its own thread so a rollover never stalls log writes, then
+    # deletes the oldest segments beyond backup_count.
+    def __init__(self, base_path: str, method: str = 'gzip', backup_count: int = None):
+        if method not in COMPRESSIONS:
+            raise ValueError(f"Unknown log compression: {method} (expected one of {', '.join(COMPRESSIONS)})")
+        if method == 'zstd' and zstandard is None:
+            logging.warning("zstandard is not installed; compressing rotated logs with gzip instead.")
+            method = 'gzip'
+        self.base_path = base_path
+        self.method = method
+        self.backup_count = backup_count
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="log-compressor", daemon=True)
+        self.thread.start()
+
+    def submit(self, path: str):
+        self.queue.put(path)
+
+    def join(self):
+        self.queue.join()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def compress(self, path: str):
+        if self.method == 'none':
+            return path
+        target = f"{path}.gz" if self.method == 'gzip' else f"{path}.zst"
+        with open(path, 'rb') as source:
+            if self.method == 'gzip':
+                with gzip.open(target, 'wb') as destination:
+                    shutil.copyfileobj(source, destination)
+            else:
+                with open(target, 'wb') as destination:
+                    zstandard.ZstdCompressor().copy_stream(source, destination)
+        os.remove(path)
+        return target
+
+    def prune(self):
+        if self.backup_count is None:
+            return
+        segments = rotated_segments(self.base_path)
+        for path in segments[:max(len(segments) - self.backup_count, 0)]:
+            os.remove(path)
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                if path is _STOP:
+                    return
+                self.compress(path)
+                self.prune()
+            except OSError as e:
+                logging.error(f"Could not compress rotated log {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+
+class RotatingBatchingFileHandler(BatchingFileHandler):
+    # Starts a new segment when the file would grow past max_bytes or every `interval` seconds.
+    # The old segment is renamed with a timestamp suffix and handed to the compressor.
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, interval=None, compression='gzip',
+                 backup_count=None, clock=time.time, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.clock = clock
+        self.rollover_at = clock() + interval if interval else None
+        self.compressor = SegmentCompressor(self.baseFilename, compression, backup_count)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.pending and self.stream and self.should_rollover():
+                self.rollover()
+            super().flush()
+        finally:
+            self.release()
+
+    def should_rollover(self):
+        if self.rollover_at is not None and self.clock() >= self.rollover_at:
+            return True
+        if not self.max_bytes:
+            return False
+        written = self.stream.tell()
+        return written > 0 and written + sum(len(line) for line in self.pending) > self.max_bytes
+
+    def rollover(self):
+        self.stream.close()
+        suffix = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.clock()))
+        rotated = f"{self.baseFilename}.{suffix}"
+        sequence = 1
+        while any(os.path.exists(path) for path in (rotated, f"{rotated}.gz", f"{rotated}.zst")):
+            rotated = f"{self.baseFilename}.{suffix}-{sequence}"
+            sequence += 1
+        os.replace(self.baseFilename, rotated)
+        self.stream = self._open()
+        if self.interval:
+            self.rollover_at = self.clock() + self.interval
+        self.compressor.submit(rotated)
+
+    def close(self):
+        super().close()
+        self.compressor.stop()
+
+
+class RecordQueueHandler(QueueHandler):
+    # The stock prepare() formats the message (and folds any traceback into it) on the logging
+    # thread. Here the record is queued as logged, args and exc_info intact, and the pipeline
+    # thread's handler formats it. Logged arguments must not be mutated after the call.
+    def prepare(self, record):
+        return copy.copy(record)  # other handlers of the logger may still set attributes on it
+
+
+class LogPipeline:
+    # Callers only pay for a record copy and a queue put; a background thread drains the queue
+    # into the handler, which does all the formatting.
+    def __init__(self, handler, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.handler = handler
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = RecordQueueHandler(self.queue)
+        self.thread = None
+
+    def start(self, logger=None):
+        logger = logger or logging.getLogger()
+        logger.addHandler(self.queue_handler)
+        self.thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, logger=None):
+        # Detach first so nothing new is queued, then drain everything already queued.
+        if self.thread is None:
+            return
+        (logger or logging.getLogger()).removeHandler(self.queue_handler)
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+        self.handler.close()
+
+    def _run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self.handler.flush()
+                continue
+            if record is _STOP:
+                break
+            self.handler.handle(record)
+
+
+class FastLogger:
+    # Logger facade for hot paths. Each call first asks the logger's cached level check
+    # (Logger.isEnabledFor, invalidated by setLevel), so a filtered call builds nothing; messages
+    # take %-style arguments that are only formatted when a handler writes the record. INFO and
+    # DEBUG records can be thinned per message: keep 1 in sample_every and/or at most `rate` per
+    # second. The next record written for that message says how many were suppressed.
+    def __init__(self, logger=None, sample_every: int = 1, rate: float = None, clock=time.monotonic):
+        self.logger = logger if isinstance(logger, logging.Logger) else logging.getLogger(logger)
+        self.isEnabledFor = self.logger.isEnabledFor
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.configure(sample_every, rate)
+
+    def configure(self, sample_every: int = 1, rate: float = None):
+        with self.lock:
+            self.sample_every = max(int(sample_every), 1)
+            self.rate = rate
+            self.thinned = self.sample_every > 1 or bool(rate)
+            self.seen = {}
+            self.windows = {}
+            self.suppressed = {}
+
+    def debug(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.WARNING):
+            self.logger.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.ERROR):
+            self.logger.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        kwargs.setdefault('exc_info', True)
+        self.error(msg, *args, **kwargs)
+
+    def _log(self, level, msg, args, kwargs):
+        if self.thinned:
+            suppressed = self.admit(msg)
+            if suppressed is None:
+                return
+            if suppressed:
+                # args are now non-empty, so a literal % in an argument-less message must be escaped
+                msg = (msg if args else msg.replace('%', '%%')) + " (%d similar suppressed)"
+                args = args + (suppressed,)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def admit(self, msg):
+        # None drops the record; otherwise returns how many records of msg were dropped before it
+        with self.lock:
+            if msg not in self.seen and len(self.seen) >= MAX_SAMPLED_MESSAGES:
+                self.seen, self.windows, self.suppressed = {}, {}, {}
+            seen = self.seen.get(msg, 0)
+            self.seen[msg] = seen + 1
+            keep = seen % self.sample_every == 0
+            if keep and self.rate:
+                now = self.clock()
+                started, count = self.windows.get(msg, (now, 0))
+                if now - started >= 1.0:
+                    started, count = now, 0
+                keep = count < self.rate
+                self.windows[msg] = (started, count + keep)
+            if not keep:
+                self.suppressed[msg] = self.suppressed.get(msg, 0) + 1
+                return None
+            return self.suppressed.pop(msg, 0)
+
+
+_FACADES = {}
+
+
+def get_logger(name: str = None):
+    # One facade per logger name, like logging.getLogger
+    facade = _FACADES.get(name)
+    if facade is None:
+        facade = _FACADES.setdefault(name, FastLogger(name))
+    return facade
+
+
+def configure_sampling(settings):
+    # LOG_SAMPLING="app.commands=10,app.server=50/s" keeps 1 in 10 INFO records of each message
+    # on app.commands and at most 50 per second of each message on app.server.
+    for entry in (settings.get('LOG_SAMPLING') or '').split(','):
+        if not entry.strip():
+            continue
+        name, _, rule = entry.partition('=')
+        rule = rule.strip()
+        if rule.endswith('/s'):
+            get_logger(name.strip()).configure(rate=float(rule[:-2]))
+        else:
+            get_logger(name.strip()).configure(sample_every=int(rule))
+
+
+def start_file_pipeline(log_file_path, settings=None, logger=None):
+    # LOG_MAX_BYTES (0 disables size rotation), LOG_ROTATE_INTERVAL (seconds), LOG_COMPRESSION,
+    # LOG_BACKUP_COUNT and LOG_FORMAT=json|text control the file; LOG_BATCH_SIZE and
+    # LOG_FLUSH_INTERVAL control how often it is written.
+    settings = settings or {}
+    flush_interval = float(settings.get('LOG_FLUSH_INTERVAL') or DEFAULT_FLUSH_INTERVAL)
+    max_bytes = settings.get('LOG_MAX_BYTES')
+    interval = settings.get('LOG_ROTATE_INTERVAL')
+    backup_count = settings.get('LOG_BACKUP_COUNT')
+    handler = RotatingBatchingFileHandler(
+        log_file_path,
+        max_bytes=int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES,
+        interval=float(interval) if interval else None,
+        compression=(settings.get('LOG_COMPRESSION') or 'gzip').lower(),
+        backup_count=int(backup_count) if backup_count else None,
+        batch_size=int(settings.get('LOG_BATCH_SIZE') or DEFAULT_BATCH_SIZE),
+        flush_interval=flush_interval,
+    )
+    if (settings.get('LOG_FORMAT') or 'text').lower() == 'json':
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return LogPipeline(handler, flush_interval=flush_interval).start(logger)
@@ -0,0 +1,315 @@
+import os
+import re
+import sys
+import gzip
+import json
+import mmap
+import logging
+import argparse
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time as time_of_day
+from functools import lru_cache
+from app.logger import rotated_segments
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd segments are only written when it is installed
+    zstandard = None
+
+INDEX_VERSION = 1
+INDEX_DIRECTORY = '.index'  # next to the log; not picked up as a rotated segment
+DEFAULT_BLOCK_RECORDS = 256
+HEAD_BYTES = 64  # identifies a file, so a rotated or rewritten one is reindexed from scratch
+LEVELS = {logging.getLevelName(level): level
+          for level in (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL)}
+
+# '%(asctime)s - %(levelname)s - %(message)s'; lines that do not match continue the record above
+TEXT_HEADER = re.compile(r'(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) - ([A-Z]+) - (.*)')
+# Messages that name the command the following records belong to; calculator operations
+# ("Executing calculator operation: divide") count as commands of their own
+STARTS = re.compile(r'Executing command: (\S+)|Executing (\w+) command|Executing calculator operation: (\w+)')
+FINISHES = re.compile(r'Command (\S+) finished')
+JOBS = re.compile(r'Job \d+ \((\S+)\)')
+
+Record = namedtuple('Record', 'time level command text')
+
+
+@lru_cache(maxsize=4096)
+def _epoch(second: str):
+    # Consecutive records mostly share their second, so strptime runs about once per second of log
+    return datetime.strptime(second, '%Y-%m-%d %H:%M:%S').timestamp()
+
+
+def parse_header(line: str):
+    # (time, level, message, command field) for the first line of a record, None for a continuation
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            return float(entry['time']), entry['level'], entry['message'], entry.get('command')
+        except (ValueError, KeyError, TypeError):
+            return None
+    match = TEXT_HEADER.match(line)
+    if match is None:
+        return None
+    second, millis, level, message = match.groups()
+    return _epoch(second) + int(millis) / 1000, level, message, None
+
+
+def attribute(message: str, command: str, current: str):
+    # Text records rarely name their command, so each record belongs to the most recently started
+    # one ("Executing Divide command." then "Division by zero attempted."). Returns the record's
+    # command and the one carried to the next record.
+    started = STARTS.match(message)
+    if started:
+        current = next(name for name in started.groups() if name).lower()
+        return command or current, current
+    finished = FINISHES.match(message)
+    if finished:
+        return command or finished.group(1).lower(), None
+    job = JOBS.match(message)
+    if job:
+        return command or job.group(1).lower(), current
+    return command or current, current
+
+
+def scan(data, start: int, stop: int, current: str = None):
+    # Yields (offset, end, time, level, command, carried command) for each record in data[start:stop]
+    record = None
+    position = start
+    while position < stop:
+        newline = data.find(b'\n', position, stop)
+        end = stop if newline < 0 else newline + 1
+        header = parse_header(data[position:end].decode('utf-8', 'replace'))
+        if header is not None:
+            if record is not None:
+                yield tuple(record)
+            created, level, message, command = header
+            command, current = attribute(message, command, current)
+            record = [position, end, created, level, command, current]
+        elif record is not None:
+            record[1] = end
+        position = end
+    if record is not None:
+        yield tuple(record)
+
+
+class SegmentIndex:
+    # Sparse index over one log segment. Records are grouped into blocks of `block_records`; each
+    # block keeps its byte range, time span and the command carried into it, and every command
+    # and level maps to the blocks that contain it. A query reads only its candidate blocks.
+    def __init__(self, block_records: int = DEFAULT_BLOCK_RECORDS):
+        self.block_records = block_records
+        self.size = 0  # bytes indexed, always the end of a complete line
+        self.source = None  # on-disk size of a compressed segment, which never changes
+        self.head = ''
+        self.blocks = []  # [offset, end, first time, last time, carried command, records]
+        self.commands = {}
+        self.levels = {}
+
+    @classmethod
+    def load(cls, path: str, block_records: int = DEFAULT_BLOCK_RECORDS):
+        index = cls(block_records)
+        try:
+            with open(path, encoding='utf-8') as stored:
+                state = json.load(stored)
+        except (OSError, ValueError):
+            return index
+        if state.get('version') == INDEX_VERSION and state.get('block_records') == block_records:
+            for field in ('size', 'source', 'head', 'blocks', 'commands', 'levels'):
+                setattr(index, field, state[field])
+        return index
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state = {'version': INDEX_VERSION, 'block_records': self.block_records, 'size': self.size,
+                 'source': self.source, 'head': self.head, 'blocks': self.blocks,
+                 'commands': self.commands, 'levels': self.levels}
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as stored:
+            json.dump(state, stored, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    def reset(self):
+        self.size = 0
+        self.head = ''
+        self.blocks = []
+        self.commands = {}
+        self.levels = {}
+
+    def update(self, data):
+        # Indexes what was appended since the last update. The last block is reopened, so it can
+        # fill up; a file that shrank or starts differently (rotation) is indexed from scratch.
+        limit = data.rfind(b'\n') + 1
+        rewritten = limit < self.size or bytes(data[:len(self.head)]).decode('latin-1') != self.head
+        if rewritten:
+            self.reset()
+        if limit == self.size:
+            return rewritten
+        carried = None
+        if self.blocks:
+            offset, _, _, _, carried, _ = self.blocks.pop()
+            dropped = len(self.blocks)
+            for blocks in (*self.commands.values(), *self.levels.values()):
+                if blocks and blocks[-1] == dropped:
+                    blocks.pop()
+            self.size = offset
+        block = None
+        for offset, end, created, level, command, current in scan(data, self.size, limit, carried):
+            if block is None or block[5] >= self.block_records:
+                block = [offset, end, created, created, carried, 0]
+                self.blocks.append(block)
+            block[1] = end
+            block[2] = min(block[2], created)
+            block[3] = max(block[3], created)
+            block[5] += 1
+            number = len(self.blocks) - 1
+            for key, mapping in ((command, self.commands), (level, self.levels)):
+                if key is not None:
+                    blocks = mapping.setdefault(key, [])
+                    if not blocks or blocks[-1] != number:
+                        blocks.append(number)
+            carried = current
+        self.size = limit
+        self.head = bytes(data[:min(HEAD_BYTES, limit)]).decode('latin-1')
+        return True
+
+    def candidates(self, start: float = None, end: float = None, command: str = None, levels=None):
+        numbers = range(len(self.blocks)) if command is None else self.commands.get(command, ())
+        if levels is not None:
+            allowed = set()
+            for level in levels:
+                allowed.update(self.levels.get(level, ()))
+            numbers = [number for number in numbers if number in allowed]
+        return [self.blocks[number] for number in numbers
+                if (end is None or self.blocks[number][2] <= end) and (start is None or self.blocks[number][3] >= start)]
+
+
+class LogQuery:
+    # Queries the log App.configure_logging writes and its rotated segments, through one index
+    # per segment kept under logs/.index/. Plain segments are memory-mapped; compressed ones are
+    # only decompressed when their index says they hold a match.
+    def __init__(self, log_path: str = os.path.join('logs', 'app.log'), block_records: int = DEFAULT_BLOCK_RECORDS):
+        self.log_path = os.path.abspath(log_path)
+        self.index_directory = os.path.join(os.path.dirname(self.log_path), INDEX_DIRECTORY)
+        self.block_records = block_records
+        self.blocks_read = 0
+
+    def segments(self):
+        if not os.path.isdir(os.path.dirname(self.log_path)):
+            return []
+        segments = rotated_segments(self.log_path)
+        if os.path.exists(self.log_path):
+            segments.append(self.log_path)
+        return segments
+
+    def index_path(self, segment: str):
+        return os.path.join(self.index_directory, f"{os.path.basename(segment)}.json")
+
+    @staticmethod
+    @contextmanager
+    def open_segment(segment: str):
+        if segment.endswith('.gz'):
+            with gzip.open(segment, 'rb') as compressed:
+                yield compressed.read()
+        elif segment.endswith('.zst'):
+            if zstandard is None:
+                raise ValueError(f"zstandard is required to read {segment}.")
+            with open(segment, 'rb') as compressed:
+                yield zstandard.ZstdDecompressor().stream_reader(compressed).read()
+        elif os.path.getsize(segment) == 0:
+            yield b''
+        else:
+            with open(segment, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def index(self, segment: str):
+        # Brings the segment's stored index up to date and returns it
+        index = SegmentIndex.load(self.index_path(segment), self.block_records)
+        compressed = segment.endswith(('.gz', '.zst'))
+        source = os.path.getsize(segment)
+        if compressed and index.source == source:
+            return index
+        with self.open_segment(segment) as data:
+            changed = index.update(data)
+        if compressed:
+            index.source = source
+            changed = True
+        if changed:
+            index.save(self.index_path(segment))
+        return index
+
+    def prune_indexes(self, segments):
+        if not os.path.isdir(self.index_directory):
+            return
+        live = {os.path.basename(self.index_path(segment)) for segment in segments}
+        for entry in os.listdir(self.index_directory):
+            if entry not in live:
+                os.remove(os.path.join(self.index_directory, entry))
+
+    def search(self, start: float = None, end: float = None, command: str = None, level: str = None):
+        # Records from `start` to `end` (epoch seconds, both inclusive) of `command` at `level`
+        # or above, oldest first.
+        command = command.lower() if command else None
+        levels = None
+        if level is not None:
+            if level.upper() not in LEVELS:
+                raise ValueError(f"Unknown log level: {level}")
+            levels = [name for name, value in LEVELS.items() if value >= LEVELS[level.upper()]]
+        segments = self.segments()
+        self.prune_indexes(segments)
+        indexed = sorted(((self.index(segment), segment) for segment in segments),
+                         key=lambda pair: pair[0].blocks[0][2] if pair[0].blocks else 0)
+        self.blocks_read = 0
+        results = []
+        for index, segment in indexed:
+            blocks = index.candidates(start, end, command, levels)
+            if not blocks:
+                continue
+            with self.open_segment(segment) as data:
+                for offset, stop, _, _, carried, _ in blocks:
+                    self.blocks_read += 1
+                    for position, record_end, created, record_level, record_command, _ in scan(data, offset, stop, carried):
+                        if ((start is None or created >= start) and (end is None or created <= end)
+                                and (command is None or record_command == command)
+                                and (levels is None or record_level in levels)):
+                            text = data[position:record_end].decode('utf-8', 'replace').rstrip('\n')
+                            results.append(Record(created, record_level, record_command, text))
+        return results
+
+
+def parse_time(value: str, today: date = None):
+    # Epoch seconds, an ISO date and time, or a time of day ("10:05") meaning today
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return datetime.combine(today or date.today(), time_of_day.fromisoformat(value)).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.logger.query',
+                                     description="Search the application log and its rotated segments.")
+    parser.add_argument('--log', default=os.path.join('logs', 'app.log'), help="log file (default: logs/app.log)")
+    parser.add_argument('--since', type=parse_time, help="start time: epoch seconds, ISO date-time or HH:MM[:SS] today")
+    parser.add_argument('--until', type=parse_time, help="end time, inclusive; same formats as --since")
+    parser.add_argument('--command', help="only records of this command, e.g. divide")
+    parser.add_argument('--level', help="minimum level, e.g. error")
+    args = parser.parse_args(argv)
+    query = LogQuery(args.log)
+    try:
+        records = query.search(args.since, args.until, args.command, args.level)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for record in records:
+        print(record.text)
+    print(f"{len(records)} record(s) matched; read {query.blocks_read} index block(s).", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
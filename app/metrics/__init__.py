@@ -0,0 +1,150 @@
+import os
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; one extra slot catches everything slower (the +Inf bucket)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    # Counts live in a preallocated array, so observe() only bumps numbers in place.
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = array('Q', bytes(8 * (len(self.bounds) + 1)))
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float, failed: bool = False):
+        index = bisect_left(self.bounds, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if failed:
+                self.errors += 1
+
+    def percentile(self, fraction: float):
+        # Linear interpolation inside the bucket holding the requested rank
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max  # pragma: no cover - rank never exceeds the total count
+
+
+class Metrics:
+    # Latency histograms keyed by (family, label value), e.g. ('command', 'greet') or
+    # ('operation', 'divide'). A series is created on first use and reused afterwards.
+    FAMILIES = {'command': ('app_command', 'Command executions by the command handler'),
+                'operation': ('app_calculator_operation', 'Calculator operations')}
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def histogram(self, family: str, label: str):
+        key = (family, label)
+        histogram = self.series.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.series.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, family: str, label: str, seconds: float, failed: bool = False):
+        self.histogram(family, label).observe(seconds, failed)
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def render_prometheus(self):
+        lines = []
+        for family, (metric, description) in self.FAMILIES.items():
+            series = sorted((label, histogram) for (name, label), histogram in list(self.series.items()) if name == family)
+            if not series:
+                continue
+            lines.append(f"# HELP {metric}_duration_seconds {description}: latency.")
+            lines.append(f"# TYPE {metric}_duration_seconds histogram")
+            for label, histogram in series:
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_duration_seconds_bucket{{{family}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_duration_seconds_sum{{{family}="{label}"}} {histogram.total}')
+                lines.append(f'{metric}_duration_seconds_count{{{family}="{label}"}} {histogram.count}')
+            lines.append(f"# HELP {metric}_errors_total {description}: failures.")
+            lines.append(f"# TYPE {metric}_errors_total counter")
+            for label, histogram in series:
+                lines.append(f'{metric}_errors_total{{{family}="{label}"}} {histogram.errors}')
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_prometheus(self, path: str):
+        # Written to a temporary file and renamed, so a textfile collector never reads half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.render_prometheus())
+        os.replace(temporary, path)
+        return path
+
+    def summary(self):
+        rows = [f"{'name':<24}{'calls':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for (family, label), histogram in sorted(self.series.items()):
+            rows.append(f"{family + ':' + label:<24}{histogram.count:>8}{histogram.errors:>8}"
+                        f"{1000 * histogram.percentile(0.5):>10.2f}{1000 * histogram.percentile(0.95):>10.2f}"
+                        f"{1000 * histogram.percentile(0.99):>10.2f}{1000 * histogram.max:>10.2f}")
+        return "\n".join(rows)
+
+    def log_summary(self):
+        if self.series:
+            logging.info("Command latency summary:\n" + self.summary())
+
+    def serve(self, host: str = '127.0.0.1', port: int = 9100):
+        # Local /metrics endpoint for scraping, served from a daemon thread
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f"Metrics endpoint listening on http://{host}:{self.server.server_address[1]}/metrics.")
+        return self.server.server_address[1]
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+METRICS = Metrics()  # shared by the command handler and the calculator
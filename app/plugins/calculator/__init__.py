@@ -1,47 +1,260 @@
+import math
+import time
 import pkgutil
 import importlib
 import logging
-from app.commands import Command
+import threading
+from app.commands import Command, DEFAULT_CONTEXT, ExecutionContext, call_with_context
+from app.commands.context import accepts_context
+from app.metrics import METRICS
+from app.plugins.calculator.cache import ResultCache, result_key
+from app.plugins.calculator.history import CalculationHistory, OPERATIONS
+
+_MISSING = object()
+# Menu order; the operations are numbered from 1 and "Main Menu" comes after them
+MENU_OPERATIONS = ("add", "subtract", "multiply", "divide", "expression")
+MAIN_MENU = str(len(MENU_OPERATIONS) + 1)
 
 class CalculatorCommand(Command):
-    def __init__(self, plugins_package='app.plugins.calculator'):
+    def __init__(self, plugins_package='app.plugins.calculator', cache=None, history=None):
         self.plugins_package = plugins_package
-        self.operations = self.load_operations()
+        # Optional memoization layer (see cache.ResultCache), keyed on (operation, a, b); built
+        # from the CALCULATOR_CACHE_* settings on first use unless one is passed in
+        self.cache = cache
+        self.cache_configured = cache is not None
+        # Operations run through run() and the menu (see history.CalculationHistory); built from
+        # the CALCULATOR_HISTORY_* settings on first use
+        self.history = history
+        self.lock = threading.Lock()  # guards building the cache and history from settings
+        # Operation modules are imported on first use, not when the plugin is constructed
+        self._operations = None
+        self._kernels = None
+        self._expressions = None
+
+    @property
+    def operations(self):
+        if self._operations is None:
+            self._operations = self.load_operations()
+        return self._operations
+
+    @property
+    def kernels(self):
+        if self._kernels is None:
+            self._kernels = self.load_kernels()
+        return self._kernels
 
     def load_operations(self):
         operations = {}
-        # Fixed order: add, subtract, multiply, divide
-        order = ["add", "subtract", "multiply", "divide"]
-        for index, name in enumerate(order, start=1):
+        for index, name in enumerate(MENU_OPERATIONS, start=1):
             try:
                 plugin_module = importlib.import_module(f"{self.plugins_package}.{name}")
                 # Expect a class named with the first letter capitalized (e.g. Add, Subtract, etc.)
                 class_name = name.capitalize()
                 command_class = getattr(plugin_module, class_name, None)
                 if command_class:
-                    operations[str(index)] = command_class()
+                    # Expressions share the calculator's compiler, and so its plan cache
+                    operation = command_class(self.expressions) if name == 'expression' else command_class()
+                    operations[str(index)] = operation
                     logging.info(f"Loaded calculator operation: {name}")
             except Exception as e:
                 logging.error(f"Error loading calculator operation {name}: {e}")
         return operations
 
-    def execute(self):
+    def load_kernels(self):
+        # Map operation names (add, subtract, ...) straight to their pure compute functions,
+        # so programmatic callers skip the prompts, prints and per-call log lines.
+        kernels = {}
+        for operation in self.operations.values():
+            compute = getattr(operation, 'compute', None)
+            if compute:
+                kernels[operation.__class__.__name__.lower()] = compute
+        return kernels
+
+    def get_kernel(self, op: str):
+        try:
+            return self.kernels[op]
+        except KeyError:
+            raise ValueError(f"Unknown calculator operation: {op}") from None
+
+    def calculate(self, op: str, a: float, b: float):
+        kernel = self.get_kernel(op)
+        if self.cache is None:
+            return kernel(a, b)
+        key = result_key(op, a, b)
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = kernel(a, b)
+            self.cache.put(key, result)
+        return result
+
+    def calculate_many(self, op: str, pairs):
+        if self.cache is not None:
+            return [self.calculate(op, a, b) for a, b in pairs]
+        kernel = self.get_kernel(op)
+        return [kernel(a, b) for a, b in pairs]
+
+    def run(self, args, context=None):
+        # Scripted form: "add 3 4", or "expression '(a + b) * c' a=1 b=2 c=3"
+        context = context or DEFAULT_CONTEXT
+        if not args:
+            return self.execute(context)
+        op, *operands = args
+        if op in ('history', 'stats'):
+            return self.report_history(op, operands, context)
+        self.get_cache(context.settings)
+        # Marks the records that follow as this operation's for the log query tool (see app.logger.query)
+        context.logger.info("Executing calculator operation: %s", op, extra={'command': op})
+        started = time.perf_counter()
+        try:
+            if op == 'expression':
+                result = self.evaluate(*operands)
+            else:
+                if len(operands) != 2:
+                    raise ValueError(f"{op} takes exactly two operands.")
+                result = self.calculate(op, float(operands[0]), float(operands[1]))
+        except ZeroDivisionError:
+            self.observe(op, started, failed=True)
+            self.remember(context, op, operands, status='division by zero')
+            context.logger.error("Division by zero attempted.", extra={'command': op})
+            context.fail("Cannot divide by zero.")
+            return None
+        except ValueError:
+            self.observe(op, started, failed=True)
+            self.remember(context, op, operands, status='invalid')
+            raise
+        self.observe(op, started)
+        self.remember(context, op, operands, result)
+        context.print(f"The result is {result}")
+        return result
+
+    @staticmethod
+    def status(op: str, replies, result):
+        if result is not None:
+            return 'ok'
+        try:
+            zero_denominator = op == 'divide' and len(replies) == 2 and float(replies[1]) == 0
+        except ValueError:
+            zero_denominator = False
+        return 'division by zero' if zero_denominator else 'invalid'
+
+    def observe(self, op: str, started: float, failed: bool = False):
+        # Mistyped operation names get no series of their own
+        if op == 'expression' or op in self.kernels:
+            METRICS.observe('operation', op, time.perf_counter() - started, failed)
+
+    def get_cache(self, settings):
+        with self.lock:
+            if not self.cache_configured:
+                self.cache = ResultCache.from_settings(settings)
+                self.cache_configured = True
+            return self.cache
+
+    def close(self):
+        # The history file is closed; the next use reopens it from the settings
+        with self.lock:
+            history, self.history = self.history, None
+        if self.cache is not None:
+            self.cache.log_stats()
+        if history is not None:
+            history.close()
+
+    def get_history(self, settings):
+        with self.lock:
+            if self.history is None:
+                self.history = CalculationHistory.from_settings(settings)
+            return self.history
+
+    def remember(self, context, op: str, operands, result=None, status: str = 'ok'):
+        # Like observe(), mistyped operation names are not recorded. Operands that are not
+        # numbers (and those of expressions) are stored as NaN.
+        if op not in OPERATIONS:
+            return
+        values = [math.nan, math.nan]
+        if op != 'expression':
+            for position, operand in enumerate(operands[:2]):
+                try:
+                    values[position] = float(operand)
+                except ValueError:
+                    pass
+        self.get_history(context.settings).record(op, *values, result, status)
+
+    def report_history(self, op: str, operands, context):
+        # "calculator history [N]" lists the latest N calculations; "calculator stats [operation]" sums them up
+        history = self.get_history(context.settings)
+        if op == 'history':
+            count = int(operands[0]) if operands else 10
+            entries = history.last(count)
+            for entry in entries:
+                line = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.timestamp))} {entry.op}"
+                if entry.op != 'expression':
+                    line += f" {entry.a:g} {entry.b:g}"
+                line += f" = {entry.result:g}" if entry.status == 'ok' else f" failed ({entry.status})"
+                context.print(line)
+            return len(entries)
+        name = operands[0] if operands else None
+        if name is not None and name not in OPERATIONS:
+            raise ValueError(f"Unknown calculator operation: {name}")
+        stats = history.aggregate(name)
+        summary = f"{name or 'all'}: {stats['count']} calculation(s), {stats['failed']} failed"
+        if stats['mean'] is not None:
+            summary += f", sum {stats['sum']:g}, min {stats['min']:g}, max {stats['max']:g}, mean {stats['mean']:g}"
+        context.print(summary + ".")
+        return stats
+
+    @property
+    def expressions(self):
+        if self._expressions is None:
+            from app.plugins.calculator.expression import ExpressionCompiler
+            self._expressions = ExpressionCompiler(self)
+        return self._expressions
+
+    def evaluate(self, expression: str = None, *assignments):
+        if expression is None:
+            raise ValueError("expression needs a formula, e.g. expression 'a + b' a=1 b=2")
+        values = {}
+        for assignment in assignments:
+            name, separator, value = assignment.partition('=')
+            if not separator:
+                raise ValueError(f"Expected name=value, got {assignment!r}.")
+            values[name.strip()] = float(value)
+        return self.expressions.evaluate(expression, **values)
+
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
         while True:
-            print("\nCalculator Operations:")
+            context.print("\nCalculator Operations:")
             for key in sorted(self.operations.keys(), key=int):
                 operation_name = self.operations[key].__class__.__name__
-                print(f"{key}. {operation_name}")
-            print("5. Main Menu")  # Option to return to main menu
+                context.print(f"{key}. {operation_name}")
+            context.print(f"{MAIN_MENU}. Main Menu")  # Option to return to main menu
 
-            choice = input("Select an operation: ").strip()
-            if choice == '5':
-                logging.info("Returning to Main Menu from CalculatorCommand.")
+            choice = context.input("Select an operation: ").strip()
+            if choice == MAIN_MENU:
+                context.logger.info("Returning to Main Menu from CalculatorCommand.")
                 break  # Return to main menu
 
             operation = self.operations.get(choice)
             if operation:
-                logging.info(f"Executing calculator operation: {operation.__class__.__name__}")
-                operation.execute()
+                operation_name = operation.__class__.__name__
+                context.logger.info("Executing calculator operation: %s", operation_name,
+                                    extra={'command': operation_name.lower()})
+                # The operation prompts for its own operands; keep the replies for the history.
+                # Legacy operations read stdin themselves, so theirs are not seen.
+                replies = []
+
+                def answer(prompt):
+                    replies.append(context.input(prompt))
+                    return replies[-1]
+                if accepts_context(operation.execute):
+                    recording = ExecutionContext(answer, context.output, context.logger, context.settings)
+                else:
+                    recording = context
+                started = time.perf_counter()
+                result = call_with_context(operation.execute, recording)
+                # Operations return None when they reported bad input or a division by zero
+                name = operation_name.lower()
+                self.observe(name, started, failed=result is None)
+                self.remember(context, name, replies, result, self.status(name, replies, result))
             else:
-                logging.warning("Invalid selection in CalculatorCommand.")
-                print("Invalid selection. Please try again.")
+                context.logger.warning("Invalid selection in CalculatorCommand.")
+                context.print("Invalid selection. Please try again.")
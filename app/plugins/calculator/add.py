@@ -1,15 +1,21 @@
-import logging
-from app.commands import Command
+from app.commands import Command, DEFAULT_CONTEXT
 
 class Add(Command):
-    def execute(self):
-        logging.info("Executing Add command.")
+    @staticmethod
+    def compute(a, b):
+        return a + b
+
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing Add command.")
         try:
-            a = float(input("Enter first number: "))
-            b = float(input("Enter second number: "))
-            result = a + b
-            print(f"The result is {result}")
-            logging.info(f"Addition result: {result}")
+            a = float(context.input("Enter first number: "))
+            b = float(context.input("Enter second number: "))
+            result = self.compute(a, b)
+            context.print(f"The result is {result}")
+            context.logger.info("Addition result: %s", result)
+            return result
         except ValueError:
-            logging.error("Invalid input for addition.")
-            print("Invalid input. Please enter numeric values.")
+            context.logger.error("Invalid input for addition.")
+            context.print("Invalid input. Please enter numeric values.")
+            return None
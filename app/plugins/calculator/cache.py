@@ -0,0 +1,116 @@
+import sys
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+_MISSING = object()
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def result_key(op: str, a: float, b: float):
+    # -0.0 == 0.0 and both hash alike, but multiply(-0.0, 5) is -0.0: a zero operand keeps its sign
+    if a == 0 or b == 0:
+        return (op, a, b, math.copysign(1.0, a), math.copysign(1.0, b))
+    return (op, a, b)
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = None, ttl: float = None, clock=time.monotonic):
+        # LRU order is kept by the OrderedDict; ttl (seconds) additionally expires stale entries.
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (value, expires_at, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        # Returns None (no caching) unless one of the CALCULATOR_CACHE_* settings is present. The
+        # entry cap always applies: expired entries are only dropped as they are met.
+        size = settings.get('CALCULATOR_CACHE_SIZE')
+        max_bytes = settings.get('CALCULATOR_CACHE_BYTES')
+        ttl = settings.get('CALCULATOR_CACHE_TTL')
+        if not (size or max_bytes or ttl):
+            return None
+        return cls(max_entries=int(size) if size else DEFAULT_MAX_ENTRIES,
+                   max_bytes=int(max_bytes) if max_bytes else None,
+                   ttl=float(ttl) if ttl else None)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self._get(key, default)
+
+    def put(self, key, value):
+        with self.lock:
+            self._put(key, value)
+
+    def _get(self, key, default):
+        entry = self.entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _put(self, key, value):
+        if key in self.entries:
+            self._remove(key)
+        expires_at = None
+        if self.ttl is not None:
+            now = self.clock()
+            expires_at = now + self.ttl
+            # The least recently used entries sit at the head; drop those that have expired
+            while self.entries:
+                head = next(iter(self.entries))
+                if self.entries[head][1] > now:
+                    break
+                self._remove(head)
+                self.expirations += 1
+        size = self.entry_size(key, value)
+        self.entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while self.entries and self._over_budget():
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations, 'entries': len(self.entries), 'bytes': self.bytes}
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info("Calculator cache stats: " + ", ".join(f"{name}={value}" for name, value in stats.items()))
+        return stats
+
+    @staticmethod
+    def entry_size(key, value):
+        return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(value)
+
+    def _over_budget(self):
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.bytes > self.max_bytes
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
@@ -1,19 +1,42 @@
-import logging
-from app.commands import Command
+from array import array
+from app.commands import Command, DEFAULT_CONTEXT
+from app.plugins.calculator import batch
 
 class Divide(Command):
-    def execute(self):
-        logging.info("Executing Divide command.")
+    @staticmethod
+    def compute(a, b):
+        # Raises ZeroDivisionError for a zero denominator; callers decide how to report it.
+        return a / b
+
+    @staticmethod
+    def compute_batch(numerators, denominators):
+        # Vectorized zero-denominator check: failed rows are flagged in the mask and left as NaN.
+        np = batch.np
+        if np is not None:
+            failed = denominators == 0
+            results = np.divide(numerators, np.where(failed, 1.0, denominators))
+            results[failed] = np.nan
+            return results, failed
+        failed = bytearray(d == 0 for d in denominators)
+        results = array('d', (float('nan') if zero else n / d
+                              for n, d, zero in zip(numerators, denominators, failed)))
+        return results, failed
+
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing Divide command.")
         try:
-            a = float(input("Enter numerator: "))
-            b = float(input("Enter denominator: "))
+            a = float(context.input("Enter numerator: "))
+            b = float(context.input("Enter denominator: "))
             if b == 0:
-                logging.error("Division by zero attempted.")
-                print("Cannot divide by zero.")
-                return
-            result = a / b
-            print(f"The result is {result}")
-            logging.info(f"Division result: {result}")
+                context.logger.error("Division by zero attempted.")
+                context.print("Cannot divide by zero.")
+                return None
+            result = self.compute(a, b)
+            context.print(f"The result is {result}")
+            context.logger.info("Division result: %s", result)
+            return result
         except ValueError:
-            logging.error("Invalid input for division.")
-            print("Invalid input. Please enter numeric values.")
+            context.logger.error("Invalid input for division.")
+            context.print("Invalid input. Please enter numeric values.")
+            return None
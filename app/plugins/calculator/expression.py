@@ -0,0 +1,164 @@
+import re
+import threading
+from collections import OrderedDict
+from app.commands import Command, DEFAULT_CONTEXT
+from app.plugins.calculator import CalculatorCommand
+
+DEFAULT_CACHE_SIZE = 256
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(.))")
+OPERATORS = {'+': 'add', '-': 'subtract', '*': 'multiply', '/': 'divide'}
+
+
+def tokenize(source: str):
+    tokens = []
+    for number, name, symbol in TOKEN_PATTERN.findall(source):
+        if number:
+            tokens.append(('num', float(number)))
+        elif name:
+            tokens.append(('var', name))
+        elif symbol in OPERATORS or symbol in '()':
+            tokens.append(('op', symbol))
+        elif symbol.strip():
+            raise ValueError(f"Unexpected character {symbol!r} in expression.")
+    return tokens
+
+
+class Parser:
+    # Recursive descent over the usual precedence levels; the AST is nested tuples:
+    # ('num', value), ('var', name) and ('binop', op_name, left, right).
+    def __init__(self, source: str):
+        self.tokens = tokenize(source)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty expression.")
+        node = self.expression()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.tokens[self.position][1]!r} in expression.")
+        return node
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            symbol = self.tokens[self.position][1]
+            self.position += 1
+            node = ('binop', OPERATORS[symbol], node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            symbol = self.tokens[self.position][1]
+            self.position += 1
+            node = ('binop', OPERATORS[symbol], node, self.factor())
+        return node
+
+    def factor(self):
+        kind, value = self.peek()
+        self.position += 1
+        if kind in ('num', 'var'):
+            return (kind, value)
+        if (kind, value) == ('op', '-'):
+            return ('binop', 'subtract', ('num', 0.0), self.factor())
+        if (kind, value) == ('op', '+'):
+            return self.factor()
+        if (kind, value) == ('op', '('):
+            node = self.expression()
+            if self.peek() != ('op', ')'):
+                raise ValueError("Missing closing parenthesis in expression.")
+            self.position += 1
+            return node
+        raise ValueError("Unexpected end of expression." if kind is None else f"Unexpected token {value!r} in expression.")
+
+
+class CompiledExpression:
+    def __init__(self, source: str, function, variables):
+        self.source = source
+        self.function = function
+        self.variables = variables
+
+    def __call__(self, **values):
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise ValueError(f"Missing values for: {', '.join(missing)}")
+        return self.function(values)
+
+
+class ExpressionCompiler:
+    def __init__(self, calculator=None, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.calculator = calculator or CalculatorCommand()
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def compile(self, source: str):
+        # Parse once per distinct formula; repeat submissions are served from the LRU cache.
+        key = source.strip()
+        with self.lock:
+            compiled = self.cache.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return compiled
+            self.misses += 1
+        variables = []
+        function = self._compile_node(Parser(key).parse(), variables)
+        compiled = CompiledExpression(key, function, tuple(variables))
+        with self.lock:
+            self.cache[key] = compiled
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return compiled
+
+    def evaluate(self, source: str, **values):
+        return self.compile(source)(**values)
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.cache), 'maxsize': self.maxsize}
+
+    def _compile_node(self, node, variables):
+        # Closure chain: every node becomes a function of the variable mapping.
+        kind = node[0]
+        if kind == 'num':
+            value = node[1]
+            return lambda values: value
+        if kind == 'var':
+            name = node[1]
+            if name not in variables:
+                variables.append(name)
+            return lambda values: values[name]
+        kernel = self.calculator.get_kernel(node[1])
+        left = self._compile_node(node[2], variables)
+        right = self._compile_node(node[3], variables)
+        return lambda values: kernel(left(values), right(values))
+
+
+class Expression(Command):
+    def __init__(self, compiler=None):
+        self.compiler = compiler or ExpressionCompiler()
+
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing Expression command.")
+        try:
+            compiled = self.compiler.compile(context.input("Enter expression: "))
+            values = {name: float(context.input(f"Enter value for {name}: ")) for name in compiled.variables}
+            result = compiled(**values)
+            context.print(f"The result is {result}")
+            context.logger.info("Expression result: %s", result)
+            return result
+        except ZeroDivisionError:
+            context.logger.error("Division by zero attempted.")
+            context.print("Cannot divide by zero.")
+        except ValueError as e:
+            context.logger.error("Invalid expression input: %s", e)
+            context.print(f"Invalid input. {e}")
+        return None
@@ -0,0 +1,188 @@
+import os
+import math
+import mmap
+import time
+import struct
+import threading
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+
+DEFAULT_CAPACITY = 1000
+OPERATIONS = ('add', 'subtract', 'multiply', 'divide', 'expression')  # op code = position + 1
+STATUSES = ('ok', 'invalid', 'division by zero')
+MAGIC = b'CALCHST1'
+RECORD = struct.Struct('<ddddBB6x')  # timestamp, a, b, result, op code, status: 40 bytes, 8-aligned
+
+Entry = namedtuple('Entry', 'timestamp op a b result status')
+
+
+def op_code(op: str):
+    return OPERATIONS.index(op) + 1
+
+
+def make_entry(timestamp, code, a, b, result, status):
+    return Entry(timestamp, OPERATIONS[code - 1], a, b, result, STATUSES[status])
+
+
+def aggregate(rows, code: int = None):
+    # rows are (op code, status, result); successful results are summed, failures only counted
+    count = failed = 0
+    total = 0.0
+    low = high = None
+    for row_code, status, result in rows:
+        if code is not None and row_code != code:
+            continue
+        count += 1
+        if status:
+            failed += 1
+            continue
+        total += result
+        low = result if low is None or result < low else low
+        high = result if high is None or result > high else high
+    succeeded = count - failed
+    return {'count': count, 'failed': failed, 'sum': total, 'min': low, 'max': high,
+            'mean': total / succeeded if succeeded else None}
+
+
+class HistoryBuffer:
+    # Fixed-capacity ring of the latest calculations, one typed array per field, so memory stays
+    # at 34 bytes a slot however long the process runs. Once full, each append overwrites the oldest.
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("History capacity must be a positive integer.")
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.a = array('d', bytes(8 * capacity))
+        self.b = array('d', bytes(8 * capacity))
+        self.results = array('d', bytes(8 * capacity))
+        self.ops = array('B', bytes(capacity))
+        self.statuses = array('B', bytes(capacity))
+        self.next = 0
+        self.total = 0  # appended since start, including overwritten ones
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp: float, code: int, a: float, b: float, result: float, status: int):
+        with self.lock:
+            slot = self.next
+            self.timestamps[slot] = timestamp
+            self.a[slot] = a
+            self.b[slot] = b
+            self.results[slot] = result
+            self.ops[slot] = code
+            self.statuses[slot] = status
+            self.next = (slot + 1) % self.capacity
+            self.total += 1
+
+    def last(self, n: int):
+        # Newest first
+        with self.lock:
+            slots = [(self.next - offset) % self.capacity for offset in range(1, min(n, len(self)) + 1)]
+            return [make_entry(self.timestamps[slot], self.ops[slot], self.a[slot], self.b[slot],
+                               self.results[slot], self.statuses[slot]) for slot in slots]
+
+    def aggregate(self, code: int = None):
+        with self.lock:
+            size = len(self)
+            return aggregate(zip(self.ops[:size], self.statuses[:size], self.results[:size]), code)
+
+
+class HistoryFile:
+    # Append-only file: an 8-byte header, then fixed-size records. Nothing is ever rewritten;
+    # queries memory-map the file and unpack only the records they need.
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.handle = open(path, 'ab')
+        size = self.handle.tell()
+        if size == 0:
+            self.handle.write(MAGIC)
+            self.handle.flush()
+            return
+        with open(path, 'rb') as existing:
+            if existing.read(len(MAGIC)) != MAGIC:
+                self.handle.close()
+                raise ValueError(f"{path} is not a calculator history file.")
+        # A record cut short by a crash would misalign every later append
+        whole = len(MAGIC) + (size - len(MAGIC)) // RECORD.size * RECORD.size
+        if whole != size:
+            self.handle.truncate(whole)
+
+    def append(self, timestamp: float, code: int, a: float, b: float, result: float, status: int):
+        with self.lock:
+            self.handle.write(RECORD.pack(timestamp, a, b, result, code, status))
+            self.handle.flush()
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - len(MAGIC)) // RECORD.size
+
+    @contextmanager
+    def records(self):
+        # The whole-record region of the file as a read-only memoryview
+        count = len(self)
+        if not count:
+            yield memoryview(b'')
+            return
+        with open(self.path, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[len(MAGIC):len(MAGIC) + count * RECORD.size]
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def last(self, n: int):
+        # Newest first, unpacking only the last n records
+        with self.records() as view:
+            count = len(view) // RECORD.size
+            entries = []
+            for index in range(count - 1, max(count - n, 0) - 1, -1):
+                timestamp, a, b, result, code, status = RECORD.unpack_from(view, index * RECORD.size)
+                entries.append(make_entry(timestamp, code, a, b, result, status))
+            return entries
+
+    def aggregate(self, code: int = None):
+        with self.records() as view:
+            return aggregate(((row[4], row[5], row[3]) for row in RECORD.iter_unpack(view)), code)
+
+    def close(self):
+        self.handle.close()
+
+
+class CalculationHistory:
+    # Every calculation goes into the in-memory ring; with a file configured it is also appended
+    # to disk, which then answers queries reaching past the ring and survives restarts.
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, path: str = None, clock=time.time):
+        self.buffer = HistoryBuffer(capacity)
+        self.file = HistoryFile(path) if path else None
+        self.clock = clock
+
+    @classmethod
+    def from_settings(cls, settings):
+        # CALCULATOR_HISTORY_SIZE sets the ring's capacity; CALCULATOR_HISTORY_FILE turns on persistence.
+        size = settings.get('CALCULATOR_HISTORY_SIZE')
+        return cls(int(size) if size else DEFAULT_CAPACITY, settings.get('CALCULATOR_HISTORY_FILE') or None)
+
+    def record(self, op: str, a: float = math.nan, b: float = math.nan, result: float = None, status: str = 'ok'):
+        row = (self.clock(), op_code(op), a, b, math.nan if result is None else result, STATUSES.index(status))
+        self.buffer.append(*row)
+        if self.file is not None:
+            self.file.append(*row)
+
+    def last(self, n: int):
+        if self.file is None or n <= len(self.buffer):
+            return self.buffer.last(n)
+        return self.file.last(n)
+
+    def aggregate(self, op: str = None):
+        code = op_code(op) if op is not None else None
+        return (self.buffer if self.file is None else self.file).aggregate(code)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
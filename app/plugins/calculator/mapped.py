@@ -0,0 +1,87 @@
+import os
+import mmap
+import logging
+from contextlib import ExitStack
+from app.plugins.calculator import batch
+from app.plugins.calculator.batch import BatchCalculator
+
+ITEM_SIZE = 8  # raw operand and result files are flat native float64
+DEFAULT_CHUNK_ROWS = 1 << 16
+
+
+class MappedCalculator:
+    def __init__(self, calculator, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be a positive integer.")
+        self.engine = BatchCalculator(calculator)
+        self.chunk_rows = chunk_rows
+
+    def calculate(self, op: str, a_path: str, b_path: str, out_path: str):
+        # Streams results chunk by chunk from two memory-mapped operand files into a memory-mapped
+        # output file, so only one chunk of each column is ever resident. Failed rows are NaN.
+        self.engine.calculator.get_kernel(op)  # an unknown op must not truncate the output file
+        with ExitStack() as stack:
+            a = self._open_operand(a_path, stack)
+            b = self._open_operand(b_path, stack)
+            if len(a) != len(b):
+                raise ValueError(f"Operand files differ in length: {len(a)} != {len(b)}")
+            rows = len(a)
+            out = self._open_output(out_path, rows, stack)
+            failed_rows = 0
+            for start in range(0, rows, self.chunk_rows):
+                stop = min(start + self.chunk_rows, rows)
+                a_chunk, b_chunk = a[start:stop], b[start:stop]
+                try:
+                    results, failed = self.engine.calculate(op, a_chunk, b_chunk)
+                    out[start:stop] = results
+                    failed_rows += batch.count_failed(failed)
+                finally:
+                    # Exported slices keep the mmap open; a traceback holding them would turn
+                    # the real error into a BufferError when the ExitStack closes the map.
+                    for chunk in (a_chunk, b_chunk):
+                        if isinstance(chunk, memoryview):
+                            chunk.release()
+        logging.info(f"Mapped {op} wrote {rows} rows to {out_path} ({failed_rows} failed).")
+        return rows, failed_rows
+
+    @staticmethod
+    def _open_operand(path: str, stack: ExitStack):
+        if path.endswith('.npy'):
+            np = MappedCalculator._require_numpy(path)
+            column = np.load(path, mmap_mode='r')
+            if column.ndim != 1 or column.dtype != np.float64:
+                raise ValueError(f"{path} must hold a one-dimensional float64 array.")
+            return column
+        size = os.path.getsize(path)
+        if size % ITEM_SIZE:
+            raise ValueError(f"{path} is not a raw float64 file (size {size} is not a multiple of {ITEM_SIZE}).")
+        if size == 0:
+            return memoryview(b'').cast('d')
+        handle = stack.enter_context(open(path, 'rb'))
+        mapped = stack.enter_context(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+        view = memoryview(mapped).cast('d')
+        stack.callback(view.release)
+        return view
+
+    @staticmethod
+    def _open_output(path: str, rows: int, stack: ExitStack):
+        if path.endswith('.npy'):
+            np = MappedCalculator._require_numpy(path)
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(rows,))
+            stack.callback(out.flush)
+            return out
+        handle = stack.enter_context(open(path, 'w+b'))
+        handle.truncate(rows * ITEM_SIZE)
+        if rows == 0:
+            return memoryview(bytearray()).cast('d')
+        mapped = stack.enter_context(mmap.mmap(handle.fileno(), rows * ITEM_SIZE))
+        stack.callback(mapped.flush)
+        view = memoryview(mapped).cast('d')
+        stack.callback(view.release)
+        return view
+
+    @staticmethod
+    def _require_numpy(path: str):
+        if batch.np is None:
+            raise ValueError(f"NumPy is required to memory-map {path}.")
+        return batch.np
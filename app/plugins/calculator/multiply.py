@@ -1,15 +1,21 @@
-import logging
-from app.commands import Command
+from app.commands import Command, DEFAULT_CONTEXT
 
 class Multiply(Command):
-    def execute(self):
-        logging.info("Executing Multiply command.")
+    @staticmethod
+    def compute(a, b):
+        return a * b
+
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing Multiply command.")
         try:
-            a = float(input("Enter first number: "))
-            b = float(input("Enter second number: "))
-            result = a * b
-            print(f"The result is {result}")
-            logging.info(f"Multiplication result: {result}")
+            a = float(context.input("Enter first number: "))
+            b = float(context.input("Enter second number: "))
+            result = self.compute(a, b)
+            context.print(f"The result is {result}")
+            context.logger.info("Multiplication result: %s", result)
+            return result
         except ValueError:
-            logging.error("Invalid input for multiplication.")
-            print("Invalid input. Please enter numeric values.")
+            context.logger.error("Invalid input for multiplication.")
+            context.print("Invalid input. Please enter numeric values.")
+            return None
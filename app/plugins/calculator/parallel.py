@@ -0,0 +1,98 @@
+import os
+import csv
+import json
+import logging
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from app.plugins.calculator import CalculatorCommand
+
+DEFAULT_CHUNK_SIZE = 1000
+INVALID_ROW = None  # stands in for a row that could not be parsed; its result is None
+
+# Per-process state, filled in once by the pool initializer
+_worker = {}
+
+
+def _init_worker(plugins_package: str):
+    # Pre-warm each worker with the operation table so chunks only pay for the arithmetic.
+    calculator = CalculatorCommand(plugins_package)
+    if not calculator.kernels:
+        logging.warning("Calculator worker started without any operations loaded.")
+    _worker['calculator'] = calculator
+
+
+def _run_chunk(rows):
+    calculator = _worker['calculator']
+    results = []
+    for row in rows:
+        if row is INVALID_ROW:
+            results.append(None)
+            continue
+        op, a, b = row
+        try:
+            results.append(calculator.calculate(op, a, b))
+        except (ArithmeticError, ValueError):
+            results.append(None)
+    return results
+
+
+def parse_rows(lines, fmt: str = 'csv'):
+    # Yields (op, a, b) tuples from CSV rows of op,a,b or JSONL objects {"op": ..., "a": ..., "b": ...}.
+    # A malformed row yields INVALID_ROW, so it fails on its own instead of aborting the job.
+    if fmt == 'jsonl':
+        for line in lines:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                    yield record['op'], float(record['a']), float(record['b'])
+                except (ValueError, KeyError, TypeError):
+                    yield INVALID_ROW
+    elif fmt == 'csv':
+        for row in csv.reader(lines):
+            if not row or row[0].strip() == 'op':
+                continue
+            try:
+                op, a, b = row
+                yield op.strip(), float(a), float(b)
+            except ValueError:
+                yield INVALID_ROW
+    else:
+        raise ValueError(f"Unsupported job format: {fmt}")
+
+
+def chunked(rows, size: int):
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class ParallelCalculator:
+    def __init__(self, settings=None, plugins_package='app.plugins.calculator'):
+        settings = settings or {}
+        self.plugins_package = plugins_package
+        self.workers = int(settings.get('CALCULATOR_WORKERS') or os.cpu_count() or 1)
+        self.chunk_size = int(settings.get('CALCULATOR_CHUNK_SIZE') or DEFAULT_CHUNK_SIZE)
+        if self.workers < 1 or self.chunk_size < 1:
+            raise ValueError("CALCULATOR_WORKERS and CALCULATOR_CHUNK_SIZE must be positive integers.")
+
+    def run(self, rows):
+        # Results come back in input order; rows that fail (e.g. division by zero) yield None.
+        # At most two chunks per worker are in flight, so the input is never parsed all at once.
+        results = []
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.plugins_package,)) as executor:
+            for chunk in chunked(rows, self.chunk_size):
+                pending.append(executor.submit(_run_chunk, chunk))
+                if len(pending) >= self.workers * 2:
+                    results.extend(pending.popleft().result())
+            while pending:
+                results.extend(pending.popleft().result())
+        logging.info(f"Parallel calculator processed {len(results)} rows on {self.workers} workers.")
+        return results
+
+    def run_file(self, path: str):
+        fmt = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+        with open(path, newline='', encoding='utf-8') as handle:
+            return self.run(parse_rows(handle, fmt))
@@ -0,0 +1,51 @@
+import logging
+
+
+def _fuse(steps):
+    # One function for a run of consecutive elementwise stages, so each item takes a single pass.
+    if len(steps) == 1:
+        kernel, operand = steps[0]
+        return lambda value: kernel(value, operand)
+
+    def fused(value):
+        for kernel, operand in steps:
+            value = kernel(value, operand)
+        return value
+    return fused
+
+
+class Pipeline:
+    def __init__(self, calculator, stages=()):
+        self.calculator = calculator
+        self.stages = tuple(stages)
+
+    def then(self, op: str, operand: float):
+        # Builders are immutable: each stage returns a new Pipeline sharing the earlier stages.
+        self.calculator.get_kernel(op)
+        return Pipeline(self.calculator, self.stages + (('map', op, operand),))
+
+    def where(self, predicate):
+        return Pipeline(self.calculator, self.stages + (('filter', predicate, None),))
+
+    def compile(self):
+        segments = []
+        steps = []
+        for kind, target, operand in self.stages:
+            if kind == 'map':
+                steps.append((self.calculator.get_kernel(target), operand))
+                continue
+            if steps:
+                segments.append(('map', _fuse(steps)))
+                steps = []
+            segments.append(('filter', target))
+        if steps:
+            segments.append(('map', _fuse(steps)))
+        logging.info(f"Compiled pipeline of {len(self.stages)} stages into {len(segments)} passes.")
+        return segments
+
+    def run(self, values):
+        # Lazy end to end: nothing is pulled from values until the caller iterates the result.
+        stream = map(float, values)
+        for kind, function in self.compile():
+            stream = map(function, stream) if kind == 'map' else filter(function, stream)
+        return stream
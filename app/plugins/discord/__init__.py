@@ -1,7 +1,63 @@
 import logging
-from app.commands import Command
+import threading
+from app.commands import Command, DEFAULT_CONTEXT
+from app.plugins.discord.webhook import DiscordNotifier
 
 class DiscordCommand(Command):
-    def execute(self):
-        logging.info("Executing DiscordCommand.")
-        print("I will send something to Discord.")
+    background = True
+    max_concurrency = 2
+    timeout = 30.0
+
+    def __init__(self, notifier=None):
+        self.notifier = notifier  # built from the DISCORD_* settings on first use and kept for its pools
+        self.notifier_lock = threading.Lock()
+
+    def get_notifier(self, settings):
+        with self.notifier_lock:
+            if self.notifier is None:
+                self.notifier = DiscordNotifier.from_settings(settings)
+            return self.notifier
+
+    def execute(self, context=None):
+        # Posts whatever has been queued on the notifier; without webhooks there is nothing to send.
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing DiscordCommand.")
+        context.print("I will send something to Discord.")
+        notifier = self.get_notifier(context.settings)
+        if notifier is None:
+            context.logger.info("No Discord webhooks configured; nothing sent.")
+            return None
+        return self.report(context, notifier.flush())
+
+    def run(self, args, context=None):
+        # Scripted form: "discord [#channel] message ..."; without a channel every webhook gets it.
+        context = context or DEFAULT_CONTEXT
+        if not args:
+            return self.execute(context)
+        notifier = self.get_notifier(context.settings)
+        if notifier is None:
+            raise ValueError("DISCORD_WEBHOOK_URL is not configured.")
+        channel = args[0][1:] if args[0].startswith('#') else None
+        message = " ".join(args[1:] if channel else args)
+        if not message:
+            raise ValueError("discord needs a message to send.")
+        notifier.queue(message, channel)
+        return self.report(context, notifier.flush())
+
+    def close(self):
+        # Final per-channel stats go to the log; the next use builds a fresh notifier
+        with self.notifier_lock:
+            notifier, self.notifier = self.notifier, None
+        if notifier is not None:
+            for channel, stats in notifier.stats().items():
+                logging.info(f"Discord webhook stats for {channel}: "
+                             + ", ".join(f"{name}={value}" for name, value in stats.items()))
+            notifier.close()
+
+    @staticmethod
+    def report(context, results):
+        posted = sum(posted for posted, _ in results.values())
+        failed = sum(failed for _, failed in results.values())
+        channels = sum(1 for posted_here, failed_here in results.values() if posted_here or failed_here)
+        context.print(f"Posted {posted} message(s) to {channels} channel(s)" + (f", {failed} failed." if failed else "."))
+        return posted
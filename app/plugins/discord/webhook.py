@@ -0,0 +1,266 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+MAX_CONTENT = 2000  # Discord rejects message content longer than this
+DEFAULT_RATE = 2.5  # requests per second per webhook (Discord allows about 5 per 2 seconds)
+DEFAULT_BURST = 5
+DEFAULT_POOL_SIZE = 2
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_THROTTLED = 5  # 429s tolerated for one post before it counts as failed
+
+
+class TokenBucket:
+    # Spaces requests out to `rate` per second with bursts of up to `capacity`. pause() empties the
+    # bucket until the server's reset time, so rate-limit headers slow us down instead of failing.
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: int = DEFAULT_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            self.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            self.tokens = 0.0
+
+    def observe(self, headers):
+        # X-RateLimit-Remaining: 0 means the next request would be rejected until the reset.
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if remaining is not None and reset_after is not None and int(remaining) == 0:
+            self.pause(float(reset_after))
+
+
+class HTTPConnectionPool:
+    # Keep-alive connections to one host, reused across posts so a storm of alerts pays the
+    # TCP + TLS handshake once per connection.
+    def __init__(self, scheme: str, host: str, port: int = None, size: int = DEFAULT_POOL_SIZE, timeout: float = 10.0):
+        self.connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.open_connections = 0
+        self.connections_opened = 0
+        self.available = threading.Condition()
+
+    def acquire(self):
+        with self.available:
+            while not self.idle and self.open_connections >= self.size:
+                self.available.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.open_connections += 1
+            self.connections_opened += 1
+        return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+    def release(self, connection, broken: bool = False):
+        with self.available:
+            if broken:
+                self.open_connections -= 1
+            else:
+                self.idle.append(connection)
+            self.available.notify()
+        if broken:
+            connection.close()
+
+    def close(self):
+        with self.available:
+            idle, self.idle = self.idle, []
+            self.open_connections -= len(idle)
+        for connection in idle:
+            connection.close()
+
+
+def coalesce(messages, limit: int = MAX_CONTENT):
+    # Packs messages into as few posts as possible, newline-separated, each at most `limit`
+    # characters; a single oversized message is split across posts.
+    posts = []
+    current = ''
+    for message in messages:
+        while len(message) > limit:
+            if current:
+                posts.append(current)
+                current = ''
+            posts.append(message[:limit])
+            message = message[limit:]
+        if current and len(current) + 1 + len(message) > limit:
+            posts.append(current)
+            current = ''
+        current = f"{current}\n{message}" if current else message
+    if current:
+        posts.append(current)
+    return posts
+
+
+class WebhookClient:
+    def __init__(self, url: str, pool: HTTPConnectionPool = None, bucket: TokenBucket = None,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, sleep=time.sleep,
+                 max_throttled: int = DEFAULT_MAX_THROTTLED):
+        parts = urlsplit(url)
+        self.path = parts.path + (f"?{parts.query}" if parts.query else '')
+        self.pool = pool or HTTPConnectionPool(parts.scheme, parts.hostname, parts.port)
+        self.bucket = bucket or TokenBucket(sleep=sleep)
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.max_throttled = max_throttled
+        self.pending = []
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.posted = 0
+        self.failed = 0
+        self.throttled = 0
+        self.retried = 0
+
+    def queue(self, content: str):
+        with self.lock:
+            self.pending.append(content)
+
+    def flush(self):
+        # Posts everything queued so far, coalesced; returns (posts delivered, posts failed).
+        with self.lock:
+            messages, self.pending = self.pending, []
+        posted = failed = 0
+        for content in coalesce(messages):
+            if self.post(content):
+                posted += 1
+            else:
+                failed += 1
+        with self.lock:
+            self.messages += len(messages)
+            self.posted += posted
+            self.failed += failed
+        return posted, failed
+
+    def post(self, content: str):
+        body = json.dumps({'content': content}).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(body))}
+        attempt = throttled = 0
+        while True:
+            self.bucket.acquire()
+            connection = self.pool.acquire()
+            try:
+                connection.request('POST', self.path, body, headers)
+                response = connection.getresponse()
+                reply = response.read()  # drain it so the connection can be reused
+            except (http.client.HTTPException, OSError) as e:
+                self.pool.release(connection, broken=True)
+                status, error = None, e
+            else:
+                self.pool.release(connection, broken=response.will_close)
+                self.bucket.observe(response.headers)
+                status, error = response.status, reply[:200]
+                if 200 <= status < 300:
+                    return True
+                if status == 429 and throttled < self.max_throttled:
+                    # Not a failure: wait out the server's window and try the same post again
+                    throttled += 1
+                    with self.lock:
+                        self.throttled += 1
+                    self.bucket.pause(self.retry_after(response.headers, reply))
+                    continue
+            if (status is None or status >= 500) and attempt < self.retries:
+                delay = self.backoff * 2 ** attempt
+                attempt += 1
+                with self.lock:
+                    self.retried += 1
+                logging.warning(f"Discord webhook post failed ({status or error}); retrying in {delay:.2f}s.")
+                self.sleep(delay)
+                continue
+            logging.error(f"Discord webhook post failed with {status or error}: {error}")
+            return False
+
+    @staticmethod
+    def retry_after(headers, reply):
+        try:
+            return float(json.loads(reply)['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            return float(headers.get('Retry-After') or 1)
+
+    def stats(self):
+        return {'messages': self.messages, 'posted': self.posted, 'failed': self.failed, 'throttled': self.throttled,
+                'retried': self.retried, 'connections_opened': self.pool.connections_opened,
+                'rate_limit_wait_seconds': round(self.bucket.waited, 3)}
+
+    def close(self):
+        self.pool.close()
+
+
+class DiscordNotifier:
+    # One webhook client per channel; flushes fan out to every channel at once.
+    def __init__(self, clients):
+        self.clients = clients  # channel name -> WebhookClient
+
+    @classmethod
+    def from_settings(cls, settings):
+        # DISCORD_WEBHOOKS="alerts=https://...,ops=https://..." or a single DISCORD_WEBHOOK_URL.
+        # Returns None when neither is set.
+        webhooks = {}
+        for entry in (settings.get('DISCORD_WEBHOOKS') or '').split(','):
+            if entry.strip():
+                name, _, url = entry.strip().partition('=')
+                webhooks[name] = url
+        if settings.get('DISCORD_WEBHOOK_URL'):
+            webhooks.setdefault('default', settings['DISCORD_WEBHOOK_URL'])
+        if not webhooks:
+            return None
+        rate = float(settings.get('DISCORD_RATE') or DEFAULT_RATE)
+        size = int(settings.get('DISCORD_POOL_SIZE') or DEFAULT_POOL_SIZE)
+        max_throttled = int(settings.get('DISCORD_MAX_THROTTLED') or DEFAULT_MAX_THROTTLED)
+        clients = {}
+        for name, url in webhooks.items():
+            parts = urlsplit(url)
+            clients[name] = WebhookClient(url, pool=HTTPConnectionPool(parts.scheme, parts.hostname, parts.port, size),
+                                          bucket=TokenBucket(rate), max_throttled=max_throttled)
+        return cls(clients)
+
+    def queue(self, content: str, channel: str = None):
+        if channel is not None and channel not in self.clients:
+            raise ValueError(f"Unknown Discord channel: {channel}")
+        for name, client in self.clients.items():
+            if channel is None or name == channel:
+                client.queue(content)
+
+    async def flush_async(self):
+        names = list(self.clients)
+        results = await asyncio.gather(*(asyncio.to_thread(self.clients[name].flush) for name in names))
+        return dict(zip(names, results))
+
+    def flush(self):
+        # Returns {channel: (posted, failed)}; channels are posted to concurrently.
+        return asyncio.run(self.flush_async())
+
+    def stats(self):
+        return {name: client.stats() for name, client in self.clients.items()}
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
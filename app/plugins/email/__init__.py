@@ -1,8 +1,56 @@
-import logging
-from app.commands import Command
+import threading
+from app.commands import Command, DEFAULT_CONTEXT
+from app.plugins.email.sender import EmailSender
 
 class EmailCommand(Command):
-    def execute(self):
-        logging.info("Executing EmailCommand.")
-        print("I will email you.")
+    background = True
+    max_concurrency = 2
+    timeout = 30.0
 
+    def __init__(self, sender=None):
+        self.sender = sender  # built from the SMTP_* settings on first use and kept for its pool
+        self.sender_lock = threading.Lock()
+
+    def get_sender(self, settings):
+        with self.sender_lock:
+            if self.sender is None:
+                self.sender = EmailSender.from_settings(settings)
+            return self.sender
+
+    def execute(self, context=None):
+        # Delivers whatever has been queued on the sender; without SMTP settings there is nothing to send.
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing EmailCommand.")
+        context.print("I will email you.")
+        sender = self.get_sender(context.settings)
+        if sender is None:
+            context.logger.info("SMTP_HOST is not set; no email sent.")
+            return None
+        return self.report(context, *sender.flush())
+
+    def run(self, args, context=None):
+        # Scripted form: "email <recipient> <subject> [body ...]"
+        context = context or DEFAULT_CONTEXT
+        if not args:
+            return self.execute(context)
+        if len(args) < 2:
+            raise ValueError("email takes a recipient, a subject and an optional body.")
+        sender = self.get_sender(context.settings)
+        if sender is None:
+            raise ValueError("SMTP_HOST is not configured.")
+        recipient, subject, *body = args
+        sender.queue(recipient, subject, " ".join(body))
+        return self.report(context, *sender.flush())
+
+    def close(self):
+        # Final delivery stats go to the log; the next use builds a fresh sender
+        with self.sender_lock:
+            sender, self.sender = self.sender, None
+        if sender is not None:
+            sender.log_stats()
+            sender.close()
+
+    @staticmethod
+    def report(context, sent, failed):
+        context.print(f"Sent {sent} email(s)" + (f", {failed} failed." if failed else "."))
+        return sent
@@ -0,0 +1,242 @@
+import ssl
+import time
+import logging
+import smtplib
+import threading
+from itertools import islice
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+
+def is_transient(error):
+    # 4xx replies and dropped connections are worth retrying; 5xx replies are final.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):  # also an OSError, but only disconnects are retried
+        return isinstance(error, smtplib.SMTPServerDisconnected)
+    return isinstance(error, OSError)
+
+
+def build_message(sender: str, recipient: str, subject: str, body: str):
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = recipient
+    message['Subject'] = subject
+    message.set_content(body)
+    return message
+
+
+class SMTPConnectionPool:
+    # Keeps up to `size` logged-in SMTP sessions open between sends, so a burst pays the
+    # TCP + TLS + AUTH handshake once per connection instead of once per message.
+    def __init__(self, host: str, port: int = 25, size: int = DEFAULT_POOL_SIZE, username: str = None,
+                 password: str = None, starttls: bool = False, use_ssl: bool = False, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.idle = []
+        self.open_connections = 0
+        self.connections_opened = 0
+        self.available = threading.Condition()
+
+    def acquire(self):
+        with self.available:
+            while not self.idle and self.open_connections >= self.size:
+                self.available.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.open_connections += 1
+        try:
+            return self.connect()
+        except Exception:
+            self.release(None, broken=True)
+            raise
+
+    def release(self, connection, broken: bool = False):
+        # Broken connections are closed and their slot freed; healthy ones go back to the pool.
+        with self.available:
+            if broken:
+                self.open_connections -= 1
+            else:
+                self.idle.append(connection)
+            self.available.notify()
+        if broken and connection is not None:
+            try:
+                connection.close()
+            except OSError:  # pragma: no cover - the socket is already gone
+                pass
+
+    def connect(self):
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                          context=ssl.create_default_context())
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                connection.starttls(context=ssl.create_default_context())
+        if self.username:
+            connection.login(self.username, self.password or '')
+        with self.available:
+            self.connections_opened += 1
+        logging.info(f"Opened SMTP connection to {self.host}:{self.port}.")
+        return connection
+
+    def close(self):
+        with self.available:
+            idle, self.idle = self.idle, []
+            self.open_connections -= len(idle)
+        for connection in idle:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                connection.close()
+
+
+class EmailSender:
+    # Splits queued messages into batches; each batch is sent over one pooled connection by one
+    # worker. Transient failures put the connection aside and retry the rest of the batch with
+    # exponential backoff on a fresh one.
+    def __init__(self, pool: SMTPConnectionPool, sender: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, sleep=time.sleep):
+        self.pool = pool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.workers = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix='smtp')
+        self.outbox = []
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @classmethod
+    def from_settings(cls, settings):
+        # Returns None (nothing to send through) unless SMTP_HOST is set.
+        host = settings.get('SMTP_HOST')
+        if not host:
+            return None
+        pool = SMTPConnectionPool(host, int(settings.get('SMTP_PORT') or 25),
+                                  size=int(settings.get('SMTP_POOL_SIZE') or DEFAULT_POOL_SIZE),
+                                  username=settings.get('SMTP_USERNAME'), password=settings.get('SMTP_PASSWORD'),
+                                  starttls=settings.get('SMTP_STARTTLS', '').lower() in ('1', 'true', 'yes'),
+                                  use_ssl=settings.get('SMTP_SSL', '').lower() in ('1', 'true', 'yes'))
+        return cls(pool, sender=settings.get('SMTP_FROM'),
+                   batch_size=int(settings.get('SMTP_BATCH_SIZE') or DEFAULT_BATCH_SIZE),
+                   retries=int(settings.get('SMTP_RETRIES') or DEFAULT_RETRIES))
+
+    def queue(self, recipient: str, subject: str, body: str):
+        with self.lock:
+            self.outbox.append(build_message(self.sender or recipient, recipient, subject, body))
+
+    def flush(self):
+        # Sends everything queued so far; returns (sent, failed) for this flush.
+        with self.lock:
+            messages, self.outbox = self.outbox, []
+        return self.send_many(messages)
+
+    def send_many(self, messages):
+        started = time.monotonic()
+        iterator = iter(messages)
+        batches = []
+        while batch := list(islice(iterator, self.batch_size)):
+            batches.append(self.workers.submit(self._send_batch, batch))
+        sent = failed = 0
+        for future in batches:
+            batch_sent, batch_failed = future.result()
+            sent += batch_sent
+            failed += batch_failed
+        with self.lock:
+            self.busy_seconds += time.monotonic() - started
+        logging.info(f"Email flush delivered {sent} messages in {len(batches)} batches ({failed} failed).")
+        return sent, failed
+
+    def _send_batch(self, batch):
+        sent = failed = attempt = position = 0
+        connection = None
+        while position < len(batch):
+            try:
+                if connection is None:
+                    connection = self.pool.acquire()
+                started = time.monotonic()
+                connection.send_message(batch[position])
+                self._record_latency(time.monotonic() - started)
+                sent += 1
+                position += 1
+                attempt = 0
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                error = e
+            if connection is None and not (is_transient(error) and attempt < self.retries):
+                # Could not open a session: the rest of the batch would fail the same way
+                logging.error(f"Could not open an SMTP session: {error}")
+                failed += len(batch) - position
+                break
+            if connection is not None and not self._connection_usable(error):
+                self.pool.release(connection, broken=True)
+                connection = None
+            if is_transient(error) and attempt < self.retries:
+                delay = self.backoff * 2 ** attempt
+                attempt += 1
+                with self.lock:
+                    self.retried += 1
+                logging.warning(f"Transient SMTP failure ({error}); retrying in {delay:.2f}s.")
+                self.sleep(delay)
+                continue
+            logging.error(f"Could not deliver email to {batch[position]['To']}: {error}")
+            failed += 1
+            position += 1
+            attempt = 0
+        if connection is not None:
+            self.pool.release(connection)
+        with self.lock:
+            self.sent += sent
+            self.failed += failed
+            self.batches += 1
+        return sent, failed
+
+    @staticmethod
+    def _connection_usable(error):
+        # A refused recipient or sender leaves the session intact; anything else may not.
+        return isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                  smtplib.SMTPDataError)) and getattr(error, 'smtp_code', 0) != 421
+
+    def _record_latency(self, seconds):
+        with self.lock:
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+
+    def stats(self):
+        with self.lock:
+            delivered = self.sent
+            return {'sent': delivered, 'failed': self.failed, 'retried': self.retried, 'batches': self.batches,
+                    'connections_opened': self.pool.connections_opened,
+                    'messages_per_second': delivered / self.busy_seconds if self.busy_seconds else 0.0,
+                    'latency_avg_ms': 1000 * self.latency_total / delivered if delivered else 0.0,
+                    'latency_max_ms': 1000 * self.latency_max}
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info("Email sender stats: " + ", ".join(f"{name}={value}" for name, value in stats.items()))
+        return stats
+
+    def close(self):
+        self.workers.shutdown(wait=True)
+        self.pool.close()
@@ -1,9 +1,9 @@
 import sys
-import logging
-from app.commands import Command
+from app.commands import Command, DEFAULT_CONTEXT
 
 class ExitCommand(Command):
-    def execute(self):
-        logging.info("Executing ExitCommand - Application exiting.")
-        print("Exiting...")
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing ExitCommand - Application exiting.")
+        context.print("Exiting...")
         sys.exit(0)
@@ -1,7 +1,7 @@
-import logging
-from app.commands import Command
+from app.commands import Command, DEFAULT_CONTEXT
 
 class GoodbyeCommand(Command):
-    def execute(self):
-        logging.info("Executing GoodbyeCommand.")
-        print("Goodbye")
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing GoodbyeCommand.")
+        context.print("Goodbye")
@@ -1,7 +1,7 @@
-import logging
-from app.commands import Command
+from app.commands import Command, DEFAULT_CONTEXT
 
 class GreetCommand(Command):
-    def execute(self):
-        logging.info("Executing GreetCommand.")
-        print("Hello, World!")
+    def execute(self, context=None):
+        context = context or DEFAULT_CONTEXT
+        context.logger.info("Executing GreetCommand.")
+        context.print("Hello, World!")
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import random
+import pstats
+import cProfile
+import logging
+import threading
+import itertools
+from collections import Counter
+
+MODES = ('cprofile', 'sampling')
+DEFAULT_DIRECTORY = 'logs'
+DEFAULT_INTERVAL = 0.005  # seconds between stack samples
+
+
+def frame_name(filename: str, lineno: int, function: str):
+    return f"{function} ({os.path.basename(filename)}:{lineno})"
+
+
+def collapse_pstats(stats: pstats.Stats):
+    # Rebuilds call paths from cProfile's caller/callee edges and splits each function's own time
+    # across the paths that reached it, in proportion to the time spent on each edge. Returns
+    # {stack tuple: microseconds}, the weights a flamegraph needs.
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_time) in callers.items():
+            callees.setdefault(caller, {})[function] = edge_time
+    stacks = Counter()
+
+    def walk(function, path, share):
+        _, _, own_time, total_time, _ = stats.stats[function]
+        if not total_time:
+            return
+        path = path + (frame_name(*function),)
+        fraction = share / total_time  # how much of this function's time belongs to this path
+        stacks[path] += round(own_time * fraction * 1e6)
+        for callee, edge_time in callees.get(function, {}).items():
+            if frame_name(*callee) not in path:  # recursion is folded into its first frame
+                walk(callee, path, edge_time * fraction)
+
+    for function, (_, _, _, total_time, callers) in stats.stats.items():
+        if not callers:
+            walk(function, (), total_time)
+    return +stacks  # drop zero-weight paths
+
+
+class StackSampler:
+    # Low-overhead alternative to cProfile: a helper thread snapshots one thread's stack every
+    # `interval` seconds. Nothing is hooked into the profiled code itself.
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, name='stack-sampler', daemon=True)
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(frame_name(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class CommandProfiler:
+    # Wraps command executions selected by PROFILE_COMMANDS (all when unset) and PROFILE_RATE (the
+    # fraction of those invocations to profile), so production runs pay only for a random draw.
+    def __init__(self, mode: str = 'cprofile', commands=None, rate: float = 1.0, directory: str = DEFAULT_DIRECTORY,
+                 interval: float = DEFAULT_INTERVAL, draw=random.random):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.commands = frozenset(commands) if commands else None
+        self.rate = rate
+        self.directory = directory
+        self.interval = interval
+        self.draw = draw
+        self.sequence = itertools.count(1)
+        self.active = threading.local()  # commands run by a profiled command are not profiled again
+        # Python 3.12+ allows one cProfile session per process at a time; concurrent commands
+        # (background jobs, sessions) that lose the race simply run unprofiled.
+        self.cprofile_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        # PROFILE=cprofile|sampling turns profiling on; returns None when it is unset or "off".
+        mode = (settings.get('PROFILE') or '').lower()
+        if mode in ('', 'off', '0', 'false'):
+            return None
+        commands = [name.strip() for name in (settings.get('PROFILE_COMMANDS') or '').split(',') if name.strip()]
+        profiler = cls(mode, commands, rate=float(settings.get('PROFILE_RATE') or 1.0),
+                       directory=settings.get('PROFILE_DIR') or DEFAULT_DIRECTORY,
+                       interval=float(settings.get('PROFILE_INTERVAL') or DEFAULT_INTERVAL))
+        logging.info(f"Profiling enabled: mode={mode}, commands={','.join(commands) or 'all'}, rate={profiler.rate}")
+        return profiler
+
+    def wants(self, command_name: str):
+        if getattr(self.active, 'running', False):
+            return False
+        if self.commands is not None and command_name not in self.commands:
+            return False
+        return self.rate >= 1 or self.draw() < self.rate
+
+    def run(self, command_name: str, function, *args):
+        if not self.wants(command_name):
+            return function(*args)
+        if self.mode == 'cprofile':
+            if not self.cprofile_lock.acquire(blocking=False):
+                return function(*args)
+            try:
+                return self.profile(command_name, function, *args)
+            finally:
+                self.cprofile_lock.release()
+        return self.profile(command_name, function, *args)
+
+    def profile(self, command_name: str, function, *args):
+        base = os.path.join(self.directory, f"{command_name}-{time.strftime('%Y%m%d-%H%M%S')}-{next(self.sequence)}")
+        self.active.running = True
+        try:
+            if self.mode == 'cprofile':
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(function, *args)
+                finally:
+                    self.write_cprofile(profile, base)
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            try:
+                with sampler:
+                    return function(*args)
+            finally:
+                self.write_collapsed(sampler.stacks, base)
+        finally:
+            self.active.running = False
+
+    def write_cprofile(self, profile, base: str):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(f"{base}.pstats")
+        self.write_collapsed(collapse_pstats(pstats.Stats(profile)), base)
+
+    def write_collapsed(self, stacks, base: str):
+        # One "frame;frame;frame weight" line per stack: the input format of flamegraph.pl and speedscope
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{base}.collapsed", 'w', encoding='utf-8') as collapsed:
+            for stack, weight in sorted(stacks.items()):
+                collapsed.write(f"{';'.join(stack)} {weight}\n")
+        logging.info(f"Profile written to {base}.collapsed ({self.mode}).")
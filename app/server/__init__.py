@@ -0,0 +1,187 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.commands import ExecutionContext
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # as many as asyncio's default thread pool
+DEFAULT_THREADS = 256
+DEFAULT_INPUT_TIMEOUT = 300.0  # seconds a command may wait at one of its prompts
+PROMPT = b">>> "
+BUSY = b"Server busy: too many commands are running. Please try again shortly.\n"
+
+
+class CommandPool:
+    # Threads for session commands. At most `threads` commands are in progress, counting those
+    # waiting on their client; beyond that a command is turned away rather than queued. At most
+    # `workers` of them compute at once: a command gives its slot up while it waits on the client,
+    # so sessions sitting at a prompt never starve the others.
+    def __init__(self, threads: int = DEFAULT_THREADS, workers: int = DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='session-command')
+        self.threads = threads
+        self.running = 0
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, function):
+        # None when every thread is taken
+        with self.lock:
+            if self.running >= self.threads:
+                return None
+            self.running += 1
+
+        def run():
+            try:
+                with self.slots:
+                    return function()
+            finally:
+                with self.lock:
+                    self.running -= 1
+        return self.executor.submit(run)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Session:
+    # One connected client. Commands run on the pool with a context bound to this session's
+    # reader/writer, so a command waiting on input() only blocks its own session. A command's
+    # prompts time out after input_timeout seconds, so an abandoned one frees its thread.
+    def __init__(self, app, reader, writer, idle_timeout=None, pool=None, input_timeout=DEFAULT_INPUT_TIMEOUT):
+        self.app = app
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.input_timeout = input_timeout
+        self.pool = pool or CommandPool()
+        self.commands_run = 0
+
+    async def run(self):
+        await self.send(self.menu())
+        try:
+            while True:
+                await self.send(PROMPT)
+                line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+                if not line:
+                    break
+                text = line.decode('utf-8', errors='replace').strip()
+                if text.lower() == 'exit':
+                    await self.send(b"Goodbye.\n")
+                    break
+                await self.dispatch(text)
+        except asyncio.TimeoutError:
+            await self.send(b"\nSession closed after being idle.\n")
+        except (ValueError, ConnectionError) as e:
+            logging.warning(f"Session ended: {e}")
+        finally:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:  # pragma: no cover - peer already reset the connection
+                pass
+
+    async def dispatch(self, text: str):
+        if not text:
+            return
+        if text.isdigit():
+            command_name = self.app.command_handler.get_command_by_index(int(text) - 1)
+            if command_name is None:
+                await self.send(b"Invalid selection. Please enter a valid number.\n")
+                return
+            text = command_name
+        context = self.context(asyncio.get_running_loop())
+
+        def work():
+            try:
+                return self.app.run_line(text, context)
+            except SystemExit:
+                # A command must never stop the server for everyone else
+                logging.error(f"Command line {text!r} tried to exit the server; ignored.")
+                return False
+        done = self.pool.submit(work)
+        if done is None:
+            logging.warning("Session command refused: every command thread is busy.")
+            await self.send(BUSY)
+            return
+        self.commands_run += 1
+        await asyncio.wrap_future(done)
+
+    def context(self, loop):
+        # Bridges the command thread's blocking input()/print() calls onto this session's stream.
+        # Writes wait for drain(), so a slow client slows its own command instead of filling memory.
+        def wait(coroutine):
+            self.pool.slots.release()
+            try:
+                return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+            finally:
+                self.pool.slots.acquire()
+
+        def write(text):
+            wait(self.send(text.encode('utf-8')))
+
+        def read(prompt):
+            return wait(self.ask(prompt))
+        return ExecutionContext(read, _SessionOutput(write), settings=self.app.settings)
+
+    async def ask(self, prompt: str):
+        await self.send(prompt.encode('utf-8'))
+        line = await asyncio.wait_for(self.reader.readline(), self.input_timeout)
+        if not line:
+            raise EOFError("session closed")
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def menu(self):
+        return (f"Available commands:\n{self.app.command_handler.commands.menu()}\n"
+                "Type a number or a command line such as 'calculator add 3 4', or 'exit' to leave.\n").encode('utf-8')
+
+    async def send(self, data: bytes):
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+class _SessionOutput:
+    def __init__(self, write):
+        self.write = write
+
+
+class SessionServer:
+    def __init__(self, app, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, idle_timeout=None,
+                 workers: int = DEFAULT_WORKERS, threads: int = DEFAULT_THREADS,
+                 input_timeout: float = DEFAULT_INPUT_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.input_timeout = input_timeout
+        self.pool = CommandPool(threads, workers)  # shared by every session
+        self.server = None
+        self.active_sessions = 0
+
+    async def start(self):
+        self.app.load_plugins()
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"Session server listening on {self.host}:{self.port}.")
+        return self
+
+    async def handle_client(self, reader, writer):
+        self.active_sessions += 1
+        peer = writer.get_extra_info('peername')
+        logging.info(f"Session opened for {peer}.")
+        try:
+            await Session(self.app, reader, writer, self.idle_timeout, self.pool, self.input_timeout).run()
+        finally:
+            self.active_sessions -= 1
+            logging.info(f"Session closed for {peer}.")
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.pool.shutdown()
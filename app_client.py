@@ -0,0 +1,18 @@
+# One-shot client for the command daemon (python main.py --client ...). It lives outside the app
+# package on purpose: importing anything under app/ runs app/__init__.py (dotenv, logging, metrics,
+# the command framework), the start-up cost the daemon exists to avoid.
+import socket
+
+DEFAULT_SOCKET_PATH = '/tmp/app.sock'
+
+
+def send_command(command_line: str, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 30.0):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(command_line.rstrip('\n').encode('utf-8') + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8')
@@ -0,0 +1,7 @@
+"""
+Micro- and macro-benchmarks for the app; run with `python -m benchmarks --help`.
+
+The regression gate compares against benchmarks/baseline.json, which must be recorded
+(`python -m benchmarks --save-baseline`) on the machine and Python that run the gate:
+a baseline from another interpreter or platform is refused.
+"""
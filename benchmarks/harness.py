@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.3  # fail when the best per-op time is more than 30% above the baseline
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, threshold: float = None):
+    # Registers a factory: it does the setup and returns a callable that performs some operations
+    # and returns how many it did. Noisy benchmarks (process start-up, the log thread) widen their threshold.
+    def register(factory):
+        BENCHMARKS[name] = (factory, threshold)
+        return factory
+    return register
+
+
+def measure(factory, repeat: int = DEFAULT_REPEAT):
+    run = factory()
+    run()  # warm-up: imports, caches and allocator state are not what we are measuring
+    per_op = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operations = run()
+        per_op.append((time.perf_counter() - started) / operations)
+    median = statistics.median(per_op)
+    return {'best': min(per_op), 'median': median, 'ops_per_sec': 1 / median if median else None, 'repeat': repeat}
+
+
+def run_benchmarks(names=None, repeat: int = DEFAULT_REPEAT, report=None):
+    unknown = set(names or ()) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    results = {}
+    for name, (factory, _) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        results[name] = measure(factory, repeat)
+        if report:
+            report(f"{name:<32}{results[name]['median'] * 1e6:>14.2f} us/op{results[name]['ops_per_sec']:>16.0f} ops/s")
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+
+def compare(results, baseline, threshold: float = DEFAULT_THRESHOLD):
+    # Returns (name, baseline time, current time, change) for each benchmark slower than allowed.
+    # Compares best-of-N per-op times: scheduler and cache noise only ever make a run slower.
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        limit = BENCHMARKS.get(name, (None, None))[1] or threshold
+        change = current['best'] / previous['best'] - 1
+        if change > limit:
+            regressions.append((name, previous['best'], current['best'], change))
+    return regressions
+
+
+def environment_changes(results, baseline):
+    # Timings only compare on the interpreter and machine the baseline was recorded on
+    return [(key, baseline.get(key), results[key]) for key in ('python', 'platform') if baseline.get(key) != results[key]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Run the benchmark suite.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON to FILE")
+    parser.add_argument('--baseline', metavar='FILE', default=DEFAULT_BASELINE,
+                        help="results to gate against; record them on the machine that runs the gate")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--any-environment', action='store_true',
+                        help="compare even if the baseline comes from another Python or platform")
+    args = parser.parse_args(argv)
+
+    from benchmarks import suite  # registers the benchmarks
+    results = suite.run_isolated(lambda: run_benchmarks(args.names, args.repeat, report=print))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+        print(f"Baseline saved to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as stored:
+        baseline = json.load(stored)
+    changes = environment_changes(results, baseline)
+    for key, recorded, current in changes:
+        print(f"Baseline {key} {recorded} differs from this run's {current}.", file=sys.stderr)
+    if changes and not args.any_environment:
+        print("Timings from another environment are not comparable; re-record the baseline here with "
+              "--save-baseline, or pass --any-environment to compare anyway.", file=sys.stderr)
+        return 2
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: {before * 1e6:.2f} -> {after * 1e6:.2f} us/op (+{change:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
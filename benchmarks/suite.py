@@ -0,0 +1,138 @@
+import os
+import sys
+import logging
+import tempfile
+import subprocess
+from app import App
+from app.commands import Command, CommandHandler, ExecutionContext
+from app.logger import start_file_pipeline
+from app.plugins.calculator import CalculatorCommand
+from benchmarks.harness import benchmark
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLD_START = "from app import App; App()"
+
+
+def run_isolated(function):
+    # Benchmarks create log files and plugin indexes; keep them out of the working tree. Plugin
+    # discovery looks for app/plugins under the working directory, so the scratch one links to it.
+    previous = os.getcwd()
+    environment = dict(os.environ)
+    with tempfile.TemporaryDirectory() as scratch:
+        os.symlink(os.path.join(REPO_ROOT, 'app'), os.path.join(scratch, 'app'))
+        os.chdir(scratch)
+        os.environ['PLUGIN_INDEX_PATH'] = os.path.join(scratch, 'plugin_index.json')
+        try:
+            return function()
+        finally:
+            os.chdir(previous)
+            os.environ.clear()
+            os.environ.update(environment)
+
+
+class Noop(Command):
+    def execute(self, context=None):
+        return None
+
+
+@benchmark('app_cold_start', threshold=0.5)
+def app_cold_start():
+    # A fresh interpreter each time: start-up, imports, dotenv, logging set-up and the App constructor
+    def run():
+        for _ in range(3):
+            subprocess.run([sys.executable, '-c', COLD_START], check=True, capture_output=True,
+                           env={**os.environ, 'PYTHONPATH': REPO_ROOT})
+        return 3
+    return run
+
+
+@benchmark('app_load_plugins', threshold=0.5)
+def app_load_plugins():
+    app = App()
+    app.load_plugins()  # builds the on-disk index once; the runs below read it back
+
+    def run():
+        for _ in range(20):
+            app.command_handler = CommandHandler()
+            app.load_plugins()
+        return 20
+    return run
+
+
+@benchmark('handler_register_command', threshold=0.5)
+def handler_register_command():
+    names = [f"command{index}" for index in range(1000)]
+    command = Noop()
+
+    def run():
+        handler = CommandHandler()
+        for name in names:
+            handler.register_command(name, command)
+        return len(names)
+    return run
+
+
+@benchmark('handler_get_command_by_index')
+def handler_get_command_by_index():
+    handler = CommandHandler()
+    for index in range(100):
+        handler.register_command(f"command{index}", Noop())
+
+    def run():
+        for index in range(10000):
+            handler.get_command_by_index(index % 100)
+        return 10000
+    return run
+
+
+@benchmark('handler_execute_command')
+def handler_execute_command():
+    handler = CommandHandler()
+    handler.register_command('noop', Noop())
+    context = ExecutionContext.buffered()
+
+    def run():
+        for _ in range(5000):
+            handler.execute_command('noop', context=context)
+        return 5000
+    return run
+
+
+@benchmark('calculator_calculate')
+def calculator_calculate():
+    calculator = CalculatorCommand()
+    calculator.get_kernel('multiply')  # load the operations outside the timed runs
+
+    def run():
+        for index in range(20000):
+            calculator.calculate('multiply', index, 3.5)
+        return 20000
+    return run
+
+
+@benchmark('calculator_calculate_many')
+def calculator_calculate_many():
+    calculator = CalculatorCommand()
+    pairs = [(float(index), 3.5) for index in range(100000)]
+
+    def run():
+        calculator.calculate_many('add', pairs)
+        return len(pairs)
+    return run
+
+
+@benchmark('log_write_throughput', threshold=0.5)
+def log_write_throughput():
+    # Records through the queue pipeline and batching file handler, including the final drain
+    logger = logging.getLogger('benchmarks.log_write')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    path = os.path.join(os.getcwd(), 'benchmark.log')
+
+    def run():
+        pipeline = start_file_pipeline(path, {'LOG_BATCH_SIZE': '500'}, logger)
+        for index in range(20000):
+            logger.info("Executing command: %s", index)
+        pipeline.stop(logger)
+        return 20000
+    return run
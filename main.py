@@ -1,5 +1,71 @@
-from app import App    
+import sys
+import shlex
+import argparse
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plugin-based command application.")
+    parser.add_argument('--script', metavar='FILE',
+                        help="run commands from FILE ('-' for stdin) instead of the interactive menu")
+    parser.add_argument('--daemon', action='store_true',
+                        help="serve commands on a Unix socket from one long-lived process")
+    parser.add_argument('--client', action='store_true',
+                        help="send COMMAND to a running daemon and print its reply")
+    parser.add_argument('--socket', default='/tmp/app.sock',
+                        help="Unix socket for --daemon and --client (default: /tmp/app.sock)")
+    parser.add_argument('--serve', metavar='HOST:PORT', nargs='?', const='127.0.0.1:8765',
+                        help="serve concurrent interactive sessions over TCP")
+    parser.add_argument('command', nargs=argparse.REMAINDER, help="command line for --client")
+    args = parser.parse_args(argv)
+    if args.client:
+        # The client never imports the app package: no dotenv, settings, logging or plugin work per call.
+        from app_client import send_command
+        try:
+            reply = send_command(shlex.join(args.command), args.socket)
+        except OSError as e:
+            print(f"Could not reach the daemon on {args.socket}: {e}", file=sys.stderr)
+            return 1
+        sys.stdout.write(reply)
+        return 0
+    from app import App
     app = App()
-    app.start()
\ No newline at end of file
+    if args.daemon:
+        from app.daemon import AppDaemon
+        with AppDaemon(app, args.socket) as daemon:
+            try:
+                daemon.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        app.shutdown()
+        return 0
+    if args.serve:
+        import asyncio
+        from app.server import DEFAULT_INPUT_TIMEOUT, DEFAULT_THREADS, DEFAULT_WORKERS, SessionServer
+        host, _, port = args.serve.rpartition(':')
+        idle_timeout = float(app.settings.get('SERVER_IDLE_TIMEOUT') or 0) or None
+        workers = int(app.settings.get('SERVER_WORKERS') or DEFAULT_WORKERS)
+        threads = int(app.settings.get('SERVER_COMMAND_THREADS') or DEFAULT_THREADS)
+        input_timeout = float(app.settings.get('SERVER_INPUT_TIMEOUT') or DEFAULT_INPUT_TIMEOUT)
+
+        async def serve():
+            server = await SessionServer(app, host or '127.0.0.1', int(port), idle_timeout, workers,
+                                         threads, input_timeout).start()
+            await server.serve_forever()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        app.shutdown()
+        return 0
+    if args.script is None:
+        app.start()
+        return 0
+    if args.script == '-':
+        failures = app.run_script(sys.stdin)
+    else:
+        with open(args.script, encoding='utf-8') as script:
+            failures = app.run_script(script)
+    app.shutdown()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
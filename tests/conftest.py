@@ -0,0 +1,6 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_plugin_index(tmp_path, monkeypatch):
+    """Keep each test's plugin discovery index out of the working tree and away from other tests."""
+    monkeypatch.setenv('PLUGIN_INDEX_PATH', str(tmp_path / 'plugin_index.json'))
@@ -16,6 +16,17 @@ def test_app_start_exit_command(capfd, monkeypatch):
     captured = capfd.readouterr()
     assert "Exiting application." in captured.out
 
+def test_app_start_exit_by_number_or_prefix(capfd, monkeypatch):
+    """Picking exit by number or prefix shuts down cleanly instead of calling sys.exit()."""
+    for choice in ('4', 'ex'):
+        monkeypatch.setattr('builtins.input', lambda _, choice=choice: choice)
+        app = App()
+        shutdowns = []
+        monkeypatch.setattr(app, 'shutdown', lambda: shutdowns.append(True))
+        app.start()
+        assert "Exiting application." in capfd.readouterr().out
+        assert shutdowns == [True]
+
 def test_app_get_environment_variable(monkeypatch):
     """Test get_environment_variable with different ENVIRONMENT settings."""
     monkeypatch.setenv('ENVIRONMENT', 'DEVELOPMENT')
@@ -91,7 +102,7 @@ def test_load_plugins_non_calculator_success(monkeypatch):
     app = App()
     app.load_plugins()
     assert "email" in app.command_handler.commands
-def test_load_plugins_exception(monkeypatch):
+def test_load_plugins_exception(monkeypatch, capfd, caplog):
     """
     Force an exception during plugin import to cover the exception branch in load_plugins().
     """
@@ -102,3 +113,86 @@ def test_load_plugins_exception(monkeypatch):
     monkeypatch.setattr("importlib.import_module", fake_import_module)
     app = App()
     app.load_plugins()
+    # Import errors surface when the lazy proxy is first executed.
+    app.command_handler.execute_command("discord")
+    captured = capfd.readouterr()
+    assert "Command is unavailable: Forced error for testing" in captured.out
+    assert "Error loading plugin app.plugins.discord: Forced error for testing" in caplog.text
+
+def test_load_plugins_is_lazy(capfd):
+    """
+    Plugins are registered as proxies and imported only when first executed,
+    keeping the alphabetical menu order.
+    """
+    from app.commands import LazyCommand
+    app = App()
+    app.load_plugins()
+    commands = app.command_handler.commands
+    assert list(commands)[:6] == ["calculator", "discord", "email", "exit", "goodbye", "greet"]
+    greet = commands["greet"]
+    assert isinstance(greet, LazyCommand) and greet.command is None
+    app.command_handler.execute_command("greet")
+    loaded = greet.command
+    app.command_handler.execute_command("greet")
+    assert greet.command is loaded
+    assert capfd.readouterr().out.count("Hello, World!") == 2
+
+def test_lazy_command_missing_class(capfd):
+    """A plugin module without the expected command class reports itself as unavailable."""
+    from app.commands import LazyCommand
+    proxy = LazyCommand("app.plugins.greet", "MissingCommand")
+    assert proxy.execute() is None
+    assert "has no command class MissingCommand" in capfd.readouterr().out
+
+def test_app_run_script(capfd):
+    """Scripted mode dispatches one command per line without printing the menu."""
+    import io
+    script = io.StringIO(
+        "calculator add 3 4\n"
+        "calc divide 10 0\n"
+        "\n"
+        "# comments are skipped\n"
+        "greet\n"
+        "calculator expression '(a + b) * c' a=1 b=2 c=3\n"
+        "bogus 1\n"
+        "calculator add x 1\n"
+        "greet loudly\n"
+        "calculator 'unbalanced\n"
+        "exit\n"
+        "greet\n"
+    )
+    app = App()
+    failures = app.run_script(script)
+    out = capfd.readouterr().out
+    assert out.splitlines() == [
+        "The result is 7.0",
+        "Cannot divide by zero.",
+        "Hello, World!",
+        "The result is 9.0",
+        "No such command: bogus",
+        "Error on line 8: could not convert string to float: 'x'",
+        "Error on line 9: GreetCommand does not take arguments.",
+        "Error on line 10: No closing quotation",
+    ]
+    assert "Available commands:" not in out
+    assert failures == 5  # the division by zero counts
+
+def test_app_run_script_flushes_large_output(capfd, monkeypatch):
+    """Output is written out in blocks once the buffer fills up."""
+    import io
+    import app as app_module
+    monkeypatch.setattr(app_module, "SCRIPT_OUTPUT_BUFFER", 10)
+    app = App()
+    assert app.run_script(io.StringIO("greet\ngreet\n")) == 0
+    assert capfd.readouterr().out == "Hello, World!\nHello, World!\n"
+
+def test_app_shutdown_closes_plugins(caplog):
+    """shutdown() closes the plugins that ran, so their final stats reach the log."""
+    import io
+    import logging
+    app = App()
+    app.settings['CALCULATOR_CACHE_SIZE'] = '8'
+    app.run_script(io.StringIO("calculator add 1 2\ncalculator add 1 2\n"))
+    with caplog.at_level(logging.INFO):
+        app.shutdown()
+    assert "Calculator cache stats: hits=1, misses=1" in caplog.text
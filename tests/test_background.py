@@ -0,0 +1,136 @@
+"""
+Tests for background execution of slow commands on the handler's bounded pool.
+"""
+import time
+import threading
+import pytest
+from app.commands import BackgroundExecutor, Command, CommandHandler, ExecutionContext, LazyCommand, Job
+
+class SlowCommand(Command):
+    background = True
+    max_concurrency = 2
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def execute(self, context=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        context.print("sent")
+        return "ok"
+
+class FailingCommand(Command):
+    background = True
+
+    def execute(self, context=None):
+        raise RuntimeError("network down")
+
+class StuckCommand(Command):
+    background = True
+    timeout = 0.05
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def execute(self, context=None):
+        self.release.wait(5)
+        return "late"
+
+@pytest.fixture
+def handler():
+    handler = CommandHandler()
+    yield handler
+    handler.shutdown()
+
+def test_background_jobs_respect_per_command_limits(handler):
+    """Jobs beyond a command's concurrency limit wait for a slot instead of running at once."""
+    slow = SlowCommand()
+    handler.register_command("slow", slow)
+    started = time.monotonic()
+    jobs = [handler.dispatch_command("slow") for _ in range(6)]
+    assert all(isinstance(job, Job) for job in jobs)
+    assert time.monotonic() - started < 0.05  # dispatch returned without waiting
+    assert [job.future.result(timeout=5) for job in jobs] == ["ok"] * 6
+    assert slow.peak == 2
+    assert all(job.output() == "sent\n" and job.status == "finished" for job in jobs)
+    assert handler.executor.get(jobs[0].job_id) is jobs[0] and handler.executor.active() == []
+    assert "[job 1] slow finished in" in jobs[0].describe()
+    context = ExecutionContext.buffered()
+    handler.submit_command("slow", context=context).future.result(timeout=5)
+    assert context.getvalue() == "sent\n"
+
+def test_foreground_commands_still_run_inline(handler, capfd):
+    """Commands that are not marked background return their result directly."""
+    class Inline(Command):
+        def execute(self, context=None):
+            return 42
+    handler.register_command("inline", Inline())
+    assert handler.dispatch_command("inline") == 42
+    assert handler.dispatch_command("missing") is None
+    assert handler.submit_command("missing") is None
+    assert capfd.readouterr().out == "No such command: missing\nNo such command: missing\n"
+
+def test_failed_and_timed_out_jobs_are_reported():
+    """Failures and timeouts resolve the job's future and reach the completion callback."""
+    reports = []
+    handler = CommandHandler(BackgroundExecutor(max_workers=2, on_complete=reports.append))
+    stuck = StuckCommand()
+    handler.register_command("fail", FailingCommand())
+    handler.register_command("stuck", stuck)
+    failed = handler.submit_command("fail")
+    timed_out = handler.submit_command("stuck")
+    with pytest.raises(RuntimeError):
+        failed.future.result(timeout=5)
+    with pytest.raises(TimeoutError):
+        timed_out.future.result(timeout=5)
+    assert "fail failed in" in failed.describe() and failed.describe().endswith(": network down")
+    assert timed_out.status == "timed out"
+    stuck.release.set()
+    handler.shutdown()
+    assert {job.job_id for job in reports} == {failed.job_id, timed_out.job_id}
+    assert timed_out.status == "timed out"  # the late return does not overwrite the timeout
+
+def test_shutdown_without_waiting_cancels_queued_jobs():
+    """Jobs still waiting for a slot are cancelled when the executor stops without waiting."""
+    executor = BackgroundExecutor(max_workers=1)
+    release = threading.Event()
+    running = executor.submit("send", lambda context: release.wait(5), ExecutionContext.buffered(), limit=1)
+    queued = executor.submit("send", lambda context: None, ExecutionContext.buffered())
+    assert queued.status == "queued" and queued.duration is None and queued.describe() == "[job 2] send queued"
+    executor.shutdown(wait=False)
+    release.set()
+    assert running.future.result(timeout=5) is True
+    assert queued.future.cancelled() and queued.status == "cancelled"
+
+def test_finished_jobs_are_not_kept_forever():
+    """Reported jobs leave the active map and only the most recent ones stay reachable."""
+    executor = BackgroundExecutor(max_workers=2, keep_recent=2)
+    jobs = [executor.submit("noop", lambda context: None, ExecutionContext.buffered()) for _ in range(5)]
+    for job in jobs:
+        job.future.result(timeout=5)
+    assert executor.jobs == {} and executor.active() == []
+    assert list(executor.recent) == [4, 5]
+    assert executor.get(1) is None and executor.get(5) is jobs[4]
+    executor.shutdown()
+
+def test_executor_from_settings():
+    """Pool size and default timeout come from BACKGROUND_WORKERS and BACKGROUND_TIMEOUT."""
+    executor = BackgroundExecutor.from_settings({"BACKGROUND_WORKERS": "2", "BACKGROUND_TIMEOUT": "1.5"})
+    assert executor.pool._max_workers == 2 and executor.default_timeout == 1.5
+    job = executor.submit("noop", lambda context: None, ExecutionContext())
+    assert job.timeout == 1.5 and job.future.result(timeout=5) is None and job.output() == ""
+    executor.shutdown()
+    assert BackgroundExecutor.from_settings({}).default_timeout is None
+
+def test_lazy_commands_expose_background_settings():
+    """Plugin proxies report the loaded command's settings; broken plugins run inline."""
+    discord = LazyCommand("app.plugins.discord", "DiscordCommand")
+    assert discord.background and discord.max_concurrency == 2 and discord.timeout == 30.0
+    broken = LazyCommand("app.plugins.missing", "Missing")
+    assert not broken.background and broken.max_concurrency is None and broken.timeout is None
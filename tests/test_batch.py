@@ -0,0 +1,60 @@
+"""
+Tests for the vectorized calculator batch engine.
+"""
+import math
+import logging
+from array import array
+import pytest
+from app.plugins.calculator import CalculatorCommand, batch
+from app.plugins.calculator.batch import BatchCalculator
+
+@pytest.fixture
+def engine():
+    return BatchCalculator(CalculatorCommand())
+
+@pytest.fixture
+def no_numpy(monkeypatch):
+    """Force the array('d') fallback."""
+    monkeypatch.setattr(batch, "np", None)
+
+def test_batch_numpy_columns(engine):
+    """Add/subtract/multiply run as NumPy ufuncs over whole columns."""
+    np = pytest.importorskip("numpy")
+    a = np.array([1.0, 2.0, 3.0])
+    b = np.array([4.0, 5.0, 6.0])
+    results, failed = engine.calculate("add", a, b)
+    assert results.tolist() == [5.0, 7.0, 9.0]
+    assert not failed.any()
+    assert engine.calculate("subtract", a, b)[0].tolist() == [-3.0, -3.0, -3.0]
+    assert engine.calculate("multiply", [2, 3], [4, 5])[0].tolist() == [8.0, 15.0]
+
+def test_batch_numpy_divide_mask(engine, caplog):
+    """Zero denominators are reported in the mask instead of printed per row."""
+    pytest.importorskip("numpy")
+    with caplog.at_level(logging.INFO):
+        results, failed = engine.calculate("divide", [10, 20, 30], [2, 0, 5])
+    assert failed.tolist() == [False, True, False]
+    assert results[0] == 5.0 and results[2] == 6.0
+    assert math.isnan(results[1])
+    assert "Batch divide computed 3 rows (1 failed)." in caplog.text
+
+def test_batch_array_fallback(no_numpy):
+    """Without NumPy the engine works on array('d') columns and a bytearray mask."""
+    engine = BatchCalculator(CalculatorCommand())
+    assert engine.ufuncs == {}
+    column = array('d', [1.0, 2.0])
+    assert batch.to_column(column) is column
+    results, failed = engine.calculate("add", [1, 2], column)
+    assert isinstance(results, array) and list(results) == [2.0, 4.0]
+    assert failed == bytearray(2)
+    results, failed = engine.calculate("divide", [9, 1], [3, 0])
+    assert results[0] == 3.0 and math.isnan(results[1])
+    assert list(failed) == [0, 1]
+    assert batch.count_failed(failed) == 1
+
+def test_batch_rejects_bad_input(engine):
+    """Unknown operations and ragged columns raise ValueError."""
+    with pytest.raises(ValueError, match="Unknown calculator operation"):
+        engine.calculate("modulo", [1], [2])
+    with pytest.raises(ValueError, match="differ in length"):
+        engine.calculate("add", [1, 2], [3])
@@ -0,0 +1,54 @@
+"""
+Tests for the benchmark harness and its regression gate (not for the timings themselves).
+"""
+import json
+import pytest
+from benchmarks import harness, suite
+
+def results_with(**best_times):
+    return {"results": {name: {"best": best} for name, best in best_times.items()}}
+
+def test_compare_flags_only_slowdowns_beyond_the_threshold():
+    """Benchmarks slower than the baseline by more than the threshold are reported; others pass."""
+    baseline = results_with(handler_execute_command=1.0, calculator_calculate=1.0, app_cold_start=1.0)
+    current = results_with(handler_execute_command=1.2, calculator_calculate=1.3, app_cold_start=1.4, new_one=9.0)
+    regressions = harness.compare(current, baseline, threshold=0.25)
+    assert [(name, round(change, 2)) for name, _, _, change in regressions] == [("calculator_calculate", 0.3)]
+
+def test_run_benchmarks_reports_per_operation_times():
+    """Selected benchmarks produce best/median per-op times and throughput."""
+    results = suite.run_isolated(lambda: harness.run_benchmarks(["handler_get_command_by_index"], repeat=2))
+    (name, measured), = results["results"].items()
+    assert name == "handler_get_command_by_index" and measured["repeat"] == 2
+    assert 0 < measured["best"] <= measured["median"] and measured["ops_per_sec"] > 0
+    with pytest.raises(ValueError, match="Unknown benchmarks: nope"):
+        harness.run_benchmarks(["nope"])
+
+def test_main_saves_baseline_and_gates_regressions(tmp_path, capsys):
+    """--save-baseline stores results; later runs fail when they regress against it."""
+    baseline, output = tmp_path / "baseline.json", tmp_path / "results.json"
+    args = ["calculator_calculate", "--repeat", "1", "--baseline", str(baseline)]
+    assert harness.main(args) == 0
+    assert "No baseline" in capsys.readouterr().out
+    assert harness.main(args + ["--save-baseline", "--output", str(output)]) == 0
+    assert json.loads(output.read_text())["results"].keys() == {"calculator_calculate"}
+    assert harness.main(args + ["--threshold", "100"]) == 0
+    stored = json.loads(baseline.read_text())
+    stored["results"]["calculator_calculate"]["best"] /= 1000
+    baseline.write_text(json.dumps(stored))
+    assert harness.main(args) == 1
+    assert "REGRESSION calculator_calculate" in capsys.readouterr().err
+
+def test_main_refuses_a_baseline_from_another_environment(tmp_path, capsys):
+    """A baseline recorded on another Python or platform is not gated against unless asked to."""
+    baseline = tmp_path / "baseline.json"
+    args = ["calculator_calculate", "--repeat", "1", "--baseline", str(baseline)]
+    assert harness.main(args + ["--save-baseline"]) == 0
+    stored = json.loads(baseline.read_text())
+    stored["python"] = "2.7.18"
+    baseline.write_text(json.dumps(stored))
+    capsys.readouterr()
+    assert harness.main(args) == 2
+    err = capsys.readouterr().err
+    assert "Baseline python 2.7.18 differs" in err and "--save-baseline" in err
+    assert harness.main(args + ["--any-environment", "--threshold", "100"]) == 0
@@ -0,0 +1,101 @@
+"""
+Tests for the calculator result memoization cache.
+"""
+import logging
+import pytest
+from app.plugins.calculator import CalculatorCommand
+from app.plugins.calculator.cache import DEFAULT_MAX_ENTRIES, ResultCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def test_cache_in_calculator_dispatch():
+    """Repeated (operation, a, b) keys are served from the cache."""
+    cache = ResultCache(max_entries=10)
+    calc = CalculatorCommand(cache=cache)
+    assert calc.calculate("add", 1, 2) == 3
+    assert calc.calculate("add", 1, 2) == 3
+    assert calc.calculate_many("multiply", [(2, 3), (2, 3)]) == [6, 6]
+    assert (cache.hits, cache.misses) == (2, 2)
+    with pytest.raises(ZeroDivisionError):
+        calc.calculate("divide", 1, 0)
+    assert ("divide", 1, 0) not in cache.entries
+
+def test_cache_lru_eviction():
+    """The least recently used entry is evicted once max_entries is exceeded."""
+    cache = ResultCache(max_entries=2)
+    cache.put(("add", 1, 1), 2)
+    cache.put(("add", 2, 2), 4)
+    cache.get(("add", 1, 1))
+    cache.put(("add", 3, 3), 6)
+    assert list(cache.entries) == [("add", 1, 1), ("add", 3, 3)]
+    assert cache.evictions == 1
+    cache.put(("add", 3, 3), 6)
+    assert len(cache.entries) == 2
+
+def test_cache_ttl_expiry():
+    """Entries older than ttl seconds count as misses and are dropped."""
+    clock = FakeClock()
+    cache = ResultCache(ttl=5, clock=clock)
+    cache.put(("subtract", 5, 1), 4)
+    clock.now = 4.9
+    assert cache.get(("subtract", 5, 1)) == 4
+    clock.now = 5.0
+    assert cache.get(("subtract", 5, 1), "gone") == "gone"
+    assert cache.stats()['expirations'] == 1 and cache.bytes == 0
+
+def test_cache_byte_budget():
+    """max_bytes bounds the estimated size of all cached entries."""
+    key = ("add", 1.0, 2.0)
+    size = ResultCache.entry_size(key, 3.0)
+    cache = ResultCache(max_entries=None, max_bytes=size * 2)
+    for i in range(5):
+        cache.put(("add", float(i), 2.0), float(i) + 2)
+    assert len(cache.entries) == 2 and cache.bytes <= size * 2
+    assert cache.evictions == 3
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.bytes == 0
+
+def test_cache_stats_logging(caplog):
+    """Stats are exposed as a dict and written to the log."""
+    cache = ResultCache()
+    cache.get("missing")
+    with caplog.at_level(logging.INFO):
+        stats = cache.log_stats()
+    assert stats['misses'] == 1
+    assert "Calculator cache stats: hits=0, misses=1, evictions=0" in caplog.text
+
+def test_cache_from_settings():
+    """The cache is configured from CALCULATOR_CACHE_* settings, or disabled."""
+    assert ResultCache.from_settings({}) is None
+    cache = ResultCache.from_settings({'CALCULATOR_CACHE_SIZE': '5', 'CALCULATOR_CACHE_TTL': '1.5'})
+    assert (cache.max_entries, cache.max_bytes, cache.ttl) == (5, None, 1.5)
+    cache = ResultCache.from_settings({'CALCULATOR_CACHE_BYTES': '4096'})
+    assert (cache.max_entries, cache.max_bytes, cache.ttl) == (DEFAULT_MAX_ENTRIES, 4096, None)
+
+def test_ttl_only_cache_stays_bounded():
+    """With only a TTL configured the entry cap still applies, and expired entries are purged on put."""
+    clock = FakeClock()
+    cache = ResultCache.from_settings({'CALCULATOR_CACHE_TTL': '5'})
+    assert cache.max_entries == DEFAULT_MAX_ENTRIES
+    cache.clock = clock
+    for i in range(DEFAULT_MAX_ENTRIES * 3):
+        cache.put(("add", float(i), 1.0), i + 1.0)
+    assert len(cache.entries) == DEFAULT_MAX_ENTRIES
+    clock.now = 3.0
+    cache.put(("add", -1.0, 1.0), 0.0)
+    clock.now = 6.0
+    cache.put(("add", -2.0, 1.0), -1.0)  # every entry put at time 0 has expired
+    assert list(cache.entries) == [("add", -1.0, 1.0), ("add", -2.0, 1.0)]
+    assert cache.expirations == DEFAULT_MAX_ENTRIES - 1
+
+def test_signed_zeros_are_cached_apart():
+    """-0.0 and 0.0 operands get their own entries, so cached results keep their sign."""
+    calc = CalculatorCommand(cache=ResultCache())
+    assert str(calc.calculate("multiply", 0.0, 5)) == "0.0"
+    assert str(calc.calculate("multiply", -0.0, 5)) == "-0.0"
+    assert str(calc.calculate("multiply", -0.0, 5)) == "-0.0"
+    assert calc.cache.hits == 1
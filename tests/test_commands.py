@@ -72,16 +72,18 @@ def test_app_email_command(capfd, monkeypatch, caplog):
 def test_app_exit_command(capfd, monkeypatch, caplog):
     """
     Test that selecting the 'exit' command (expected as option 4)
-    exits the application and logs its execution.
+    shuts the application down, while the command itself still exits.
     """
     inputs = iter(['4'])
     monkeypatch.setattr('builtins.input', lambda _: next(inputs))
     with caplog.at_level(logging.INFO):
-        with pytest.raises(SystemExit):
-            app = App()
-            app.start()
+        app = App()
+        app.start()
         captured = capfd.readouterr()
-        assert "Exiting" in captured.out
+        assert "Exiting application." in captured.out
+        assert "Exiting application via 'exit' command." in caplog.text
+        with pytest.raises(SystemExit):
+            app.command_handler.execute_command('exit')
         assert "Executing ExitCommand" in caplog.text
 
 # --- Calculator Command Tests ---
@@ -106,9 +108,9 @@ def mock_calculator(monkeypatch):
 def test_calculator_display_and_exit(capfd, monkeypatch, mock_calculator):
     """
     Test that the CalculatorCommand displays operations and the option to return to the main menu.
-    Expected: Operations are listed and "5. Main Menu" appears.
+    Expected: Operations are listed and "6. Main Menu" appears.
     """
-    monkeypatch.setattr('builtins.input', lambda _: '5')
+    monkeypatch.setattr('builtins.input', lambda _: '6')
     calc = CalculatorCommand()
     calc.execute()
     captured = capfd.readouterr()
@@ -116,15 +118,15 @@ def test_calculator_display_and_exit(capfd, monkeypatch, mock_calculator):
     # Check that operation names are present (depending on your naming, could be "Add" or "MockAdd")
     assert ("1. Add" in captured.out or "1. MockAdd" in captured.out)
     assert ("2. Subtract" in captured.out or "2. MockSubtract" in captured.out)
-    assert "5. Main Menu" in captured.out
+    assert "6. Main Menu" in captured.out
 
 def test_calculator_execute_operation(capfd, monkeypatch, mock_calculator):
     """
     Test executing a calculator operation.
-    Simulate: selecting operation '1' (MockAdd) then '5' to return.
+    Simulate: selecting operation '1' (MockAdd) then '6' to return.
     Expected output: "The result is 9.0"
     """
-    inputs = iter(['1', '5'])
+    inputs = iter(['1', '6'])
     monkeypatch.setattr('builtins.input', lambda _: next(inputs))
     calc = CalculatorCommand()
     calc.execute()
@@ -335,8 +337,8 @@ def test_calculator_invalid_selection(monkeypatch, capfd, caplog):
     When an invalid choice is entered (not matching any operation key),
     the else branch should be taken.
     """
-    # Provide an input that doesn't correspond to any key (e.g., '10'), then '5' to exit.
-    inputs = iter(['10', '5'])
+    # Provide an input that doesn't correspond to any key (e.g., '10'), then '6' to exit.
+    inputs = iter(['10', '6'])
     monkeypatch.setattr('builtins.input', lambda prompt: next(inputs))
     from app.plugins.calculator import CalculatorCommand
     calc = CalculatorCommand()
@@ -395,3 +397,144 @@ def test_dummy_command_execute():
     dummy = DummyCommand()
     # Call the method; it should simply do nothing without raising an exception.
     dummy.execute()
+
+def test_operation_compute_is_pure(capfd):
+    """
+    Each calculator operation exposes a pure compute(a, b) that neither prompts nor prints.
+    """
+    from app.plugins.calculator.subtract import Subtract
+    from app.plugins.calculator.multiply import Multiply
+    from app.plugins.calculator.divide import Divide
+    assert Add.compute(3, 5) == 8
+    assert Subtract.compute(10, 4) == 6
+    assert Multiply.compute(4, 5) == 20
+    assert Divide.compute(20, 4) == 5
+    with pytest.raises(ZeroDivisionError):
+        Divide.compute(20, 0)
+    assert capfd.readouterr().out == ""
+
+def test_calculator_calculate_dispatch():
+    """
+    Test that calculate() and calculate_many() dispatch through the prebuilt kernel table.
+    """
+    calc = CalculatorCommand()
+    assert set(calc.kernels) == {"add", "subtract", "multiply", "divide"}
+    assert calc.calculate("add", 2, 3) == 5
+    assert calc.calculate("divide", 9, 3) == 3
+    assert calc.calculate_many("multiply", [(1, 2), (3, 4), (5, 6)]) == [2, 12, 30]
+    assert calc.calculate_many("subtract", iter([(5, 1)])) == [4]
+    with pytest.raises(ValueError, match="Unknown calculator operation: modulo"):
+        calc.calculate("modulo", 1, 2)
+
+def test_calculator_kernels_skip_operations_without_compute(mock_calculator):
+    """
+    Operations that do not provide compute() (e.g. the mocks) are left out of the kernel table.
+    """
+    calc = CalculatorCommand()
+    assert calc.kernels == {}
+
+def test_calculator_operations_load_on_first_use(monkeypatch):
+    """
+    Constructing CalculatorCommand does not import the operation modules; first use does.
+    """
+    calls = []
+    original = CalculatorCommand.load_operations
+    def counting_load_operations(self):
+        calls.append(self)
+        return original(self)
+    monkeypatch.setattr(CalculatorCommand, "load_operations", counting_load_operations)
+    calc = CalculatorCommand()
+    assert calls == []
+    assert calc.calculate("add", 1, 1) == 2
+    assert calc.calculate("subtract", 1, 1) == 0
+    assert len(calls) == 1
+
+def test_calculator_run_with_arguments(capfd):
+    """
+    The scripted run(args) form of CalculatorCommand computes without prompting.
+    """
+    calc = CalculatorCommand()
+    assert calc.run(["multiply", "4", "5"]) == 20.0
+    assert calc.run(["divide", "1", "0"]) is None
+    assert calc.run(["expression", "a / b", "a=9", "b=3"]) == 3.0
+    out = capfd.readouterr().out
+    assert "The result is 20.0" in out and "Cannot divide by zero." in out
+    with pytest.raises(ValueError, match="exactly two operands"):
+        calc.run(["add", "1"])
+    with pytest.raises(ValueError, match="expression needs a formula"):
+        calc.run(["expression"])
+    with pytest.raises(ValueError, match="Expected name=value"):
+        calc.run(["expression", "a + 1", "a"])
+
+def test_calculator_run_without_arguments_is_interactive(monkeypatch, capfd, mock_calculator):
+    """
+    run([]) falls back to the interactive menu, as does the base Command.run.
+    """
+    monkeypatch.setattr('builtins.input', lambda _: '6')
+    CalculatorCommand().run([])
+    assert "Calculator Operations:" in capfd.readouterr().out
+    MockAdd().run([])
+    assert "The result is 9.0" in capfd.readouterr().out
+
+def test_lazy_command_run(capfd):
+    """
+    LazyCommand.run loads the plugin and forwards the arguments.
+    """
+    from app.commands import LazyCommand
+    proxy = LazyCommand("app.plugins.calculator", "CalculatorCommand")
+    assert proxy.run(["add", "1", "2"]) == 3.0
+    assert LazyCommand("app.plugins.greet", "Missing").run([]) is None
+    assert "Command is unavailable" in capfd.readouterr().out
+
+def test_handler_shutdown_closes_commands(caplog):
+    """
+    Shutdown closes each loaded command once; unloaded plugins stay unimported and errors are logged.
+    """
+    from app.commands import CommandHandler, LazyCommand
+
+    class Closing(Command):
+        closed = 0
+
+        def execute(self, context=None):
+            return None
+
+        def close(self):
+            Closing.closed += 1
+
+    class Broken(Closing):
+        def close(self):
+            raise RuntimeError("still busy")
+
+    handler = CommandHandler()
+    closing = Closing()
+    handler.register_command("closing", closing)
+    handler.register_command("alias", closing)
+    handler.register_command("broken", Broken())
+    handler.register_command("greet", LazyCommand("app.plugins.greet", "GreetCommand"))
+    with caplog.at_level(logging.INFO):
+        handler.shutdown()
+    assert Closing.closed == 1
+    assert handler.commands["greet"].command is None
+    assert "Error closing command broken: still busy" in caplog.text
+    Command.close(closing)  # the default hook does nothing
+
+def test_calculator_cache_from_settings(caplog):
+    """
+    CALCULATOR_CACHE_* settings build the cache on first use; its stats are logged on shutdown.
+    """
+    from app.commands import CommandHandler, ExecutionContext, LazyCommand
+    handler = CommandHandler()
+    handler.register_command("calculator", LazyCommand("app.plugins.calculator", "CalculatorCommand"))
+    context = ExecutionContext.buffered(settings={'CALCULATOR_CACHE_SIZE': '10'})
+    handler.execute_command("calculator", ["add", "1", "2"], context)
+    handler.execute_command("calculator", ["add", "1", "2"], context)
+    calculator = handler.commands["calculator"].command
+    assert (calculator.cache.hits, calculator.cache.misses) == (1, 1)
+    with caplog.at_level(logging.INFO):
+        handler.shutdown()
+    assert "Calculator cache stats: hits=1, misses=1" in caplog.text
+    uncached = CalculatorCommand()
+    uncached.run(["add", "1", "2"], ExecutionContext.buffered())
+    assert uncached.cache is None and uncached.cache_configured
+    uncached.close()
+    CalculatorCommand().close()  # nothing ran, nothing to release
@@ -0,0 +1,117 @@
+"""
+Tests for execution contexts and the compatibility shim for plugins without one.
+"""
+import io
+import sys
+import threading
+from app.commands import Command, CommandHandler, ExecutionContext, DEFAULT_CONTEXT, call_with_context
+from app.commands.context import accepts_context
+
+class LegacyCommand(Command):
+    """A plugin written before contexts existed: it uses the builtins directly."""
+    def execute(self):
+        name = input("Name: ")
+        print(f"Hello, {name}!")
+        return name
+
+class EchoCommand(Command):
+    def execute(self, context=None):
+        value = context.input("Value: ")
+        context.print("Echo:", value)
+        return value
+
+def test_buffered_context_collects_output_and_runs_out_of_input():
+    """Buffered contexts feed lines to input() and raise EOFError once they are used up."""
+    context = ExecutionContext.buffered(["one"], settings={"KEY": "value"})
+    assert EchoCommand().execute(context) == "one"
+    assert context.getvalue() == "Echo: one\n" and context.settings == {"KEY": "value"}
+    try:
+        context.input("Again: ")
+    except EOFError:
+        pass
+    else:
+        raise AssertionError("expected EOFError")
+
+def test_default_context_uses_builtins(monkeypatch, capfd):
+    """Without a context, commands read and write the process stdin/stdout as before."""
+    monkeypatch.setattr('builtins.input', lambda _: "typed")
+    handler = CommandHandler()
+    handler.register_command("echo", EchoCommand())
+    handler.register_command("legacy", LegacyCommand())
+    assert handler.execute_command("echo", context=DEFAULT_CONTEXT) == "typed"
+    assert handler.execute_command("legacy") == "typed"
+    assert capfd.readouterr().out == "Echo: typed\nHello, typed!\n"
+
+def test_legacy_commands_are_redirected_to_the_context():
+    """Commands whose execute() takes no context still read and write through the caller's context."""
+    context = ExecutionContext.buffered(["Ada"])
+    stdout = sys.stdout
+    assert call_with_context(LegacyCommand().execute, context) == "Ada"
+    assert context.getvalue() == "Name: Hello, Ada!\n"
+    assert sys.stdout is stdout
+
+def test_accepts_context_is_cached_per_function():
+    """The signature check is done once per function, and unsupported callables count as legacy."""
+    assert accepts_context(EchoCommand().execute) and accepts_context(EchoCommand().execute)
+    assert not accepts_context(LegacyCommand().execute)
+    assert not accepts_context(max)
+    assert not accepts_context(max)
+
+def test_concurrent_commands_keep_their_own_io():
+    """Many threads running commands at once never see each other's input or output."""
+    handler = CommandHandler()
+    handler.register_command("echo", EchoCommand())
+    handler.register_command("legacy", LegacyCommand())
+    contexts = {index: ExecutionContext(input_source=lambda _, i=index: str(i), output=io.StringIO())
+                for index in range(40)}
+
+    def run(index):
+        handler.execute_command("echo" if index % 2 else "legacy", context=contexts[index])
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in contexts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for index, context in contexts.items():
+        expected = f"Echo: {index}\n" if index % 2 else f"Name: Hello, {index}!\n"
+        assert context.getvalue() == expected
+
+def test_other_threads_do_not_print_into_a_legacy_command(capfd):
+    """While a legacy command waits for input, prints from other threads still reach the real stdout."""
+    waiting, answered = threading.Event(), threading.Event()
+
+    def answer(prompt):
+        waiting.set()
+        answered.wait(5)
+        return "Ada"
+    context = ExecutionContext(input_source=answer, output=io.StringIO())
+    worker = threading.Thread(target=call_with_context, args=(LegacyCommand().execute, context))
+    worker.start()
+    waiting.wait(5)
+    print("report from the main thread")
+    DEFAULT_CONTEXT.print("default context output")
+    inner = ExecutionContext.buffered(["Grace"])
+    assert call_with_context(LegacyCommand().execute, inner) == "Grace"  # overlapping legacy commands
+    answered.set()
+    worker.join()
+    assert context.getvalue() == "Name: Hello, Ada!\n"
+    assert inner.getvalue() == "Name: Hello, Grace!\n"
+    assert capfd.readouterr().out == "report from the main thread\ndefault context output\n"
+
+def test_streams_replaced_during_a_legacy_command_are_kept():
+    """Streams swapped by someone else while routing (as pytest's capture does) are left alone."""
+    replacement = io.StringIO()
+
+    class Swapping(Command):
+        def execute(self):
+            print("to the context")
+            sys.stdin = sys.stdout = replacement
+    stdin, stdout = sys.stdin, sys.stdout
+    context = ExecutionContext.buffered()
+    try:
+        call_with_context(Swapping().execute, context)
+        assert sys.stdout is replacement and sys.stdin is replacement
+    finally:
+        sys.stdin, sys.stdout = stdin, stdout
+    assert context.getvalue() == "to the context\n"
@@ -0,0 +1,88 @@
+"""
+Tests for the Unix-socket daemon and its one-shot client.
+"""
+import os
+import socket
+import shutil
+import tempfile
+import threading
+import pytest
+from app import App
+from app.daemon import AppDaemon, send_command
+
+@pytest.fixture
+def daemon():
+    # Unix socket paths are length-limited, so use a short temporary directory.
+    directory = tempfile.mkdtemp(prefix="appd")
+    server = AppDaemon(App(), os.path.join(directory, "app.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    shutil.rmtree(directory)
+
+def test_daemon_runs_commands(daemon):
+    """Each client call runs one command line in the warm process and returns its output."""
+    assert send_command("calculator divide 10 4", daemon.socket_path) == "The result is 2.5\n"
+    assert send_command("greet\n", daemon.socket_path) == "Hello, World!\n"
+    assert send_command("calc expression 'a * 2' a=4", daemon.socket_path) == "The result is 8.0\n"
+
+def test_daemon_keeps_plugins_loaded(daemon):
+    """Plugins are imported once, at daemon start."""
+    commands = daemon.app.command_handler.commands
+    assert all(command.command is not None for command in commands.values())
+
+def test_daemon_reports_errors(daemon):
+    """Bad requests get an error reply instead of breaking the daemon."""
+    assert send_command("nothing", daemon.socket_path) == "No such command: nothing\n"
+    assert send_command("calculator add 1", daemon.socket_path) == "Error: add takes exactly two operands.\n"
+    assert "not available in this session" in send_command("exit", daemon.socket_path)
+    assert "not available in this session" in send_command("ex", daemon.socket_path)
+    assert "needs interactive input" in send_command("calculator", daemon.socket_path)
+    assert send_command("# nothing to do", daemon.socket_path) == ""
+    assert send_command("greet", daemon.socket_path) == "Hello, World!\n"
+
+def test_daemon_replaces_stale_socket_and_cleans_up(caplog):
+    """A leftover socket is replaced, plugin load errors are logged, and close removes the socket."""
+    directory = tempfile.mkdtemp(prefix="appd")
+    path = os.path.join(directory, "app.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)  # closed without unlinking, like a daemon that was killed
+    app = App()
+    server = AppDaemon(app, path, preload=False)
+    app.command_handler.register_command("plain", object())
+    app.command_handler.register_command("broken", type("Broken", (), {"load": lambda self: 1 / 0})())
+    server.preload()
+    assert "Error preloading plugin broken: division by zero" in caplog.text
+    server.server_close()
+    assert not os.path.exists(path)
+    server.server_close()
+    shutil.rmtree(directory)
+
+def test_daemon_keeps_live_sockets_and_other_files(daemon):
+    """Only a stale socket is removed: a running daemon's socket and regular files are refused."""
+    with pytest.raises(OSError, match="already listening"):
+        AppDaemon(App(), daemon.socket_path, preload=False)
+    assert send_command("greet", daemon.socket_path) == "Hello, World!\n"
+    path = os.path.join(os.path.dirname(daemon.socket_path), "notes.txt")
+    open(path, "w", encoding="utf-8").close()
+    with pytest.raises(FileExistsError, match="not a socket"):
+        AppDaemon(App(), path, preload=False)
+    assert os.path.exists(path)
+
+def test_client_does_not_import_the_app(daemon):
+    """main.py --client talks to the daemon without importing the app package."""
+    import sys
+    import subprocess
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = ("import sys, main; code = main.main(['--client', '--socket', sys.argv[1], 'calc', 'expression', 'a * 2', 'a=4']);"
+              "print(code, any(name == 'app' or name.startswith('app.') for name in sys.modules))")
+    done = subprocess.run([sys.executable, "-c", script, daemon.socket_path], cwd=root,
+                          capture_output=True, text=True, timeout=30, check=True)
+    assert done.stdout == "The result is 8.0\n0 False\n"
+    missing = os.path.join(os.path.dirname(daemon.socket_path), "missing.sock")
+    failed = subprocess.run([sys.executable, "main.py", "--client", "--socket", missing, "greet"], cwd=root,
+                            capture_output=True, text=True, timeout=30)
+    assert failed.returncode == 1 and "Could not reach the daemon" in failed.stderr
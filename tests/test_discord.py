@@ -0,0 +1,204 @@
+"""
+Tests for the Discord webhook client, against a local HTTP stub.
+"""
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.commands import ExecutionContext
+from app.plugins.discord import DiscordCommand
+from app.plugins.discord.webhook import (DiscordNotifier, HTTPConnectionPool, TokenBucket, WebhookClient,
+                                         coalesce)
+
+class WebhookStub(ThreadingHTTPServer):
+    """Records posted contents per path; `responses` scripts replies (status, headers, body) for upcoming posts."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.posts = []
+        self.connections = 0
+        self.responses = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def url(self, path="/api/webhooks/1/token"):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            scripted = self.server.responses.pop(0) if self.server.responses else None
+            if scripted is None:
+                self.server.posts.append((self.path, json.loads(body)["content"]))
+        status, headers, reply = scripted or (204, {}, b"")
+        if status == "drop":
+            self.close_connection = True
+            return
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    server = WebhookStub()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.now += seconds
+
+def make_client(stub, path="/api/webhooks/1/token", **kwargs):
+    clock = FakeClock()
+    sleeps = kwargs.pop("sleeps", [])
+    return WebhookClient(stub.url(path), bucket=TokenBucket(rate=1000, capacity=1000, clock=clock, sleep=clock.sleep),
+                         sleep=sleeps.append, **kwargs)
+
+def test_coalesce_packs_messages_under_the_limit():
+    """Messages are joined with newlines into as few posts as fit, and oversized ones are split."""
+    assert coalesce(["a", "b", "c"], limit=3) == ["a\nb", "c"]
+    assert coalesce(["ab", "abcdefg", "x"], limit=3) == ["ab", "abc", "def", "g\nx"]
+    assert coalesce([]) == []
+
+def test_token_bucket_spaces_requests_and_honours_pauses():
+    """Requests beyond the burst wait for tokens; a server-imposed pause blocks until its reset."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == pytest.approx(1.0)
+    bucket.observe({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "3"})
+    bucket.acquire()  # the window has reset by then
+    assert clock.now == pytest.approx(4.0)
+    bucket.observe({"X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "1"})
+    bucket.observe({})
+    assert bucket.blocked_until == pytest.approx(4.0) and bucket.waited == pytest.approx(4.0)
+
+def test_queued_messages_are_coalesced_over_one_connection(stub):
+    """A storm of queued alerts becomes a few posts over a single keep-alive connection."""
+    client = make_client(stub)
+    for index in range(300):
+        client.queue(f"alert {index}: disk usage high on host-{index}")
+    posted, failed = client.flush()
+    assert failed == 0 and posted == len(stub.posts) < 10
+    assert "\n".join(content for _, content in stub.posts).split("\n")[-1].startswith("alert 299")
+    assert stub.connections == 1
+    stats = client.stats()
+    assert stats["messages"] == 300 and stats["posted"] == posted and stats["connections_opened"] == 1
+    client.close()
+
+def test_rate_limits_and_server_errors_are_retried(stub, caplog):
+    """429s wait for retry_after instead of failing; 5xx and dropped connections back off and retry."""
+    sleeps = []
+    client = make_client(stub, sleeps=sleeps, retries=2)
+    stub.responses = [(429, {"Retry-After": "7"}, b'{"retry_after": 0.25}'),
+                      (429, {"Retry-After": "0.5"}, b"not json"),
+                      (503, {}, b"unavailable"), ("drop", {}, b"")]
+    client.queue("deploy finished")
+    assert client.flush() == (1, 0)
+    assert stub.posts == [("/api/webhooks/1/token", "deploy finished")]
+    stats = client.stats()
+    assert stats["throttled"] == 2 and stats["retried"] == 2
+    assert sleeps == [0.5, 1.0]  # exponential backoff
+    assert client.bucket.waited == pytest.approx(0.75)  # retry_after from the body, then Retry-After
+    stub.responses = [(400, {}, b"bad request")]
+    client.queue("rejected")
+    assert client.flush() == (0, 1)
+    assert "failed with 400" in caplog.text
+    client.close()
+
+def test_endless_rate_limiting_gives_up(stub, caplog):
+    """A webhook that answers every attempt with 429 fails the post once the cap is reached."""
+    client = make_client(stub, max_throttled=3)
+    stub.responses = [(429, {}, b'{"retry_after": 1}')] * 10
+    client.queue("never delivered")
+    assert client.flush() == (0, 1)
+    assert client.stats()["throttled"] == 3 and client.bucket.waited == pytest.approx(3)
+    assert "failed with 429" in caplog.text
+    assert len(stub.responses) == 6  # four attempts, then no more
+    client.close()
+
+def test_notifier_fans_out_to_every_channel(stub):
+    """Flushes post to all channels concurrently; a channel name targets just that webhook."""
+    notifier = DiscordNotifier.from_settings({
+        "DISCORD_WEBHOOKS": f"alerts={stub.url('/alerts')}, ops={stub.url('/ops')}",
+        "DISCORD_WEBHOOK_URL": stub.url("/default"), "DISCORD_RATE": "1000", "DISCORD_POOL_SIZE": "1",
+        "DISCORD_MAX_THROTTLED": "2"})
+    assert set(notifier.clients) == {"alerts", "ops", "default"}
+    assert notifier.clients["ops"].max_throttled == 2
+    notifier.queue("everyone")
+    notifier.queue("ops only", "ops")
+    assert notifier.flush() == {"alerts": (1, 0), "ops": (1, 0), "default": (1, 0)}
+    assert sorted(stub.posts) == [("/alerts", "everyone"), ("/default", "everyone"), ("/ops", "everyone\nops only")]
+    assert notifier.stats()["ops"]["messages"] == 2
+    with pytest.raises(ValueError, match="Unknown Discord channel"):
+        notifier.queue("lost", "nowhere")
+    notifier.close()
+    assert DiscordNotifier.from_settings({}) is None
+
+def test_pool_waits_for_a_free_connection():
+    """With every connection checked out, callers wait for one to be released."""
+    pool = HTTPConnectionPool("https", "discord.com", size=1)
+    first = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.05)
+    assert acquired == []
+    pool.release(first)
+    waiter.join(5)
+    assert acquired == [first] and pool.connections_opened == 1
+    pool.release(first, broken=True)
+    assert pool.open_connections == 0
+
+def test_discord_command_posts_through_webhooks(stub, caplog):
+    """The discord command queues and posts messages using the webhooks from its context."""
+    command = DiscordCommand()
+    context = ExecutionContext.buffered(settings={"DISCORD_WEBHOOKS": f"alerts={stub.url('/alerts')},ops={stub.url('/ops')}"})
+    assert command.run(["#ops", "database", "failover"], context) == 1
+    assert command.run(["all", "clear"], context) == 2
+    command.notifier.queue("queued earlier")
+    assert command.execute(context) == 2
+    assert context.getvalue() == ("Posted 1 message(s) to 1 channel(s).\nPosted 2 message(s) to 2 channel(s).\n"
+                                  "I will send something to Discord.\nPosted 2 message(s) to 2 channel(s).\n")
+    assert ("/ops", "database failover") in stub.posts
+    with pytest.raises(ValueError, match="needs a message"):
+        command.run(["#ops"], context)
+    stub.responses = [(400, {}, b"")]
+    command.run(["#alerts", "rejected"], context)
+    assert context.getvalue().endswith("Posted 0 message(s) to 1 channel(s), 1 failed.\n")
+    with caplog.at_level(logging.INFO):
+        command.close()  # at app shutdown: stats logged, pools closed
+    assert "Discord webhook stats for ops: messages=3, posted=3, failed=0" in caplog.text
+    assert "Discord webhook stats for alerts:" in caplog.text and command.notifier is None
+    command.close()
+
+def test_discord_command_without_webhooks():
+    """Without webhook settings the command only announces itself; scripted sends report the problem."""
+    context = ExecutionContext.buffered()
+    command = DiscordCommand()
+    assert command.run([], context) is None
+    with pytest.raises(ValueError, match="DISCORD_WEBHOOK_URL"):
+        command.run(["hello"], context)
+    assert context.getvalue() == "I will send something to Discord.\n"
@@ -0,0 +1,146 @@
+"""
+Tests for the on-disk plugin discovery index.
+"""
+import os
+import json
+import pytest
+from app.discovery import PluginIndex, probe_command_class
+
+def write_plugin(root, name, source):
+    package = root / "myplugins" / name
+    package.mkdir(parents=True, exist_ok=True)
+    (package / "__init__.py").write_text(source)
+    return package / "__init__.py"
+
+@pytest.fixture
+def plugin_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_plugin(tmp_path, "alpha", "from app.commands import Command\nclass AlphaCommand(Command):\n    pass\n")
+    write_plugin(tmp_path, "beta", "import app.commands\nclass Helper:\n    pass\nclass Runner(app.commands.Command):\n    pass\n")
+    write_plugin(tmp_path, "notes", "VALUE = 1\n")
+    (tmp_path / "myplugins" / "stray.py").write_text("")
+    settle(tmp_path / "myplugins")
+    return tmp_path
+
+def settle(path):
+    """Backdate a directory so its mtime is outside the index's racy window."""
+    past = os.stat(path).st_mtime_ns - 60 * 10**9
+    os.utime(path, ns=(past, past))
+
+def make_index(tmp_path):
+    return PluginIndex("myplugins", str(tmp_path / "index.json"))
+
+def test_probe_command_class(plugin_tree):
+    """The conventional class name wins, otherwise the first Command subclass is used."""
+    assert probe_command_class("myplugins/alpha/__init__.py", "alpha") == "AlphaCommand"
+    assert probe_command_class("myplugins/beta/__init__.py", "beta") == "Runner"
+    assert probe_command_class("myplugins/notes/__init__.py", "notes") is None
+
+def test_cold_scan_writes_index(plugin_tree):
+    """The first discovery scans the directory and records every plugin."""
+    index = make_index(plugin_tree)
+    entries = index.discover()
+    assert [(e['name'], e['module'], e['class_name']) for e in entries] == [
+        ("alpha", "myplugins.alpha", "AlphaCommand"), ("beta", "myplugins.beta", "Runner")]
+    assert index.rescanned == ["alpha", "beta", "notes"]
+    stored = json.loads((plugin_tree / "index.json").read_text())
+    assert [p['name'] for p in stored['plugins']] == ["alpha", "beta", "notes"]
+    assert all(p['hash'] and p['mtime'] for p in stored['plugins'])
+
+def test_warm_start_skips_scan(plugin_tree, monkeypatch):
+    """With an up-to-date index neither the directory scan nor probing happens."""
+    make_index(plugin_tree).discover()
+    def no_scan(paths):
+        raise AssertionError("directory should not be scanned")
+    monkeypatch.setattr("pkgutil.iter_modules", no_scan)
+    index = make_index(plugin_tree)
+    assert [e['name'] for e in index.discover()] == ["alpha", "beta"]
+    assert index.rescanned == [] and index.changed is False
+
+def test_only_changed_plugins_rescanned(plugin_tree):
+    """A touched file with the same content keeps its entry; an edited one is re-probed."""
+    make_index(plugin_tree).discover()
+    alpha = plugin_tree / "myplugins" / "alpha" / "__init__.py"
+    stat = alpha.stat()
+    os.utime(alpha, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index = make_index(plugin_tree)
+    index.discover()
+    assert index.rescanned == [] and index.changed is True
+    beta = write_plugin(plugin_tree, "beta", "from app.commands import Command\nclass BetaCommand(Command):\n    pass\n")
+    os.utime(beta, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    index = make_index(plugin_tree)
+    entries = index.discover()
+    assert index.rescanned == ["beta"]
+    assert entries[1]['class_name'] == "BetaCommand"
+
+def test_added_and_removed_plugins(plugin_tree):
+    """Adding a plugin or removing a plugin's __init__.py updates the index."""
+    make_index(plugin_tree).discover()
+    (plugin_tree / "myplugins" / "notes" / "__init__.py").unlink()
+    index = make_index(plugin_tree)
+    assert [e['name'] for e in index.discover()] == ["alpha", "beta"]
+    stored = json.loads((plugin_tree / "index.json").read_text())
+    assert [p['name'] for p in stored['plugins']] == ["alpha", "beta"]
+    write_plugin(plugin_tree, "gamma", "class GammaCommand:\n    pass\n")
+    index = make_index(plugin_tree)
+    assert [e['name'] for e in index.discover()] == ["alpha", "beta", "gamma"]
+    assert index.rescanned == ["gamma"]
+
+def test_recently_modified_directory_is_rescanned(tmp_path, monkeypatch):
+    """A directory changed within the racy window is scanned again next time."""
+    monkeypatch.chdir(tmp_path)
+    write_plugin(tmp_path, "alpha", "class AlphaCommand:\n    pass\n")
+    make_index(tmp_path).discover()
+    assert json.loads((tmp_path / "index.json").read_text())['dir_mtime'] is None
+    scans = []
+    monkeypatch.setattr("pkgutil.iter_modules", lambda paths: scans.append(paths) or [])
+    make_index(tmp_path).discover()
+    assert scans
+
+def test_invalid_index_is_ignored(plugin_tree):
+    """Corrupt files and indexes for another plugin directory force a full scan."""
+    (plugin_tree / "index.json").write_text("not json")
+    index = make_index(plugin_tree)
+    assert len(index.discover()) == 2 and len(index.rescanned) == 3
+    stored = json.loads((plugin_tree / "index.json").read_text())
+    stored['plugins_path'] = "/elsewhere"
+    (plugin_tree / "index.json").write_text(json.dumps(stored))
+    index = make_index(plugin_tree)
+    index.discover()
+    assert len(index.rescanned) == 3
+
+def test_failed_save_is_not_fatal(plugin_tree, monkeypatch, caplog):
+    """An index that cannot be written is logged and skipped; discovery still returns its entries."""
+    missing = PluginIndex("myplugins", str(plugin_tree / "missing" / "index.json"))
+    assert len(missing.discover()) == 2
+    assert "Could not write plugin index" in caplog.text
+    def refuse(source, target):
+        raise PermissionError("read-only")
+    monkeypatch.setattr("os.replace", refuse)
+    caplog.clear()
+    assert len(make_index(plugin_tree).discover()) == 2
+    assert "read-only" in caplog.text
+    assert os.listdir(plugin_tree) == ["myplugins"]  # the temporary file was removed
+
+def test_reexported_command_class_is_found_by_import(plugin_tree, monkeypatch, caplog):
+    """A command re-exported from a submodule is found by importing the package once; class-less ones are logged."""
+    import sys
+    package = write_plugin(plugin_tree, "widget", "from .impl import WidgetCommand\n").parent
+    (package / "impl.py").write_text("class WidgetCommand:\n    pass\n")
+    monkeypatch.syspath_prepend(str(plugin_tree))
+    try:
+        entries = make_index(plugin_tree).discover()
+    finally:
+        for module in [name for name in sys.modules if name.split(".")[0] == "myplugins"]:
+            del sys.modules[module]
+    assert [(e['name'], e['class_name']) for e in entries][-1] == ("widget", "WidgetCommand")
+    stored = json.loads((plugin_tree / "index.json").read_text())
+    assert {p['name']: p['class_name'] for p in stored['plugins']}["widget"] == "WidgetCommand"
+    assert "Plugin notes has no command class" in caplog.text
+
+def test_unimportable_plugin_is_logged(plugin_tree, caplog):
+    """A plugin that cannot be imported for the fallback probe is reported, not fatal."""
+    write_plugin(plugin_tree, "broken", "raise RuntimeError('bad plugin')\n")
+    entries = make_index(plugin_tree).discover()
+    assert "broken" not in [e['name'] for e in entries]
+    assert "Error importing plugin broken" in caplog.text
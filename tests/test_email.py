@@ -0,0 +1,197 @@
+"""
+Tests for pooled, batched SMTP delivery, against a local SMTP stand-in server.
+"""
+import logging
+import smtplib
+import threading
+import socketserver
+import pytest
+from app.commands import ExecutionContext
+from app.plugins.email import EmailCommand
+from app.plugins.email.sender import EmailSender, SMTPConnectionPool, build_message, is_transient
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough SMTP to accept mail; `replies` scripts failures for upcoming MAIL commands."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPSession)
+        self.messages = []
+        self.connections = 0
+        self.replies = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def next_reply(self):
+        with self.lock:
+            return self.replies.pop(0) if self.replies else None
+
+class SMTPSession(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 stand-in ready")
+        recipients = []
+        while line := self.rfile.readline():
+            verb = line.decode().strip().split(" ")[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "MAIL":
+                scripted = self.server.next_reply()
+                if scripted == "drop":
+                    return
+                self.reply(scripted or "250 OK")
+                recipients = []
+            elif verb == "RCPT":
+                recipients.append(line)
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = []
+                while (chunk := self.rfile.readline()) != b".\r\n":
+                    data.append(chunk)
+                with self.server.lock:
+                    self.server.messages.append(b"".join(data).decode())
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 OK")
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_sender(server, **kwargs):
+    pool = SMTPConnectionPool("127.0.0.1", server.port, size=kwargs.pop("size", 2), timeout=5)
+    return EmailSender(pool, sender="app@example.com", sleep=lambda seconds: None, **kwargs)
+
+def test_burst_reuses_pooled_connections(smtp_server):
+    """A burst of messages goes out over at most pool-size connections, in batches."""
+    sender = make_sender(smtp_server, batch_size=25)
+    for index in range(100):
+        sender.queue(f"user{index}@example.com", f"Notice {index}", "Hello")
+    assert sender.flush() == (100, 0)
+    assert sender.flush() == (0, 0)
+    stats = sender.stats()
+    assert len(smtp_server.messages) == 100 and smtp_server.connections <= 2
+    assert stats["sent"] == 100 and stats["batches"] == 4 and stats["connections_opened"] == smtp_server.connections
+    assert stats["messages_per_second"] > 0 and stats["latency_max_ms"] >= stats["latency_avg_ms"] > 0
+    sender.close()
+    assert sender.pool.open_connections == 0
+
+def test_transient_failures_are_retried(smtp_server, caplog):
+    """4xx replies and dropped connections are retried; 5xx replies fail that message only."""
+    sender = make_sender(smtp_server, size=1, retries=2)
+    smtp_server.replies = ["451 try later", "drop", "550 no such mailbox"]
+    messages = [build_message("app@example.com", f"user{index}@example.com", "Hi", "Body") for index in range(3)]
+    assert sender.send_many(messages) == (2, 1)
+    with caplog.at_level(logging.INFO):
+        stats = sender.log_stats()
+    assert stats["retried"] == 2 and stats["failed"] == 1 and stats["connections_opened"] == 2
+    assert "Email sender stats: sent=2" in caplog.text
+    smtp_server.replies = ["451 busy"] * 3
+    assert sender.send_many(messages[:1]) == (0, 1)  # gives up after the retry budget
+    sender.close()
+
+def test_unreachable_server_fails_the_batch():
+    """When no session can be opened the whole batch is reported as failed."""
+    pool = SMTPConnectionPool("127.0.0.1", 1, size=1, timeout=1)
+    sender = EmailSender(pool, retries=1, sleep=lambda seconds: None)
+    messages = [build_message("a@example.com", "b@example.com", "Hi", "Body")] * 3
+    assert sender.send_many(messages) == (0, 3)
+    assert sender.stats()["retried"] == 1 and pool.open_connections == 0
+
+def test_login_failures_are_not_retried(monkeypatch):
+    """A rejected login fails the rest of the batch at once."""
+    class RejectingSMTP:
+        def __init__(self, *args, **kwargs):
+            pass
+        def starttls(self, context):
+            pass
+        def login(self, username, password):
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+    monkeypatch.setattr(smtplib, "SMTP", RejectingSMTP)
+    pool = SMTPConnectionPool("mail.example.com", 587, username="app", starttls=True)
+    sender = EmailSender(pool, sleep=lambda seconds: None)
+    assert sender.send_many([build_message("a@example.com", "b@example.com", "Hi", "Body")] * 2) == (0, 2)
+    assert sender.retried == 0
+
+def test_transient_classification():
+    """Recipient refusals are transient only when every refusal is a 4xx."""
+    assert is_transient(smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"busy")}))
+    assert not is_transient(smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"unknown")}))
+    assert is_transient(ConnectionResetError()) and not is_transient(smtplib.SMTPException())
+
+def test_sender_from_settings():
+    """SMTP_* settings configure the pool; without SMTP_HOST there is no sender."""
+    assert EmailSender.from_settings({}) is None
+    sender = EmailSender.from_settings({"SMTP_HOST": "mail.example.com", "SMTP_PORT": "465", "SMTP_SSL": "true",
+                                        "SMTP_POOL_SIZE": "8", "SMTP_BATCH_SIZE": "50", "SMTP_FROM": "app@example.com"})
+    assert (sender.pool.port, sender.pool.size, sender.pool.use_ssl, sender.pool.starttls) == (465, 8, True, False)
+    assert sender.batch_size == 50 and sender.sender == "app@example.com"
+    sender.close()
+
+def test_email_command_sends_through_the_pool(smtp_server, caplog):
+    """The email command queues and delivers messages using the SMTP settings from its context."""
+    command = EmailCommand()
+    settings = {"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(smtp_server.port), "SMTP_FROM": "app@example.com"}
+    context = ExecutionContext.buffered(settings=settings)
+    assert command.run(["ops@example.com", "Disk full", "Please", "check"], context) == 1
+    command.sender.queue("dev@example.com", "Queued", "Later")
+    assert command.execute(context) == 1
+    assert context.getvalue() == "Sent 1 email(s).\nI will email you.\nSent 1 email(s).\n"
+    assert "Subject: Disk full" in smtp_server.messages[0] and "Please check" in smtp_server.messages[0]
+    assert smtp_server.connections == 1
+    with caplog.at_level(logging.INFO):
+        command.close()  # at app shutdown: stats logged, pool closed
+    assert "Email sender stats: sent=2" in caplog.text
+    assert command.sender is None
+    command.close()
+
+def test_email_command_without_smtp():
+    """Without SMTP settings the command only announces itself; scripted sends report the problem."""
+    context = ExecutionContext.buffered()
+    command = EmailCommand()
+    assert command.run([], context) is None
+    with pytest.raises(ValueError, match="SMTP_HOST"):
+        command.run(["ops@example.com", "Subject"], context)
+    with pytest.raises(ValueError, match="recipient"):
+        command.run(["ops@example.com"], context)
+    assert context.getvalue() == "I will email you.\n"
+
+def test_pool_waits_for_a_free_connection(monkeypatch):
+    """Callers block while every connection is checked out, and closing tolerates dead sessions."""
+    class FakeSMTP:
+        def __init__(self, *args, **kwargs):
+            self.args = args
+        def quit(self):
+            raise smtplib.SMTPServerDisconnected("gone")
+        def close(self):
+            self.closed = True
+    monkeypatch.setattr(smtplib, "SMTP_SSL", FakeSMTP)
+    pool = SMTPConnectionPool("mail.example.com", 465, size=1, use_ssl=True)
+    first = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.05)
+    assert acquired == [] and waiter.is_alive()
+    pool.release(first)
+    waiter.join(5)
+    assert acquired == [first] and pool.connections_opened == 1
+    pool.release(first)
+    pool.close()
+    assert first.closed and pool.open_connections == 0
@@ -0,0 +1,85 @@
+"""
+Tests for the calculator expression compiler and its LRU plan cache.
+"""
+import pytest
+from app.plugins.calculator.expression import ExpressionCompiler, Expression, Parser, tokenize
+
+@pytest.fixture
+def compiler():
+    return ExpressionCompiler(maxsize=2)
+
+def test_parse_builds_ast():
+    """Infix input parses into nested binop tuples with the usual precedence."""
+    assert Parser("(a + b) * c / d").parse() == (
+        'binop', 'divide',
+        ('binop', 'multiply', ('binop', 'add', ('var', 'a'), ('var', 'b')), ('var', 'c')),
+        ('var', 'd'))
+    assert Parser("-x + +2").parse() == (
+        'binop', 'add', ('binop', 'subtract', ('num', 0.0), ('var', 'x')), ('num', 2.0))
+    assert tokenize("1.5e2 .5 ") == [('num', 150.0), ('num', 0.5)]
+
+@pytest.mark.parametrize("source, message", [
+    ("", "Empty expression"),
+    ("1 +", "Unexpected end of expression"),
+    ("(1 + 2", "Missing closing parenthesis"),
+    ("1 2", "Unexpected token"),
+    ("* 2", "Unexpected token"),
+    ("2 % 3", "Unexpected character"),
+])
+def test_parse_errors(source, message):
+    """Malformed expressions raise ValueError with a readable message."""
+    with pytest.raises(ValueError, match=message):
+        Parser(source).parse()
+
+def test_evaluate_with_variables(compiler):
+    """Compiled expressions evaluate against keyword variables."""
+    assert compiler.evaluate("(a + b) * c / d", a=1, b=3, c=5, d=2) == 10.0
+    assert compiler.evaluate("2 * x - x / 4", x=8) == 14.0
+    assert compiler.compile("a*b+a").variables == ('a', 'b')
+    with pytest.raises(ValueError, match="Missing values for: b"):
+        compiler.evaluate("a + b", a=1)
+    with pytest.raises(ZeroDivisionError):
+        compiler.evaluate("1 / (a - a)", a=3)
+
+def test_lru_cache_counters_and_eviction(compiler):
+    """Repeat formulas hit the cache; the least recently used plan is evicted."""
+    first = compiler.compile("a + 1")
+    assert compiler.compile(" a + 1 ") is first
+    compiler.compile("a + 2")
+    compiler.compile("a + 1")
+    compiler.compile("a + 3")
+    assert list(compiler.cache) == ["a + 1", "a + 3"]
+    assert compiler.cache_info() == {'hits': 2, 'misses': 3, 'size': 2, 'maxsize': 2}
+
+def test_expression_command(monkeypatch, capfd):
+    """The Expression command prompts for the formula and each variable."""
+    inputs = iter(["x * y + 1", "3", "4"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+    Expression().execute()
+    assert "The result is 13.0" in capfd.readouterr().out
+
+@pytest.mark.parametrize("answers, message", [
+    (["10 / x", "0"], "Cannot divide by zero."),
+    (["x +", ], "Invalid input. Unexpected end of expression."),
+    (["x", "abc"], "Invalid input."),
+])
+def test_expression_command_errors(monkeypatch, capfd, answers, message):
+    """Division by zero and bad input are reported like the other operations."""
+    inputs = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+    Expression().execute()
+    assert message in capfd.readouterr().out
+
+def test_expression_in_the_calculator_menu():
+    """The calculator menu offers Expression, which shares the calculator's compiled-plan cache."""
+    from app.commands import ExecutionContext
+    from app.plugins.calculator import CalculatorCommand
+    calc = CalculatorCommand()
+    context = ExecutionContext.buffered(["5", "a * 2", "4", "6"])
+    calc.execute(context)
+    out = context.getvalue()
+    assert "5. Expression" in out and "6. Main Menu" in out and "The result is 8.0" in out
+    assert calc.operations["5"].compiler is calc.expressions
+    assert calc.evaluate("a * 2", "a=1") == 2.0
+    assert calc.expressions.cache_info()['hits'] == 1
+    assert [(entry.op, entry.status) for entry in calc.history.last(5)] == [("expression", "ok")]
@@ -0,0 +1,126 @@
+"""
+Tests for the calculator's ring-buffer history and its append-only history file.
+"""
+import math
+import pytest
+from app.commands import ExecutionContext
+from app.plugins.calculator import CalculatorCommand
+from app.plugins.calculator.history import (MAGIC, RECORD, CalculationHistory, HistoryBuffer, HistoryFile,
+                                            op_code)
+
+def test_ring_buffer_keeps_the_latest():
+    """Once full, the ring overwrites its oldest slot; last() is newest first."""
+    buffer = HistoryBuffer(capacity=3)
+    for index in range(5):
+        buffer.append(float(index), op_code("add"), index, 1, index + 1, 0)
+    assert len(buffer) == 3 and buffer.total == 5
+    assert [entry.a for entry in buffer.last(10)] == [4, 3, 2]
+    assert buffer.last(1)[0].op == "add" and buffer.last(1)[0].status == "ok"
+    assert len(buffer.ops) == 3  # the columns never grow
+    with pytest.raises(ValueError):
+        HistoryBuffer(capacity=0)
+
+def test_aggregates_skip_failed_results():
+    """Failures are counted; only successful results feed the sum, min, max and mean."""
+    buffer = HistoryBuffer()
+    assert buffer.aggregate() == {'count': 0, 'failed': 0, 'sum': 0.0, 'min': None, 'max': None, 'mean': None}
+    buffer.append(1.0, op_code("add"), 1, 2, 3, 0)
+    buffer.append(2.0, op_code("add"), 2, 3, 5, 0)
+    buffer.append(3.0, op_code("divide"), 1, 0, math.nan, 2)
+    assert buffer.aggregate() == {'count': 3, 'failed': 1, 'sum': 8.0, 'min': 3.0, 'max': 5.0, 'mean': 4.0}
+    assert buffer.aggregate(op_code("divide"))['failed'] == 1
+
+def test_history_file_appends_and_maps(tmp_path):
+    """Records survive reopening; queries read them back through a memory map."""
+    path = str(tmp_path / "history" / "calc.bin")
+    history = HistoryFile(path)
+    assert len(history) == 0 and history.last(5) == [] and history.aggregate()['count'] == 0
+    for index in range(4):
+        history.append(float(index), op_code("multiply"), index, 2, index * 2, 0)
+    history.close()
+    reopened = HistoryFile(path)
+    reopened.append(9.0, op_code("subtract"), 5, 1, 4, 0)
+    assert len(reopened) == 5
+    assert [entry.result for entry in reopened.last(2)] == [4.0, 6.0]
+    assert reopened.aggregate(op_code("multiply"))['sum'] == 12.0
+    reopened.close()
+    assert (tmp_path / "history" / "calc.bin").stat().st_size == len(MAGIC) + 5 * RECORD.size
+
+def test_history_file_trims_torn_records_and_rejects_foreign_files(tmp_path, monkeypatch):
+    """A partial trailing record is dropped on open; other files are refused."""
+    path = tmp_path / "calc.bin"
+    history = HistoryFile(str(path))
+    history.append(1.0, op_code("add"), 1, 1, 2, 0)
+    history.close()
+    with open(path, "ab") as handle:
+        handle.write(b"\x00" * 7)
+    history = HistoryFile(str(path))
+    history.append(2.0, op_code("add"), 2, 2, 4, 0)
+    assert [entry.result for entry in history.last(5)] == [4.0, 2.0]
+    history.close()
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"not a history file")
+    with pytest.raises(ValueError, match="not a calculator history file"):
+        HistoryFile(str(other))
+    monkeypatch.chdir(tmp_path)
+    HistoryFile("bare.bin").close()  # a bare file name needs no directory
+    assert (tmp_path / "bare.bin").read_bytes() == MAGIC
+
+def test_calculation_history_uses_the_file_beyond_the_ring(tmp_path):
+    """Queries reaching past the ring are answered from disk, as are aggregates."""
+    history = CalculationHistory.from_settings({'CALCULATOR_HISTORY_SIZE': '2',
+                                                'CALCULATOR_HISTORY_FILE': str(tmp_path / "calc.bin")})
+    for index in range(4):
+        history.record("add", index, 1, index + 1)
+    history.record("divide", 1, 0, status="division by zero")
+    assert len(history.last(2)) == 2
+    assert [entry.a for entry in history.last(5)] == [1.0, 3.0, 2.0, 1.0, 0.0]
+    assert history.aggregate("add")['count'] == 4
+    history.close()
+    memory_only = CalculationHistory.from_settings({})
+    memory_only.record("expression", result=7.0)
+    assert memory_only.buffer.capacity == 1000
+    assert memory_only.aggregate()['sum'] == 7.0
+    assert math.isnan(memory_only.last(1)[0].a)
+    memory_only.close()
+
+def test_calculator_records_scripted_operations():
+    """run() records results and failures; history and stats report them."""
+    calc = CalculatorCommand(history=CalculationHistory(capacity=10))
+    context = ExecutionContext.buffered()
+    calc.run(["add", "2", "3"], context)
+    calc.run(["divide", "1", "0"], context)
+    with pytest.raises(ValueError):
+        calc.run(["multiply", "x", "2"], context)
+    with pytest.raises(ValueError):
+        calc.run(["power", "2", "3"], context)
+    calc.run(["expression", "a * 2", "a=4"], context)
+    assert [(entry.op, entry.status) for entry in calc.history.last(10)] == [
+        ("expression", "ok"), ("multiply", "invalid"), ("divide", "division by zero"), ("add", "ok")]
+    assert math.isnan(calc.history.last(2)[1].a) and calc.history.last(2)[1].b == 2
+    output = ExecutionContext.buffered()
+    assert calc.run(["history", "2"], output) == 2
+    lines = output.getvalue().splitlines()
+    assert lines[0].endswith("expression = 8")
+    assert lines[1].endswith("multiply nan 2 failed (invalid)")
+    output = ExecutionContext.buffered()
+    assert calc.run(["stats"], output)['count'] == 4
+    calc.run(["stats", "divide"], output)
+    assert output.getvalue().splitlines() == [
+        "all: 4 calculation(s), 2 failed, sum 13, min 5, max 8, mean 6.5.",
+        "divide: 1 calculation(s), 1 failed."]
+    with pytest.raises(ValueError, match="Unknown calculator operation"):
+        calc.run(["stats", "power"], output)
+
+def test_calculator_records_menu_operations():
+    """Menu operations are recorded with the operands typed at their prompts."""
+    calc = CalculatorCommand()
+    context = ExecutionContext.buffered(["1", "2", "3", "4", "6", "0", "4", "x", "4", "6", "y", "6"],
+                                        settings={'CALCULATOR_HISTORY_SIZE': '5'})
+    calc.execute(context)
+    assert calc.history.buffer.capacity == 5
+    entries = calc.history.last(5)
+    assert [(entry.op, entry.status) for entry in entries] == [
+        ("divide", "invalid"), ("divide", "invalid"), ("divide", "division by zero"), ("add", "ok")]
+    assert (entries[3].a, entries[3].b, entries[3].result) == (2.0, 3.0, 5.0)
+    assert calc.run(["history"], ExecutionContext.buffered()) == 4
@@ -0,0 +1,176 @@
+"""
+Tests for the indexed log query tool.
+"""
+import io
+import gzip
+import json
+import types
+import logging
+from datetime import date, datetime
+import pytest
+import app.logger.query as query_module
+from app import App
+from app.logger import TEXT_FORMAT
+from app.logger.query import LogQuery, SegmentIndex, main, parse_time
+
+def stamp(minute, second=0):
+    return f"2024-05-01 10:{minute:02d}:{second:02d},000"
+
+def epoch(minute, second=0):
+    return datetime(2024, 5, 1, 10, minute, second).timestamp()
+
+def divide_session(minute, second=0, fail=True):
+    lines = [f"{stamp(minute, second)} - INFO - Executing command: calculator",
+             f"{stamp(minute, second)} - INFO - Executing Divide command."]
+    if fail:
+        lines.append(f"{stamp(minute, second)} - ERROR - Division by zero attempted.")
+    else:
+        lines.append(f"{stamp(minute, second)} - INFO - Division result: 2.0")
+    lines.append(f"{stamp(minute, second)} - INFO - Command calculator finished (ok) in 0.001s.")
+    return lines
+
+@pytest.fixture
+def log_file(tmp_path):
+    lines = []
+    for minute in range(0, 10):
+        lines += divide_session(minute, fail=minute % 2 == 0)
+        lines.append(f"{stamp(minute, 30)} - ERROR - Error loading calculator operation add: boom")
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+def test_divide_errors_in_a_time_window(log_file):
+    """Only the matching records are returned, read from a few index blocks."""
+    query = LogQuery(str(log_file), block_records=4)
+    records = query.search(epoch(2), epoch(5), command="Divide", level="error")
+    assert [record.time for record in records] == [epoch(2), epoch(4)]
+    assert all(record.text.endswith("Division by zero attempted.") for record in records)
+    assert {record.command for record in records} == {"divide"}
+    assert query.blocks_read < len(SegmentIndex.load(query.index_path(str(log_file)), 4).blocks) / 2
+
+def test_filters_and_unknown_level(log_file):
+    """Each filter is optional; an unknown level is rejected."""
+    query = LogQuery(str(log_file))
+    assert len(query.search()) == 50
+    assert len(query.search(command="calculator")) == 20
+    assert len(query.search(level="warning")) == 15
+    assert query.search(command="email") == []
+    with pytest.raises(ValueError, match="Unknown log level"):
+        query.search(level="loud")
+
+def test_index_is_incremental(log_file, monkeypatch):
+    """Appended records are indexed from the last block on, not from the start of the file."""
+    query = LogQuery(str(log_file), block_records=4)
+    assert len(query.search(command="divide", level="error")) == 5
+    scanned = []
+    original = query_module.scan
+    monkeypatch.setattr(query_module, "scan", lambda data, start, *args: scanned.append(start) or original(data, start, *args))
+    with open(log_file, "a") as handle:
+        handle.write("\n".join(divide_session(20)) + "\n" + f"{stamp(21)} - INFO - partial")
+    records = query.search(command="divide", level="error")
+    assert len(records) == 6
+    assert scanned[0] > 0  # the update resumed inside the file
+    index = SegmentIndex.load(query.index_path(str(log_file)), 4)
+    assert index.size == log_file.stat().st_size - len(f"{stamp(21)} - INFO - partial")
+
+def test_rewritten_file_is_reindexed(log_file):
+    """A rotated (replaced) file does not reuse the old index."""
+    query = LogQuery(str(log_file))
+    assert len(query.search(level="error")) == 15
+    log_file.write_text("\n".join(divide_session(40, fail=True)) + "\n")
+    assert len(query.search(level="error")) == 1
+    log_file.write_text("")
+    assert query.search() == []
+
+def test_traceback_lines_belong_to_their_record(tmp_path):
+    """Continuation lines stay with the record above them."""
+    path = tmp_path / "app.log"
+    path.write_text("stray line\n"
+                    f"{stamp(1)} - ERROR - Job 3 (email) failed: boom\n"
+                    "Traceback (most recent call last):\n"
+                    "RuntimeError: boom\n"
+                    f"{stamp(2)} - INFO - after\n")
+    records = LogQuery(str(path)).search(command="email")
+    assert len(records) == 1
+    assert records[0].text.endswith("RuntimeError: boom")
+
+def test_json_lines_and_compressed_segments(tmp_path, monkeypatch):
+    """JSON records use their command field; rotated gzip and zstd segments are searched too."""
+    def entry(minute, level, message, **fields):
+        return json.dumps({"time": epoch(minute), "level": level, "message": message, **fields})
+    old = [entry(0, "ERROR", "Command divide finished (error) in 0.001s.", command="divide", outcome="error")]
+    older = [entry(-1 % 60, "INFO", "ignored"), "{not json"]
+    current = [entry(5, "ERROR", "Command divide finished (error) in 0.002s.", command="divide", outcome="error"),
+               entry(6, "INFO", "Command greet finished (ok) in 0.001s.", command="greet", outcome="ok")]
+    (tmp_path / "app.log.20240501-100100.gz").write_bytes(gzip.compress(("\n".join(old) + "\n").encode()))
+    (tmp_path / "app.log.20240501-100000.zst").write_bytes(("\n".join(older) + "\n").encode())
+    (tmp_path / "app.log").write_text("\n".join(current) + "\n")
+
+    class FakeDecompressor:
+        def stream_reader(self, handle):
+            return handle
+    monkeypatch.setattr(query_module, "zstandard", types.SimpleNamespace(ZstdDecompressor=FakeDecompressor))
+    query = LogQuery(str(tmp_path / "app.log"))
+    records = query.search(command="divide")
+    assert [record.time for record in records] == [epoch(0), epoch(5)]
+    assert query.search(command="divide") == records  # compressed segments reuse their stored index
+    monkeypatch.setattr(query_module, "zstandard", None)
+    with pytest.raises(ValueError, match="zstandard is required"):
+        query.search()
+
+def test_stale_indexes_are_removed(log_file):
+    """Indexes of segments that no longer exist are deleted; corrupt ones are rebuilt."""
+    query = LogQuery(str(log_file))
+    query.search()
+    stale = log_file.parent / ".index" / "app.log.20200101-000000.gz.json"
+    stale.write_text("{}")
+    (log_file.parent / ".index" / "app.log.json").write_text("not json")
+    assert len(query.search()) == 50
+    assert not stale.exists()
+    (log_file.parent / ".index" / "app.log.json").write_text('{"version": 0}')
+    assert len(query.search()) == 50
+    log_file.write_text("no header here\n")
+    assert query.search() == []
+    log_file.unlink()
+    assert query.search() == []
+    assert LogQuery(str(log_file.parent / "elsewhere" / "app.log")).search() == []
+
+def test_parse_time():
+    """Epoch seconds, ISO date-times and times of day are accepted."""
+    assert parse_time("1700000000") == 1700000000.0
+    assert parse_time("2024-05-01T10:05:00") == epoch(5)
+    assert parse_time("10:05", today=date(2024, 5, 1)) == epoch(5)
+    with pytest.raises(ValueError):
+        parse_time("soon")
+
+def test_main(log_file, capsys):
+    """The command-line entry point prints matching records and a summary."""
+    assert main(["--log", str(log_file), "--since", str(epoch(2)), "--until", "2024-05-01 10:05",
+                 "--command", "divide", "--level", "error"]) == 0
+    captured = capsys.readouterr()
+    assert captured.out.count("Division by zero attempted.") == 2
+    assert "2 record(s) matched" in captured.err
+    assert main(["--log", str(log_file), "--level", "loud"]) == 2
+    assert "Unknown log level" in capsys.readouterr().err
+
+def test_scripted_calculator_errors_are_found_by_operation(tmp_path, capsys):
+    """A scripted "calculator divide 1 0" logs its error under the divide operation."""
+    path = tmp_path / "app.log"
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    level = root.level
+    root.setLevel(logging.INFO)
+    try:
+        App().run_script(io.StringIO("calculator add 1 2\ncalculator divide 1 0\ncalculator multiply 2 3\n"))
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+        handler.close()
+    capsys.readouterr()
+    assert main(["--log", str(path), "--command", "divide", "--level", "error"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1 and lines[0].endswith("ERROR - Division by zero attempted.")
+    assert main(["--log", str(path), "--command", "multiply"]) == 0
+    assert "Executing calculator operation: multiply" in capsys.readouterr().out
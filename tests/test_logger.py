@@ -0,0 +1,314 @@
+"""
+Tests for the queue-backed, batching log pipeline.
+"""
+import sys
+import gzip
+import json
+import types
+import logging
+import pytest
+import app.logger as logger_module
+from app import App
+from app.commands import CommandHandler, Command
+from app.logger import (BatchingFileHandler, LogPipeline, JsonLinesFormatter, RotatingBatchingFileHandler,
+                        SegmentCompressor, FastLogger, configure_sampling, get_logger, start_file_pipeline)
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def isolated_logger():
+    logger = logging.getLogger("tests.pipeline")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    logger.handlers.clear()
+
+def test_pipeline_drains_on_stop(tmp_path, isolated_logger):
+    """Records queued before stop() are all written once the pipeline drains."""
+    log_file = tmp_path / "app.log"
+    pipeline = start_file_pipeline(str(log_file), {'LOG_BATCH_SIZE': '1000'}, logger=isolated_logger)
+    for i in range(250):
+        isolated_logger.info("record %d", i)
+    pipeline.stop(isolated_logger)
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 250
+    assert lines[-1].endswith("INFO - record 249")
+    assert pipeline.queue_handler not in isolated_logger.handlers
+    pipeline.stop(isolated_logger)  # stopping twice is a no-op
+
+def test_pipeline_formats_on_its_own_thread(isolated_logger):
+    """Records reach the handler unformatted, args intact, and are formatted on the pipeline thread."""
+    import threading
+    seen = []
+
+    class Recording(logging.Handler):
+        def emit(self, record):
+            seen.append((record.msg, record.args, threading.current_thread().name, self.format(record)))
+    pipeline = LogPipeline(Recording()).start(isolated_logger)
+    isolated_logger.info("sum %d + %d", 1, 2)
+    pipeline.stop(isolated_logger)
+    assert seen == [("sum %d + %d", (1, 2), "log-pipeline", "sum 1 + 2")]
+
+def test_batching_handler_flushes_by_size(tmp_path):
+    """Records are held back until batch_size records are pending."""
+    log_file = tmp_path / "batched.log"
+    handler = BatchingFileHandler(str(log_file), batch_size=3, flush_interval=3600)
+    record = logging.makeLogRecord({'msg': 'hello', 'levelname': 'INFO'})
+    handler.handle(record)
+    handler.handle(record)
+    assert log_file.read_text() == ""
+    handler.handle(record)
+    assert log_file.read_text() == "hello\nhello\nhello\n"
+    handler.close()
+    handler.flush()  # flushing a closed handler is harmless
+
+def test_batching_handler_flushes_by_time(tmp_path):
+    """An expired flush interval writes pending records on the next emit."""
+    log_file = tmp_path / "timed.log"
+    handler = BatchingFileHandler(str(log_file), batch_size=1000, flush_interval=0)
+    handler.handle(logging.makeLogRecord({'msg': 'now'}))
+    assert log_file.read_text() == "now\n"
+    handler.close()
+
+def test_batching_handler_reports_format_errors(tmp_path, monkeypatch):
+    """Formatting failures go through handleError instead of raising."""
+    handler = BatchingFileHandler(str(tmp_path / "bad.log"))
+    errors = []
+    monkeypatch.setattr(handler, "handleError", errors.append)
+    bad = logging.makeLogRecord({'msg': '%d', 'args': ('x',)})
+    handler.handle(bad)
+    assert errors == [bad]
+    handler.close()
+
+def test_pipeline_idle_flush(tmp_path, isolated_logger):
+    """The background thread flushes pending records when the queue goes idle."""
+    log_file = tmp_path / "idle.log"
+    handler = BatchingFileHandler(str(log_file), batch_size=1000, flush_interval=3600)
+    pipeline = LogPipeline(handler, flush_interval=0.01).start(isolated_logger)
+    isolated_logger.info("idle")
+    for _ in range(500):
+        if log_file.read_text():
+            break
+        pipeline.thread.join(0.01)
+    assert log_file.read_text().strip() == "idle"
+    pipeline.stop(isolated_logger)
+
+def test_app_installs_pipeline_on_unconfigured_root(tmp_path, monkeypatch):
+    """App routes the root logger through the pipeline and drains it at shutdown."""
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(logging, "shutdown", lambda: None)
+    app = App()
+    assert app.log_pipeline is not None
+    assert root.handlers == [app.log_pipeline.queue_handler]
+    logging.info("through the queue")
+    app.shutdown_logging()
+    assert root.handlers == []
+    content = (tmp_path / "logs" / "app.log").read_text()
+    assert "Logging configured correctly." in content
+    assert "through the queue" in content
+
+def write(handler, message):
+    handler.handle(logging.makeLogRecord({'msg': message}))
+
+def test_rotation_by_size_compresses_segments(tmp_path):
+    """A flush that would pass max_bytes starts a new file and gzips the old one."""
+    log_file = tmp_path / "app.log"
+    handler = RotatingBatchingFileHandler(str(log_file), max_bytes=20, batch_size=1, clock=FakeClock())
+    write(handler, "first record")
+    write(handler, "second record")
+    handler.compressor.join()
+    segments = sorted(tmp_path.glob("app.log.*"))
+    assert [path.suffix for path in segments] == [".gz"]
+    assert gzip.decompress(segments[0].read_bytes()) == b"first record\n"
+    assert log_file.read_text() == "second record\n"
+    handler.close()
+
+def test_rotation_by_time_and_pruning(tmp_path):
+    """Each interval starts a new segment; only backup_count segments are kept."""
+    clock = FakeClock()
+    log_file = tmp_path / "app.log"
+    handler = RotatingBatchingFileHandler(str(log_file), max_bytes=0, interval=60, compression='none',
+                                          backup_count=2, batch_size=1, clock=clock)
+    for index in range(4):
+        write(handler, f"minute {index}")
+        clock.now += 60
+    write(handler, "current")
+    handler.compressor.join()
+    segments = sorted(tmp_path.glob("app.log.*"))
+    assert [path.read_text() for path in segments] == ["minute 2\n", "minute 3\n"]
+    assert log_file.read_text() == "current\n"
+    handler.close()
+
+def test_rotation_suffix_does_not_collide(tmp_path):
+    """Two rollovers within the same second get distinct segment names."""
+    handler = RotatingBatchingFileHandler(str(tmp_path / "app.log"), max_bytes=1, compression='none',
+                                          batch_size=1, clock=FakeClock())
+    for message in ("a", "b", "c"):
+        write(handler, message)
+    handler.compressor.join()
+    assert len(list(tmp_path.glob("app.log.*"))) == 2
+    handler.close()
+
+def test_zstd_compression(tmp_path, monkeypatch):
+    """zstd segments go through zstandard when it is installed."""
+    class FakeCompressor:
+        def copy_stream(self, source, destination):
+            destination.write(b"zstd:" + source.read())
+    monkeypatch.setattr(logger_module, "zstandard", types.SimpleNamespace(ZstdCompressor=FakeCompressor))
+    segment = tmp_path / "app.log.20240101-000000"
+    segment.write_text("old\n")
+    compressor = SegmentCompressor(str(tmp_path / "app.log"), 'zstd')
+    compressor.submit(str(segment))
+    compressor.join()
+    compressor.stop()
+    assert (tmp_path / "app.log.20240101-000000.zst").read_bytes() == b"zstd:old\n"
+    assert not segment.exists()
+
+def test_compressor_falls_back_and_reports_errors(tmp_path, monkeypatch, caplog):
+    """Without zstandard zstd falls back to gzip; a vanished segment is logged, not raised."""
+    monkeypatch.setattr(logger_module, "zstandard", None)
+    with caplog.at_level(logging.INFO):
+        compressor = SegmentCompressor(str(tmp_path / "app.log"), 'zstd')
+        compressor.submit(str(tmp_path / "app.log.missing"))
+        compressor.join()
+        compressor.stop()
+        compressor.stop()  # stopping twice is a no-op
+    assert compressor.method == 'gzip'
+    assert "zstandard is not installed" in caplog.text
+    assert "Could not compress rotated log" in caplog.text
+    with pytest.raises(ValueError, match="Unknown log compression"):
+        SegmentCompressor(str(tmp_path / "app.log"), 'lz4')
+
+def test_json_lines_formatter():
+    """Records become compact JSON objects carrying the command fields when present."""
+    formatter = JsonLinesFormatter()
+    record = logging.makeLogRecord({'msg': 'done %s', 'args': ('x',), 'levelname': 'INFO', 'created': 12.5,
+                                    'command': 'greet', 'duration': 0.001, 'outcome': 'ok'})
+    assert json.loads(formatter.format(record)) == {'time': 12.5, 'level': 'INFO', 'message': 'done x',
+                                                    'command': 'greet', 'duration': 0.001, 'outcome': 'ok'}
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        failed = logging.makeLogRecord({'msg': 'failed', 'exc_info': sys.exc_info()})
+    entry = json.loads(formatter.format(failed))
+    assert 'command' not in entry
+    assert "RuntimeError: boom" in entry['exception']
+
+def test_command_records_in_json_log(tmp_path, caplog):
+    """LOG_FORMAT=json writes command completions with name, duration and outcome."""
+    log_file = tmp_path / "app.log"
+    commands_logger = logging.getLogger("app.commands")
+    pipeline = start_file_pipeline(str(log_file), {'LOG_FORMAT': 'json', 'LOG_MAX_BYTES': '4096',
+                                                   'LOG_ROTATE_INTERVAL': '3600', 'LOG_BACKUP_COUNT': '3',
+                                                   'LOG_COMPRESSION': 'none'}, logger=commands_logger)
+    caplog.set_level(logging.INFO)
+
+    class Failing(Command):
+        def execute(self, context=None):
+            raise RuntimeError("boom")
+
+    handler = CommandHandler()
+    handler.register_command('failing', Failing())
+    with pytest.raises(RuntimeError):
+        handler.execute_command('failing')
+    pipeline.stop(commands_logger)
+    assert pipeline.handler.max_bytes == 4096
+    assert pipeline.handler.interval == 3600
+    assert pipeline.handler.compressor.backup_count == 3
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert entries[-1]['command'] == 'failing'
+    assert entries[-1]['outcome'] == 'error'
+    assert entries[-1]['duration'] >= 0
+
+def test_json_log_keeps_exceptions_separate(tmp_path, isolated_logger):
+    """Through the pipeline, a logged exception becomes the `exception` field, not part of the message."""
+    log_file = tmp_path / "app.log"
+    pipeline = start_file_pipeline(str(log_file), {'LOG_FORMAT': 'json'}, logger=isolated_logger)
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        isolated_logger.exception("Job %d failed", 7)
+    pipeline.stop(isolated_logger)
+    entry, = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert entry['message'] == "Job 7 failed"
+    assert entry['exception'].startswith("Traceback") and entry['exception'].endswith("RuntimeError: boom")
+
+class Loud:
+    # Counts how often it is formatted
+    formatted = 0
+
+    def __str__(self):
+        Loud.formatted += 1
+        return "loud"
+
+def test_fast_logger_defers_formatting(caplog):
+    """Filtered calls never format their arguments; enabled ones format once, when written."""
+    log = FastLogger("tests.facade.deferred")
+    Loud.formatted = 0
+    with caplog.at_level(logging.WARNING):
+        log.debug("value %s", Loud())
+        log.info("value %s", Loud())
+    assert Loud.formatted == 0
+    with caplog.at_level(logging.DEBUG):
+        log.debug("debug %s", Loud())
+        log.info("info %s", Loud())
+        log.warning("warning %s", 1)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            log.exception("failed %s", 2)
+    assert [record.getMessage() for record in caplog.records] == ["debug loud", "info loud", "warning 1", "failed 2"]
+    assert caplog.records[-1].exc_info
+    with caplog.at_level(logging.CRITICAL):
+        log.warning("hidden")
+        log.error("hidden")
+    assert len(caplog.records) == 4
+
+def test_fast_logger_samples_one_in_n(caplog):
+    """1-in-N sampling keeps every Nth record of each message and reports what it dropped."""
+    log = FastLogger("tests.facade.sampled", sample_every=3)
+    with caplog.at_level(logging.INFO):
+        for index in range(7):
+            log.info("result: %s", index)
+            log.info("100% done")
+        log.error("errors are never sampled")
+        log.error("errors are never sampled")
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == ["result: 0", "100% done", "result: 3 (2 similar suppressed)", "100% done (2 similar suppressed)",
+                        "result: 6 (2 similar suppressed)", "100% done (2 similar suppressed)",
+                        "errors are never sampled", "errors are never sampled"]
+
+def test_fast_logger_rate_limit(caplog, monkeypatch):
+    """Rate limiting allows `rate` records of a message per second; counters are bounded."""
+    clock = FakeClock(0.0)
+    log = FastLogger(logging.getLogger("tests.facade.limited"), rate=2, clock=clock)
+    with caplog.at_level(logging.INFO):
+        for _ in range(5):
+            log.info("tick")
+        clock.now = 1.0
+        log.info("tick")
+    assert [record.getMessage() for record in caplog.records] == ["tick", "tick", "tick (3 similar suppressed)"]
+    monkeypatch.setattr(logger_module, "MAX_SAMPLED_MESSAGES", 2)
+    log.configure(sample_every=2)
+    with caplog.at_level(logging.INFO):
+        for message in ("a", "b", "c"):
+            log.info(message)
+    assert list(log.seen) == ["c"]
+
+def test_get_logger_and_sampling_settings():
+    """Facades are shared per name; LOG_SAMPLING configures them."""
+    assert get_logger("tests.facade.configured") is get_logger("tests.facade.configured")
+    configure_sampling({'LOG_SAMPLING': "tests.facade.configured=10, tests.facade.rated=25/s,"})
+    assert get_logger("tests.facade.configured").sample_every == 10
+    assert get_logger("tests.facade.rated").rate == 25.0
+    configure_sampling({})
+    with pytest.raises(ValueError):
+        configure_sampling({'LOG_SAMPLING': "tests.facade.configured=often"})
@@ -0,0 +1,106 @@
+"""
+Tests for memory-mapped bulk calculation over binary operand files.
+"""
+import math
+from array import array
+import pytest
+from app.plugins.calculator import CalculatorCommand, batch
+from app.plugins.calculator.mapped import MappedCalculator
+
+def write_raw(path, values):
+    with open(path, 'wb') as handle:
+        array('d', values).tofile(handle)
+    return str(path)
+
+def read_raw(path):
+    with open(path, 'rb') as handle:
+        return array('d', handle.read()).tolist()
+
+@pytest.fixture
+def mapped():
+    # A tiny chunk size forces several chunks through the loop.
+    return MappedCalculator(CalculatorCommand(), chunk_rows=2)
+
+def test_mapped_raw_files(tmp_path, mapped):
+    """Raw float64 operands stream into a raw float64 result file."""
+    a = write_raw(tmp_path / "a.bin", [1, 2, 3, 4, 5])
+    b = write_raw(tmp_path / "b.bin", [10, 20, 30, 40, 50])
+    out = str(tmp_path / "out.bin")
+    assert mapped.calculate("add", a, b, out) == (5, 0)
+    assert read_raw(out) == [11, 22, 33, 44, 55]
+
+def test_mapped_divide_failures(tmp_path, mapped):
+    """Zero denominators are counted and written as NaN."""
+    a = write_raw(tmp_path / "a.bin", [8, 9, 10])
+    b = write_raw(tmp_path / "b.bin", [2, 0, 5])
+    out = str(tmp_path / "out.bin")
+    assert mapped.calculate("divide", a, b, out) == (3, 1)
+    result = read_raw(out)
+    assert result[0] == 4 and math.isnan(result[1]) and result[2] == 2
+
+def test_mapped_npy_files(tmp_path, mapped):
+    """.npy operands and outputs go through numpy's memmap support."""
+    np = pytest.importorskip("numpy")
+    np.save(tmp_path / "a.npy", np.arange(5, dtype=np.float64))
+    b = write_raw(tmp_path / "b.bin", [2] * 5)
+    out = str(tmp_path / "out.npy")
+    assert mapped.calculate("multiply", str(tmp_path / "a.npy"), b, out) == (5, 0)
+    assert np.load(out).tolist() == [0, 2, 4, 6, 8]
+
+def test_mapped_without_numpy(tmp_path, monkeypatch):
+    """Raw files still work on the array('d') fallback; .npy needs NumPy."""
+    monkeypatch.setattr(batch, "np", None)
+    mapped = MappedCalculator(CalculatorCommand(), chunk_rows=2)
+    a = write_raw(tmp_path / "a.bin", [5, 6, 7])
+    b = write_raw(tmp_path / "b.bin", [1, 1, 1])
+    out = str(tmp_path / "out.bin")
+    assert mapped.calculate("subtract", a, b, out) == (3, 0)
+    assert read_raw(out) == [4, 5, 6]
+    with pytest.raises(ValueError, match="NumPy is required"):
+        mapped.calculate("subtract", str(tmp_path / "a.npy"), b, out)
+
+def test_mapped_empty_files(tmp_path, mapped):
+    """Empty operand files produce an empty output file."""
+    a = write_raw(tmp_path / "a.bin", [])
+    b = write_raw(tmp_path / "b.bin", [])
+    out = str(tmp_path / "out.bin")
+    assert mapped.calculate("add", a, b, out) == (0, 0)
+    assert read_raw(out) == []
+
+def test_mapped_invalid_input(tmp_path, mapped):
+    """Mismatched lengths, non-float64 files and bad settings raise ValueError."""
+    np = pytest.importorskip("numpy")
+    a = write_raw(tmp_path / "a.bin", [1, 2])
+    b = write_raw(tmp_path / "b.bin", [1])
+    out = str(tmp_path / "out.bin")
+    with pytest.raises(ValueError, match="differ in length"):
+        mapped.calculate("add", a, b, out)
+    (tmp_path / "odd.bin").write_bytes(b"123")
+    with pytest.raises(ValueError, match="not a raw float64 file"):
+        mapped.calculate("add", str(tmp_path / "odd.bin"), b, out)
+    np.save(tmp_path / "ints.npy", np.arange(3))
+    with pytest.raises(ValueError, match="one-dimensional float64"):
+        mapped.calculate("add", str(tmp_path / "ints.npy"), b, out)
+    with pytest.raises(ValueError, match="chunk_rows"):
+        MappedCalculator(CalculatorCommand(), chunk_rows=0)
+
+def test_mapped_unknown_operation(tmp_path, mapped):
+    """An unknown operation raises ValueError before any file is opened or truncated."""
+    a = write_raw(tmp_path / "a.bin", [1, 2, 3])
+    b = write_raw(tmp_path / "b.bin", [4, 5, 6])
+    out = tmp_path / "out.bin"
+    out.write_bytes(b"keep")
+    with pytest.raises(ValueError, match="Unknown calculator operation: modulo"):
+        mapped.calculate("modulo", a, b, str(out))
+    assert out.read_bytes() == b"keep"
+
+def test_mapped_chunk_failure_keeps_its_error(tmp_path, mapped, monkeypatch):
+    """An error raised while a chunk is being computed surfaces as itself, not a BufferError."""
+    a = write_raw(tmp_path / "a.bin", [1, 2, 3])
+    b = write_raw(tmp_path / "b.bin", [4, 5, 6])
+
+    def fail(op, a_chunk, b_chunk):
+        raise ValueError("kernel failed")
+    monkeypatch.setattr(mapped.engine, "calculate", fail)
+    with pytest.raises(ValueError, match="kernel failed"):
+        mapped.calculate("add", a, b, str(tmp_path / "out.bin"))
@@ -0,0 +1,103 @@
+"""
+Tests for command latency histograms and their Prometheus export.
+"""
+import logging
+import urllib.request
+import pytest
+from app import App
+from app.commands import Command, CommandHandler, ExecutionContext
+from app.metrics import Histogram, Metrics, METRICS
+from app.plugins.calculator import CalculatorCommand
+
+class Boom(Command):
+    def execute(self, context=None):
+        raise RuntimeError("boom")
+
+def test_histogram_percentiles_interpolate_within_buckets():
+    """Percentiles come from the bucket counts; the overflow bucket is capped by the observed max."""
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.percentile(0.5) == 0.0
+    for seconds in (0.05, 0.05, 0.5, 0.5, 3.0):
+        histogram.observe(seconds, failed=seconds > 1)
+    assert list(histogram.counts) == [2, 2, 1]
+    assert histogram.count == 5 and histogram.errors == 1 and histogram.max == 3.0
+    assert histogram.percentile(0.4) == pytest.approx(0.1)
+    assert histogram.percentile(0.5) == pytest.approx(0.325)
+    assert histogram.percentile(1.0) == pytest.approx(3.0)
+
+def test_command_handler_records_calls_and_errors():
+    """Every execution is timed per command; exceptions count as errors and still propagate."""
+    metrics = Metrics()
+    handler = CommandHandler(metrics=metrics)
+    handler.register_command("boom", Boom())
+    handler.register_command("calc", CalculatorCommand())
+    handler.execute_command("calc", ["add", "1", "2"], ExecutionContext.buffered())
+    with pytest.raises(RuntimeError):
+        handler.execute_command("boom")
+    assert metrics.histogram("command", "calc").count == 1
+    assert metrics.histogram("command", "boom").errors == 1
+
+def test_calculator_records_each_operation():
+    """Scripted and interactive calculator runs record one series per operation."""
+    METRICS.reset()
+    calculator = CalculatorCommand()
+    context = ExecutionContext.buffered(["4", "1", "2", "4", "1", "0", "6"])
+    calculator.run(["add", "1", "2"], context)
+    calculator.run(["divide", "1", "0"], context)
+    calculator.run(["expression", "a * 2", "a=3"], context)
+    with pytest.raises(ValueError):
+        calculator.run(["modulo", "1", "2"], context)
+    calculator.execute(context)
+    assert {label for _, label in METRICS.series} == {"add", "divide", "expression"}
+    assert METRICS.histogram("operation", "divide").count == 3
+    assert METRICS.histogram("operation", "divide").errors == 2
+
+def test_prometheus_text_and_summary(tmp_path, caplog):
+    """The text export follows the Prometheus histogram format; the summary lists percentiles."""
+    metrics = Metrics(buckets=(0.01, 0.1))
+    assert metrics.render_prometheus() == ""
+    metrics.observe("command", "greet", 0.005)
+    metrics.observe("command", "greet", 0.05, failed=True)
+    metrics.observe("operation", "add", 0.2)
+    text = metrics.write_prometheus(str(tmp_path / "app.prom")) and (tmp_path / "app.prom").read_text()
+    assert "# TYPE app_command_duration_seconds histogram" in text
+    assert 'app_command_duration_seconds_bucket{command="greet",le="0.01"} 1' in text
+    assert 'app_command_duration_seconds_bucket{command="greet",le="+Inf"} 2' in text
+    assert 'app_command_duration_seconds_count{command="greet"} 2' in text
+    assert 'app_command_errors_total{command="greet"} 1' in text
+    assert 'app_calculator_operation_duration_seconds_bucket{operation="add",le="0.1"} 0' in text
+    with caplog.at_level(logging.INFO):
+        metrics.log_summary()
+    assert "command:greet" in caplog.text and "operation:add" in caplog.text
+    assert metrics.summary().splitlines()[0].split() == ["name", "calls", "errors", "p50", "ms", "p95", "ms",
+                                                        "p99", "ms", "max", "ms"]
+
+def test_metrics_endpoint_serves_prometheus_text():
+    """The optional HTTP endpoint serves /metrics and nothing else."""
+    metrics = Metrics()
+    metrics.observe("command", "greet", 0.001)
+    port = metrics.serve(port=0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert 'app_command_duration_seconds_count{command="greet"} 1' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        metrics.stop_server()
+    metrics.stop_server()
+    assert metrics.server is None
+
+def test_app_writes_metrics_on_exit(tmp_path, monkeypatch, capfd):
+    """Leaving the REPL logs the summary and writes METRICS_FILE; METRICS_PORT starts the endpoint."""
+    path = tmp_path / "app.prom"
+    monkeypatch.setenv("METRICS_FILE", str(path))
+    monkeypatch.setenv("METRICS_PORT", "0")
+    inputs = iter(["greet", "exit"])
+    monkeypatch.setattr('builtins.input', lambda _: next(inputs))
+    app = App()
+    try:
+        assert METRICS.server is not None
+        app.start()
+    finally:
+        METRICS.stop_server()
+    assert 'app_command_duration_seconds_count{command="greet"}' in path.read_text()
@@ -0,0 +1,58 @@
+"""
+Tests for process-pool evaluation of large calculation jobs.
+"""
+import pytest
+from app.plugins.calculator import parallel
+from app.plugins.calculator.parallel import ParallelCalculator, parse_rows, chunked
+
+def test_parallel_run_preserves_order(tmp_path):
+    """Chunks spread over worker processes come back in the original row order."""
+    calc = ParallelCalculator({'CALCULATOR_WORKERS': '2', 'CALCULATOR_CHUNK_SIZE': '3'})
+    rows = [("add", i, 1) for i in range(20)] + [("divide", 1, 0), ("multiply", 2, 3)]
+    assert calc.run(rows) == [i + 1 for i in range(20)] + [None, 6]
+
+def test_parallel_run_file_formats(tmp_path):
+    """CSV and JSONL job files are both accepted."""
+    calc = ParallelCalculator({'CALCULATOR_WORKERS': '1', 'CALCULATOR_CHUNK_SIZE': '2'})
+    csv_job = tmp_path / "job.csv"
+    csv_job.write_text("op,a,b\nadd,1,2\n\nsubtract,5,3\ndivide,9,3\n")
+    assert calc.run_file(str(csv_job)) == [3, 2, 3]
+    jsonl_job = tmp_path / "job.jsonl"
+    jsonl_job.write_text('{"op": "multiply", "a": 2, "b": 4}\n\n{"op": "modulo", "a": 1, "b": 1}\n')
+    assert calc.run_file(str(jsonl_job)) == [8, None]
+
+def test_parallel_run_file_with_malformed_rows(tmp_path):
+    """A malformed row in the middle of a job comes back as None in its place."""
+    calc = ParallelCalculator({'CALCULATOR_WORKERS': '2', 'CALCULATOR_CHUNK_SIZE': '2'})
+    csv_job = tmp_path / "job.csv"
+    csv_job.write_text("op,a,b\nadd,1,2\nadd,abc,1\nadd,3\nadd,3,4\n")
+    assert calc.run_file(str(csv_job)) == [3, None, None, 7]
+    jsonl_job = tmp_path / "job.jsonl"
+    jsonl_job.write_text('{"op": "add", "a": 1, "b": 1}\n{"op": "add"}\n{not json\n[1]\n{"op": "add", "a": 2, "b": 2}\n')
+    assert calc.run_file(str(jsonl_job)) == [2, None, None, None, 4]
+
+def test_parallel_settings():
+    """Worker count and chunk size come from the App settings dict."""
+    calc = ParallelCalculator({'CALCULATOR_WORKERS': '4', 'CALCULATOR_CHUNK_SIZE': '50'})
+    assert (calc.workers, calc.chunk_size) == (4, 50)
+    default = ParallelCalculator()
+    assert default.workers >= 1 and default.chunk_size == parallel.DEFAULT_CHUNK_SIZE
+    with pytest.raises(ValueError):
+        ParallelCalculator({'CALCULATOR_WORKERS': '-1'})
+
+def test_worker_chunk_in_process():
+    """The worker entry points, run in-process, use the pre-warmed calculator."""
+    parallel._init_worker('app.plugins.calculator')
+    assert parallel._run_chunk([("add", 1, 2), ("divide", 1, 0), parallel.INVALID_ROW]) == [3, None, None]
+
+def test_worker_warns_without_operations(caplog):
+    """A worker whose operation table comes up empty says so."""
+    parallel._init_worker('app.plugins.greet')
+    assert "Calculator worker started without any operations loaded." in caplog.text
+
+def test_parse_rows_and_chunked():
+    """Row parsing and chunking helpers."""
+    assert list(parse_rows([" add ,1,2"])) == [("add", 1.0, 2.0)]
+    with pytest.raises(ValueError, match="Unsupported job format"):
+        list(parse_rows([], fmt="xml"))
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
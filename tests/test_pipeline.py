@@ -0,0 +1,38 @@
+"""
+Tests for lazily evaluated calculator pipelines.
+"""
+import itertools
+import pytest
+from app.plugins.calculator import CalculatorCommand
+from app.plugins.calculator.pipeline import Pipeline
+
+@pytest.fixture
+def pipeline():
+    return Pipeline(CalculatorCommand())
+
+def test_pipeline_chains_operations(pipeline):
+    """multiply, then subtract, then divide, applied per item."""
+    steps = pipeline.then("multiply", 2).then("subtract", 3).then("divide", 4)
+    assert list(steps.run([1, "2", 3.5])) == [(1 * 2 - 3) / 4, (2 * 2 - 3) / 4, (3.5 * 2 - 3) / 4]
+
+def test_pipeline_fuses_consecutive_stages(pipeline):
+    """Consecutive elementwise stages compile to a single pass; filters split the runs."""
+    steps = pipeline.then("add", 1).then("multiply", 10).where(lambda x: x > 20).then("subtract", 1)
+    assert [kind for kind, _ in steps.compile()] == ["map", "filter", "map"]
+    assert list(steps.run([1, 2, 3])) == [29, 39]
+    assert pipeline.compile() == []
+    assert list(pipeline.where(lambda x: x % 2).then("add", 1).run(range(5))) == [2.0, 4.0]
+    assert list(pipeline.run([1, 2])) == [1.0, 2.0]
+
+def test_pipeline_is_lazy(pipeline):
+    """Items are pulled on demand, so unbounded inputs work in bounded memory."""
+    stream = pipeline.then("add", 1).run(itertools.count())
+    assert list(itertools.islice(stream, 3)) == [1.0, 2.0, 3.0]
+
+def test_pipeline_builders_are_immutable(pipeline):
+    """Adding a stage returns a new pipeline and leaves the original untouched."""
+    doubled = pipeline.then("multiply", 2)
+    assert pipeline.stages == ()
+    assert len(doubled.stages) == 1
+    with pytest.raises(ValueError, match="Unknown calculator operation"):
+        pipeline.then("power", 2)
@@ -0,0 +1,133 @@
+"""
+Tests for on-demand command profiling and the collapsed-stack output.
+"""
+import time
+import pstats
+import cProfile
+import pytest
+from app import App
+from app.commands import Command, CommandHandler, ExecutionContext
+from types import SimpleNamespace
+from app.profiling import CommandProfiler, StackSampler, collapse_pstats
+
+def leaf(n):
+    return sum(i * i for i in range(n))
+
+def middle():
+    return leaf(20000)
+
+def top():
+    return middle() + leaf(20000)
+
+class Busy(Command):
+    seconds = 0.05
+
+    def execute(self, context=None):
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            leaf(1000)
+        return "done"
+
+class LongBusy(Busy):
+    # The sampler only runs when the busy thread gives up the GIL, every few milliseconds
+    seconds = 0.25
+
+def read_stacks(path):
+    stacks = {}
+    for line in path.read_text().splitlines():
+        stack, weight = line.rsplit(" ", 1)
+        stacks[stack] = int(weight)
+    return stacks
+
+def test_collapse_pstats_rebuilds_call_paths():
+    """Each call path gets the time its functions spent on that path."""
+    profile = cProfile.Profile()
+    profile.runcall(top)
+    stacks = {";".join(frame.split(" ")[0] for frame in stack): weight
+              for stack, weight in collapse_pstats(pstats.Stats(profile)).items()}
+    assert "top;middle;leaf" in stacks and "top;leaf" in stacks
+    assert all(weight > 0 for weight in stacks.values())
+
+def test_collapse_pstats_folds_recursion_and_skips_idle_functions():
+    """Recursive calls fold into their first frame; functions with no recorded time are left out."""
+    main, fib, idle = ("app.py", 1, "main"), ("app.py", 5, "fib"), ("app.py", 9, "idle")
+    stats = SimpleNamespace(stats={
+        main: (1, 1, 0.001, 0.004, {}),
+        fib: (1, 5, 0.003, 0.003, {main: (1, 1, 0.003, 0.003), fib: (4, 4, 0.002, 0.002)}),
+        idle: (1, 1, 0.0, 0.0, {main: (1, 1, 0.0, 0.0)}),
+    })
+    assert collapse_pstats(stats) == {("main (app.py:1)",): 1000, ("main (app.py:1)", "fib (app.py:5)"): 3000}
+
+def test_sampler_ignores_finished_threads():
+    """Sampling a thread that no longer exists records nothing."""
+    with StackSampler(thread_id=-1, interval=0.001) as sampler:
+        time.sleep(0.05)
+    assert not sampler.stacks
+
+def test_cprofile_mode_writes_pstats_and_collapsed_stacks(tmp_path):
+    """cProfile runs leave a loadable pstats dump and a flamegraph-ready file per invocation."""
+    handler = CommandHandler(profiler=CommandProfiler("cprofile", directory=str(tmp_path)))
+    handler.register_command("busy", Busy())
+    assert handler.execute_command("busy") == "done"
+    dumps = sorted(tmp_path.iterdir())
+    assert [path.suffix for path in dumps] == [".collapsed", ".pstats"]
+    assert dumps[0].name.startswith("busy-") and dumps[0].stem == dumps[1].stem
+    assert any("leaf" in name for _, _, name in pstats.Stats(str(dumps[1])).stats)
+    assert any("execute (test_profiling.py" in stack for stack in read_stacks(dumps[0]))
+
+def test_sampling_mode_writes_collapsed_stacks(tmp_path):
+    """The sampling profiler records the running command's stacks without tracing every call."""
+    handler = CommandHandler(profiler=CommandProfiler("sampling", directory=str(tmp_path), interval=0.001))
+    handler.register_command("busy", LongBusy())
+    handler.execute_command("busy", context=ExecutionContext.buffered())
+    (collapsed,) = tmp_path.iterdir()
+    stacks = read_stacks(collapsed)
+    assert sum(stacks.values()) > 5
+    assert any(stack.split(";")[-1].startswith(("leaf", "<genexpr>", "execute")) for stack in stacks)
+
+def test_targeting_and_sampled_fraction(tmp_path):
+    """Only the targeted commands are profiled, and only for the sampled fraction of calls."""
+    draws = iter([0.9, 0.1])
+    profiler = CommandProfiler("cprofile", commands=["busy"], rate=0.5, directory=str(tmp_path),
+                               draw=lambda: next(draws))
+    handler = CommandHandler(profiler=profiler)
+    handler.register_command("busy", Busy())
+    handler.register_command("other", Busy())
+    handler.execute_command("other")
+    handler.execute_command("busy")  # draw 0.9: skipped
+    assert list(tmp_path.iterdir()) == []
+    handler.execute_command("busy")  # draw 0.1: profiled
+    assert len(list(tmp_path.iterdir())) == 2
+
+def test_nested_commands_are_not_profiled_twice(tmp_path):
+    """A command run from inside a profiled command shows up in its parent's profile only."""
+    handler = CommandHandler(profiler=CommandProfiler("cprofile", directory=str(tmp_path)))
+
+    class Outer(Command):
+        def execute(self, context=None):
+            return handler.execute_command("busy")
+    handler.register_command("busy", Busy())
+    handler.register_command("outer", Outer())
+    assert handler.execute_command("outer") == "done"
+    assert sorted(path.name.split("-")[0] for path in tmp_path.iterdir()) == ["outer", "outer"]
+
+def test_one_cprofile_session_at_a_time(tmp_path):
+    """While one command is under cProfile, a concurrent one runs unprofiled."""
+    profiler = CommandProfiler("cprofile", directory=str(tmp_path))
+    with profiler.cprofile_lock:
+        assert profiler.run("busy", leaf, 10) == 285
+    assert list(tmp_path.iterdir()) == []
+
+def test_profiler_from_settings(tmp_path, monkeypatch):
+    """PROFILE turns profiling on for the App; PROFILE_COMMANDS, PROFILE_RATE and PROFILE_DIR refine it."""
+    assert CommandProfiler.from_settings({}) is None
+    assert CommandProfiler.from_settings({"PROFILE": "off"}) is None
+    with pytest.raises(ValueError, match="Unknown profiling mode"):
+        CommandProfiler.from_settings({"PROFILE": "perf"})
+    monkeypatch.setenv("PROFILE", "sampling")
+    monkeypatch.setenv("PROFILE_COMMANDS", "greet, calculator")
+    monkeypatch.setenv("PROFILE_RATE", "0.25")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    profiler = App().command_handler.profiler
+    assert profiler.mode == "sampling" and profiler.commands == {"greet", "calculator"}
+    assert profiler.rate == 0.25 and profiler.directory == str(tmp_path)
@@ -0,0 +1,83 @@
+"""
+Tests for the indexed command registry behind CommandHandler.
+"""
+import pytest
+from app import App
+from app.commands import CommandHandler, CommandRegistry
+
+@pytest.fixture
+def registry():
+    registry = CommandRegistry()
+    for name in ["calculator", "discord", "email", "exit", "greet"]:
+        registry.register(name, name.upper())
+    return registry
+
+def test_registry_is_an_ordered_mapping(registry):
+    """Names keep registration order and map to their commands."""
+    assert list(registry) == ["calculator", "discord", "email", "exit", "greet"]
+    assert registry["email"] == "EMAIL" and "exit" in registry and len(registry) == 5
+    registry.register("email", "NEW EMAIL")
+    assert registry["email"] == "NEW EMAIL" and registry.position_of("email") == 2
+
+def test_lookup_by_position(registry):
+    """Menu positions map straight to names; out-of-range positions raise IndexError."""
+    assert registry.name_at(0) == "calculator"
+    assert registry.name_at(4) == "greet"
+    with pytest.raises(IndexError):
+        registry.name_at(5)
+    with pytest.raises(IndexError):
+        registry.name_at(-1)
+
+def test_prefix_lookup(registry):
+    """Prefixes complete in menu order and resolve only when unambiguous."""
+    assert registry.complete("e") == ["email", "exit"]
+    assert registry.complete("x") == []
+    assert registry.complete("") == list(registry)
+    assert registry.resolve("gr") == "greet"
+    assert registry.resolve("e") is None
+    assert registry.resolve("exit") == "exit"
+
+def test_unregister_updates_indexes(registry):
+    """Unregistering keeps positions dense and prunes the trie."""
+    assert registry.unregister("discord") == "DISCORD"
+    assert list(registry) == ["calculator", "email", "exit", "greet"]
+    assert registry.position_of("greet") == 3 and registry.name_at(1) == "email"
+    assert registry.complete("d") == []
+    registry.unregister("exit")
+    assert registry.resolve("e") == "email"
+    with pytest.raises(KeyError):
+        registry.unregister("exit")
+    registry.register("greeter", "GREETER")
+    registry.unregister("greet")
+    assert registry.resolve("gre") == "greeter"
+
+def test_menu_is_cached_until_changed(registry):
+    """The rendered menu is reused until the registry changes."""
+    menu = registry.menu()
+    assert menu.splitlines()[0] == "1. calculator"
+    assert registry.menu() is menu
+    registry.register("goodbye", "GOODBYE")
+    assert registry.menu().endswith("6. goodbye")
+
+def test_handler_unregister_and_prefix(capfd, caplog):
+    """CommandHandler exposes unregistering and prefix lookup."""
+    handler = CommandHandler()
+    handler.list_commands()
+    assert capfd.readouterr().out == ""
+    handler.register_command("greet", "GREET")
+    handler.register_command("goodbye", "GOODBYE")
+    assert handler.get_command_by_prefix("gr") == "greet"
+    assert handler.get_command_by_prefix("g") is None
+    assert "No unique command matches 'g'." in caplog.text
+    assert handler.unregister_command("greet") == "GREET"
+    assert handler.unregister_command("greet") is None
+    assert handler.get_command_by_prefix("g") == "goodbye"
+
+def test_app_accepts_command_names(capfd, monkeypatch):
+    """The main menu accepts a command name or prefix instead of its number."""
+    inputs = iter(['gr', 'bogus', 'exit'])
+    monkeypatch.setattr('builtins.input', lambda _: next(inputs))
+    App().start()
+    captured = capfd.readouterr()
+    assert "Hello, World!" in captured.out
+    assert "Invalid selection. Please enter a valid number." in captured.out
@@ -0,0 +1,314 @@
+"""
+Tests for the asyncio session server, using asyncio stream clients as stand-ins.
+"""
+import asyncio
+import sys
+import threading
+from app import App
+from app.commands import Command
+from app.server import SessionServer
+
+async def read_until_prompt(reader):
+    return (await reader.readuntil(b">>> ")).decode()
+
+async def start_server(**kwargs):
+    return await SessionServer(App(), port=0, **kwargs).start()
+
+def test_sessions_are_independent():
+    """Many concurrent clients each get only their own command output."""
+    async def client(port, index):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        banner = await read_until_prompt(reader)
+        writer.write(f"calculator multiply {index} 10\n".encode())
+        reply = await read_until_prompt(reader)
+        writer.write(b"exit\n")
+        farewell = (await reader.read()).decode()
+        writer.close()
+        return banner, reply, farewell
+
+    async def scenario():
+        server = await start_server()
+        results = await asyncio.gather(*(client(server.port, i) for i in range(50)))
+        await server.close()
+        return results
+
+    for index, (banner, reply, farewell) in enumerate(asyncio.run(scenario())):
+        assert "1. calculator" in banner
+        assert reply == f"The result is {index * 10.0}\n>>> "
+        assert farewell == "Goodbye.\n"
+
+def test_session_menu_numbers_and_errors():
+    """Menu numbers, blank lines, interactive commands and bad input are handled per session."""
+    async def scenario():
+        server = await start_server()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        replies = []
+        for line in [b"6", b"", b"99", b"calculator add 1"]:
+            writer.write(line + b"\n")
+            replies.append(await read_until_prompt(reader))
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.05)
+        sessions = server.active_sessions
+        await server.close()
+        return replies, sessions
+
+    replies, sessions = asyncio.run(scenario())
+    assert replies[0] == "Hello, World!\n>>> "
+    assert replies[1] == ">>> "
+    assert replies[2] == "Invalid selection. Please enter a valid number.\n>>> "
+    assert "Error: add takes exactly two operands." in replies[3]
+    assert sessions == 0
+
+def test_interactive_commands_prompt_their_own_session():
+    """Interactive commands read their answers from the session that started them."""
+    async def conversation(port, a, b):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator\n")
+        transcript = (await reader.readuntil(b"Select an operation: ")).decode()
+        for answer, prompt in [("1", b"Enter first number: "), (a, b"Enter second number: "), (b, b"Select an operation: ")]:
+            writer.write(f"{answer}\n".encode())
+            transcript += (await reader.readuntil(prompt)).decode()
+        writer.write(b"6\n")
+        transcript += await read_until_prompt(reader)
+        writer.close()
+        return transcript
+
+    async def scenario():
+        server = await start_server()
+        transcripts = await asyncio.gather(*(conversation(server.port, str(i), "100") for i in range(10)))
+        await server.close()
+        return transcripts
+
+    for index, transcript in enumerate(asyncio.run(scenario())):
+        assert "1. Add" in transcript
+        assert f"The result is {index + 100.0}" in transcript
+        assert transcript.endswith(">>> ")
+
+def test_session_closed_while_prompting():
+    """A client that disconnects mid-prompt ends the command without affecting the server."""
+    async def scenario():
+        server = await start_server()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator\n")
+        await reader.readuntil(b"Select an operation: ")
+        writer.write_eof()
+        rest = await reader.read()
+        writer.close()
+        await server.close()
+        return rest.decode()
+
+    assert "needs interactive input" in asyncio.run(scenario())
+
+def test_idle_sessions_time_out():
+    """Idle clients are disconnected after the configured timeout."""
+    async def scenario():
+        server = await start_server(idle_timeout=0.05)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        closing = await reader.read()
+        writer.close()
+        await server.close()
+        return closing
+
+    assert "Session closed after being idle." in asyncio.run(scenario()).decode()
+
+def test_oversized_line_ends_session(caplog):
+    """A line beyond the stream limit ends that session without affecting the server."""
+    async def scenario():
+        server = await start_server()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"x" * 200000 + b"\n")
+        try:
+            rest = await reader.read()
+        except ConnectionResetError:
+            rest = b""  # the server may close before reading everything we sent
+        writer.close()
+        await server.close()
+        return rest
+
+    assert asyncio.run(scenario()) == b""
+    assert "Session ended" in caplog.text
+
+def test_serve_forever_until_cancelled():
+    """serve_forever keeps accepting sessions until its task is cancelled."""
+    async def scenario():
+        server = await start_server()
+        task = asyncio.create_task(server.serve_forever())
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        banner = await read_until_prompt(reader)
+        writer.close()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return banner, server.server.is_serving()
+
+    banner, serving = asyncio.run(scenario())
+    assert "Available commands:" in banner
+    assert serving is False
+
+def test_sessions_at_prompts_do_not_hold_workers():
+    """More sessions than workers can wait inside interactive commands while others still run."""
+    async def waiting_session(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator\n")
+        await reader.readuntil(b"Select an operation: ")
+        return reader, writer
+
+    async def scenario():
+        server = await start_server(workers=2)
+        idle = await asyncio.gather(*(waiting_session(server.port) for _ in range(6)))
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator add 1 2\n")
+        reply = await asyncio.wait_for(read_until_prompt(reader), 5)
+        for _, idle_writer in idle:
+            idle_writer.close()
+        writer.close()
+        await server.close()
+        return reply
+
+    assert asyncio.run(scenario()) == "The result is 3.0\n>>> "
+
+def test_output_waits_for_slow_clients():
+    """A command writing to a client that is not reading is held back instead of buffering everything."""
+    printed = []
+
+    class Flood(Command):
+        def execute(self, context=None):
+            for _ in range(2000):
+                context.print("x" * 10000)
+                printed.append(1)
+
+    async def scenario():
+        app = App()
+        server = await SessionServer(app, port=0).start()
+        app.command_handler.register_command("flood", Flood())
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port, limit=2**16)
+        await read_until_prompt(reader)
+        writer.write(b"flood\n")
+        await asyncio.sleep(0.3)
+        held_back = len(printed)
+        received = 0
+        while True:
+            chunk = await reader.read(2**20)
+            received += len(chunk)
+            if chunk.endswith(b">>> "):
+                break
+        writer.close()
+        await server.close()
+        return held_back, received
+
+    held_back, received = asyncio.run(scenario())
+    assert held_back < 2000
+    assert received == 2000 * 10001 + len(">>> ")
+
+def test_client_leaving_during_output_ends_the_session(caplog):
+    """A command writing to a client that went away stops with the session."""
+    class Flood(Command):
+        def execute(self, context=None):
+            while True:
+                context.print("x" * 10000)
+
+    async def scenario():
+        app = App()
+        server = await SessionServer(app, port=0).start()
+        app.command_handler.register_command("flood", Flood())
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"flood\n")
+        await reader.readexactly(100000)
+        writer.transport.abort()
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if server.active_sessions == 0:
+                break
+        sessions = server.active_sessions
+        await server.close()
+        return sessions
+
+    assert asyncio.run(scenario()) == 0
+    assert "Session ended" in caplog.text
+
+def test_exit_command_cannot_stop_the_server(caplog):
+    """Neither a prefix of exit nor a command calling sys.exit() stops the server."""
+    class Quit(Command):
+        def execute(self, context=None):
+            sys.exit(1)
+
+    async def scenario():
+        app = App()
+        server = await SessionServer(app, port=0).start()
+        app.command_handler.register_command("quit", Quit())
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        replies = []
+        for line in (b"ex\n", b"4\n", b"quit\n", b"calculator add 1 2\n"):
+            writer.write(line)
+            replies.append(await read_until_prompt(reader))
+        writer.close()
+        await server.close()
+        return replies
+
+    refused, by_number, quit_reply, after = asyncio.run(scenario())
+    assert refused == by_number == "The exit command is not available in this session.\n>>> "
+    assert quit_reply == ">>> "
+    assert after == "The result is 3.0\n>>> "
+    assert "tried to exit the server" in caplog.text
+
+def test_busy_server_turns_commands_away(caplog):
+    """Beyond the command thread cap a command gets a busy reply instead of a new thread."""
+    release = threading.Event()
+
+    class Block(Command):
+        def execute(self, context=None):
+            release.wait(5)
+            context.print("done")
+
+    async def scenario():
+        app = App()
+        server = await SessionServer(app, port=0, threads=1).start()
+        app.command_handler.register_command("block", Block())
+        first_reader, first_writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(first_reader)
+        first_writer.write(b"block\n")
+        await asyncio.sleep(0.1)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator add 1 2\n")
+        busy = await read_until_prompt(reader)
+        release.set()
+        finished = await read_until_prompt(first_reader)
+        writer.write(b"calculator add 1 2\n")
+        after = await read_until_prompt(reader)
+        first_writer.close()
+        writer.close()
+        await server.close()
+        return busy, finished, after
+
+    busy, finished, after = asyncio.run(scenario())
+    assert busy.startswith("Server busy")
+    assert finished == "done\n>>> "
+    assert after == "The result is 3.0\n>>> "
+    assert "every command thread is busy" in caplog.text
+
+def test_unanswered_prompts_time_out():
+    """A command left waiting at a prompt gives its thread back after the input timeout."""
+    async def scenario():
+        server = await start_server(input_timeout=0.05)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await read_until_prompt(reader)
+        writer.write(b"calculator\n")
+        rest = await reader.read()
+        writer.close()
+        await server.close()
+        return rest.decode()
+
+    assert "Session closed after being idle." in asyncio.run(scenario())